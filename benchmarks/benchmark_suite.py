@@ -0,0 +1,189 @@
+'''Micro and macro benchmarks for the simulation and training stack, with JSON baselines.
+Run from the repository root:
+    python benchmarks/benchmark_suite.py [--only micro|macro] [--quick] [--save results.json] [--compare baseline.json] [--threshold 0.10]
+--save writes the results as a baseline, --compare flags every benchmark that got slower than the baseline by more than the threshold
+(and exits with status 1 if any did).'''
+import sys
+sys.path.append(".")
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+from time import perf_counter
+from typing import Callable, TypedDict
+import neat
+import non_pygame.block_dude_core as bd_core
+import non_pygame.ml_core as ml_core
+import non_pygame.replays as replays
+from non_pygame.encoders import make_encoder
+
+CONFIG_PATH : str = 'non_pygame/config-feedforward.txt'
+WINNERS_DIR : str = 'non_pygame/winners'
+SEED : int = 7
+
+class BenchmarkResult(TypedDict):
+    name : str
+    kind : str
+    seconds : float
+    operations : int
+
+class BenchmarkFile(TypedDict):
+    python : str
+    platform : str
+    results : dict[str, BenchmarkResult]
+
+class Comparison(TypedDict):
+    name : str
+    baseline : float
+    current : float
+    ratio : float
+    regressed : bool
+
+def get_map_names() -> list[str]:
+    return sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob('non_pygame/maps/*.json'))
+
+def time_operation(operation : Callable[[], object], number : int, repeat : int) -> float:
+    '''Best time per call over repeat runs of number calls each. The best run is the one least disturbed by the rest of the machine.'''
+    best : float = float('inf')
+    for _ in range(repeat):
+        start : float = perf_counter()
+        for _ in range(number):
+            operation()
+        best = min(best, (perf_counter() - start) / number)
+    return best
+
+def make_result(name : str, kind : str, seconds : float, operations : int = 1) -> BenchmarkResult:
+    return {'name' : name, 'kind' : kind, 'seconds' : seconds, 'operations' : operations}
+
+def get_random_rankings(count : int) -> list[list[int]]:
+    rng : random.Random = random.Random(SEED)
+    rankings : list[list[int]] = []
+    for _ in range(count):
+        ranking : list[int] = [action.value for action in bd_core.ActionType]
+        rng.shuffle(ranking)
+        rankings.append(ranking)
+    return rankings
+
+def bench_game_moves(the_map : bd_core.SavedMap, move_count : int, repeat : int) -> float:
+    '''Seconds per move, on a fixed random sequence of action rankings. Like in eval_genome, the first legal action of a ranking is played.
+    The game restarts when it is won.'''
+    rankings : list[list[int]] = get_random_rankings(move_count)
+    best : float = float('inf')
+    for _ in range(repeat):
+        game : bd_core.Game = bd_core.Game.from_saved_map(the_map, copy_map=True)
+        verifications, actions = game.get_binds()
+        start : float = perf_counter()
+        for ranking in rankings:
+            for action in ranking:
+                if not verifications[action](): continue
+                actions[action]()
+                break
+            if game.game_won():
+                game = bd_core.Game.from_saved_map(the_map, copy_map=True)
+                verifications, actions = game.get_binds()
+        best = min(best, (perf_counter() - start) / move_count)
+    return best
+
+def run_micro_benchmarks(quick : bool) -> list[BenchmarkResult]:
+    number : int = 200 if quick else 2000
+    repeat : int = 3 if quick else 5
+    results : list[BenchmarkResult] = []
+    for map_name in get_map_names():
+        the_map : bd_core.SavedMap = bd_core.load_map(map_name)
+        results.append(make_result(f'game_moves[{map_name}]', 'micro', bench_game_moves(the_map, number * 5, repeat)))
+    the_map : bd_core.SavedMap = bd_core.load_map('level2')
+    game : bd_core.Game = bd_core.Game.from_saved_map(the_map, copy_map=True)
+    game_state : bd_core.GameState = bd_core.Game.from_saved_map(the_map, copy_map=True).to_game_state()
+    results.append(make_result('validate_map', 'micro', time_operation(lambda: bd_core.validate_map(the_map['map']), number, repeat)))
+    results.append(make_result('game_eq', 'micro', time_operation(lambda: game == game_state, number, repeat)))
+    results.append(make_result('to_game_state', 'micro', time_operation(game.to_game_state, number * 10, repeat)))
+    results.append(make_result('flatten_map_gen', 'micro', time_operation(lambda: list(ml_core.flatten_map_gen(game.map)), number, repeat)))
+    for path in sorted(glob.glob(f'{WINNERS_DIR}/*.json')):
+        replay : replays.CompactReplay|None = replays.load_compact_replay(path)
+        if replay is None or 'genome' not in replay: continue
+        net : neat.nn.FeedForwardNetwork = replays.decode_network(replay['genome'])
+        inputs : list[float] = list(make_encoder(replay['encoder'], replay['map']).encode(bd_core.Game.from_saved_map(replay['map'], copy_map=True)))
+        name : str = os.path.splitext(os.path.basename(path))[0]
+        results.append(make_result(f'activate[{name}]', 'micro', time_operation(lambda: net.activate(inputs), number, repeat)))
+    return results
+
+def run_macro_benchmarks(quick : bool) -> list[BenchmarkResult]:
+    generations : int = 2 if quick else 10
+    results : list[BenchmarkResult] = []
+    for map_name in get_map_names():
+        the_map : bd_core.SavedMap = bd_core.load_map(map_name)
+        ipop : ml_core.PopulationInterface = ml_core.get_pop_runner(CONFIG_PATH, the_map, generations, seed=SEED)
+        genomes : list[tuple[int, neat.DefaultGenome]] = ipop.get_genome_list()
+        start : float = perf_counter()
+        ml_core.eval_genomes(genomes, ipop.pop.config, the_map)
+        results.append(make_result(f'eval_genomes[{map_name}]', 'macro', perf_counter() - start, len(genomes)))
+
+        ipop = ml_core.get_pop_runner(CONFIG_PATH, the_map, generations, seed=SEED)
+        start = perf_counter()
+        ml_core.run_interface(ipop, the_map)
+        results.append(make_result(f'run_interface[{map_name}]', 'macro', perf_counter() - start, ipop.current_generation))
+    return results
+
+def compare_results(baseline : BenchmarkFile, results : dict[str, BenchmarkResult], threshold : float) -> list[Comparison]:
+    comparisons : list[Comparison] = []
+    for name, result in results.items():
+        old_result : BenchmarkResult|None = baseline['results'].get(name, None)
+        if old_result is None: continue
+        #macro runs can stop early (a map got solved), so they are compared per operation
+        old_seconds : float = old_result['seconds'] / max(old_result['operations'], 1)
+        new_seconds : float = result['seconds'] / max(result['operations'], 1)
+        ratio : float = new_seconds / old_seconds if old_seconds else 1.0
+        comparisons.append({'name' : name, 'baseline' : old_seconds, 'current' : new_seconds, 'ratio' : ratio, 'regressed' : ratio > 1 + threshold})
+    return comparisons
+
+def print_results(results : list[BenchmarkResult]):
+    print(f'{"benchmark":<36}{"kind":>8}{"time":>14}{"per second":>14}')
+    for result in results:
+        per_operation : float = result['seconds'] / max(result['operations'], 1)
+        print(f'{result["name"]:<36}{result["kind"]:>8}{format_seconds(result["seconds"]):>14}{1 / per_operation if per_operation else 0:>14.1f}')
+
+def print_comparisons(comparisons : list[Comparison], threshold : float):
+    print(f'\n{"benchmark":<36}{"baseline":>14}{"current":>14}{"change":>10}')
+    for comparison in comparisons:
+        flag : str = '  REGRESSION' if comparison['regressed'] else ''
+        print(f'{comparison["name"]:<36}{format_seconds(comparison["baseline"]):>14}{format_seconds(comparison["current"]):>14}'
+              f'{comparison["ratio"] - 1:>+10.1%}{flag}')
+    regressed : int = sum(comparison['regressed'] for comparison in comparisons)
+    print(f'{regressed} regression(s) beyond {threshold:.0%}')
+
+def format_seconds(seconds : float) -> str:
+    if seconds >= 1: return f'{seconds:.3f}s'
+    if seconds >= 1e-3: return f'{seconds * 1e3:.3f}ms'
+    return f'{seconds * 1e6:.3f}us'
+
+def main(argv : list[str]) -> int:
+    parser : argparse.ArgumentParser = argparse.ArgumentParser(description='Block dude simulation and training benchmarks')
+    parser.add_argument('--only', choices=('micro', 'macro'), default=None)
+    parser.add_argument('--quick', action='store_true', help='fewer repeats and generations, for a rough check')
+    parser.add_argument('--save', default=None, help='write the results to this JSON file')
+    parser.add_argument('--compare', default=None, help='compare against this JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.10, help='slowdown that counts as a regression (0.10 = 10%%)')
+    args : argparse.Namespace = parser.parse_args(argv)
+
+    results : list[BenchmarkResult] = []
+    if args.only in (None, 'micro'): results += run_micro_benchmarks(args.quick)
+    if args.only in (None, 'macro'): results += run_macro_benchmarks(args.quick)
+    print_results(results)
+    result_dict : dict[str, BenchmarkResult] = {result['name'] : result for result in results}
+
+    if args.save is not None:
+        benchmark_file : BenchmarkFile = {'python' : platform.python_version(), 'platform' : platform.platform(), 'results' : result_dict}
+        with open(args.save, 'w') as file:
+            json.dump(benchmark_file, file, indent=4)
+    if args.compare is not None:
+        with open(args.compare, 'r') as file:
+            baseline : BenchmarkFile = json.load(file)
+        comparisons : list[Comparison] = compare_results(baseline, result_dict, args.threshold)
+        print_comparisons(comparisons, args.threshold)
+        if any(comparison['regressed'] for comparison in comparisons): return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
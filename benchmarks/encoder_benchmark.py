@@ -0,0 +1,67 @@
+'''Compares the observation encoders on network size, evaluation speed and time to solve.
+Run from the repository root: python benchmarks/encoder_benchmark.py [map_name] [generations] [pop_size]'''
+import sys
+sys.path.append(".")
+from time import perf_counter
+from typing import TypedDict
+import neat
+import non_pygame.block_dude_core as bd_core
+import non_pygame.ml_core as ml_core
+from non_pygame.encoders import ENCODERS
+
+CONFIG_PATH : str = 'non_pygame/config-feedforward.txt'
+
+class EncoderResult(TypedDict):
+    encoder : str
+    inputs : int
+    connections : float
+    evals_per_second : float
+    solved_generation : int|None
+    time_to_solve : float|None
+
+def benchmark_encoder(encoder_name : str, the_map : bd_core.SavedMap, generations : int, pop_size : int) -> EncoderResult:
+    ipop : ml_core.PopulationInterface = ml_core.get_pop_runner(CONFIG_PATH, the_map, generations,
+                                                                 {'NEAT' : {'pop_size' : pop_size}}, encoder_name)
+    config : neat.Config = ipop.pop.config
+    connections : list[int] = [len(genome.connections) for genome in ipop.pop.population.values()]
+    eval_time : float = 0.0
+    eval_count : int = 0
+    solved_generation : int|None = None
+    time_to_solve : float|None = None
+    start : float = perf_counter()
+    ipop.start_running()
+    while True:
+        ipop.start_generation()
+        genomes = ipop.get_genome_list()
+        eval_start : float = perf_counter()
+        ml_core.eval_genomes(genomes, config, the_map)
+        eval_time += perf_counter() - eval_start
+        eval_count += len(genomes)
+        if solved_generation is None and max(genome.fitness for _, genome in genomes) >= config.fitness_threshold:
+            solved_generation = ipop.current_generation
+            time_to_solve = perf_counter() - start
+        ipop.end_generation()
+        if ipop.isover() or solved_generation is not None: break
+    return {
+        'encoder' : encoder_name,
+        'inputs' : config.genome_config.num_inputs,
+        'connections' : sum(connections) / len(connections),
+        'evals_per_second' : eval_count / eval_time if eval_time else 0.0,
+        'solved_generation' : solved_generation,
+        'time_to_solve' : time_to_solve
+    }
+
+def print_results(results : list[EncoderResult]):
+    print(f'{"encoder":<20}{"inputs":>8}{"conns":>10}{"evals/s":>12}{"solved at":>12}{"time (s)":>12}')
+    for result in results:
+        solved_text : str = 'never' if result['solved_generation'] is None else str(result['solved_generation'])
+        time_text : str = '-' if result['time_to_solve'] is None else f'{result["time_to_solve"]:.2f}'
+        print(f'{result["encoder"]:<20}{result["inputs"]:>8}{result["connections"]:>10.1f}{result["evals_per_second"]:>12.1f}'
+              f'{solved_text:>12}{time_text:>12}')
+
+if __name__ == '__main__':
+    map_name : str = sys.argv[1] if len(sys.argv) > 1 else 'map4'
+    generations : int = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    pop_size : int = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    the_map : bd_core.SavedMap = bd_core.load_map(map_name)
+    print_results([benchmark_encoder(encoder_name, the_map, generations, pop_size) for encoder_name in ENCODERS])
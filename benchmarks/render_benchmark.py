@@ -0,0 +1,137 @@
+'''Headless frame-time benchmark of the pygame front-end, runs on machines without a display (SDL dummy video driver).
+Each scenario starts a game mode with a START_GAME event and plays a scripted sequence of key presses and mouse clicks
+through the event queue for a fixed number of frames, with the frame cap removed. Reports frame-time percentiles per scenario.
+Run from the repository root:
+    python benchmarks/render_benchmark.py [--frames 600] [--warmup 30] [--only Player MapEditor ...] [--save results.json] [--trace trace.json]
+--trace records the frames with core.tracer and writes them as Chrome trace JSON.
+The Sim scenario trains from a fixed seed with checkpoints, the genome archive and run logs turned off, so its results do not
+depend on earlier runs and it leaves nothing behind under non_pygame/.'''
+import sys
+sys.path.append(".")
+import os
+#must be set before main.py opens the window
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+import argparse
+import json
+from time import perf_counter
+from typing import Any, Callable, TypedDict
+import pygame
+import main as game_main
+
+PLAYER_KEYS : list[int] = [pygame.K_RIGHT, pygame.K_RIGHT, pygame.K_LEFT, pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_UP, pygame.K_DOWN]
+EDITOR_KEYS : list[int] = [pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_0, pygame.K_4]
+CLICK_POSITIONS : list[tuple[int, int]] = [(x, y) for y in range(90, 480, 60) for x in range(70, 900, 65)]
+SEED : int = 7
+SIM_SETTINGS : dict[str, Any] = {'use_checkpoints' : False, 'resume_checkpoint' : False, 'use_genome_archive' : False,
+                                 'save_generation_replays' : False, 'write_run_log' : False, 'seed' : SEED}
+
+class Scenario(TypedDict):
+    name : str
+    start : dict[str, Any]|None
+    script : Callable[[int], list[pygame.Event]]
+
+class ScenarioResult(TypedDict):
+    name : str
+    state : str
+    frames : int
+    mean_ms : float
+    p50_ms : float
+    p90_ms : float
+    p99_ms : float
+    max_ms : float
+
+def key_press(key : int) -> pygame.Event:
+    return pygame.Event(pygame.KEYDOWN, key=key, mod=0, unicode='', scancode=0)
+
+def mouse_click(pos : tuple[int, int], button : int) -> pygame.Event:
+    return pygame.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=button, touch=False)
+
+def no_input(frame : int) -> list[pygame.Event]:
+    return []
+
+def player_script(frame : int) -> list[pygame.Event]:
+    if frame % 8: return []
+    return [key_press(PLAYER_KEYS[(frame // 8) % len(PLAYER_KEYS)])]
+
+def editor_script(frame : int) -> list[pygame.Event]:
+    '''Switches the placing mode every 30 frames and clicks a tile every 3 (right clicks erase).'''
+    events : list[pygame.Event] = []
+    if frame % 30 == 0: events.append(key_press(EDITOR_KEYS[(frame // 30) % len(EDITOR_KEYS)]))
+    if frame % 3 == 0: events.append(mouse_click(CLICK_POSITIONS[(frame // 3) % len(CLICK_POSITIONS)], 3 if frame % 15 == 0 else 1))
+    return events
+
+SCENARIOS : list[Scenario] = [
+    {'name' : 'Menu', 'start' : None, 'script' : no_input},
+    {'name' : 'Player', 'start' : {'mode' : 'Player', 'map_name' : 'level1'}, 'script' : player_script},
+    {'name' : 'MapEditor', 'start' : {'mode' : 'MapEditor'}, 'script' : editor_script},
+    {'name' : 'Sim', 'start' : {'mode' : 'Sim', 'sim_settings' : SIM_SETTINGS}, 'script' : no_input},
+    {'name' : 'Replay', 'start' : {'mode' : 'Replay'}, 'script' : no_input},
+]
+
+def get_percentile(sorted_times : list[float], share : float) -> float:
+    '''Nearest-rank percentile.'''
+    return sorted_times[min(len(sorted_times) - 1, max(0, round(share * len(sorted_times)) - 1))]
+
+def run_frames(script : Callable[[int], list[pygame.Event]], frame_count : int, first_frame : int = 0) -> list[float]:
+    '''Scripted events are posted to the event queue, so they reach core.event_manager the same way real input does
+    (along with the events the handlers post themselves, like Sprite.SPRITE_CLICKED).'''
+    frame_times : list[float] = []
+    for frame in range(first_frame, first_frame + frame_count):
+        for event in script(frame):
+            pygame.event.post(event)
+        start : float = perf_counter()
+        game_main.run_frame(pygame.event.get())
+        game_main.clock.tick()
+        frame_times.append(perf_counter() - start)
+    return frame_times
+
+def run_scenario(scenario : Scenario, frame_count : int, warmup : int) -> ScenarioResult:
+    core = game_main.core
+    if scenario['start'] is not None: pygame.event.post(pygame.Event(core.START_GAME, scenario['start']))
+    #the warmup frames include starting the mode
+    run_frames(scenario['script'], warmup)
+    frame_times : list[float] = sorted(run_frames(scenario['script'], frame_count, warmup))
+    state : str = type(core.game.state).__name__ if core.game.active else 'Menu'
+    if core.game.active:
+        pygame.event.post(pygame.Event(core.END_GAME))
+        run_frames(no_input, 2)
+    return {
+        'name' : scenario['name'],
+        'state' : state,
+        'frames' : frame_count,
+        'mean_ms' : sum(frame_times) / len(frame_times) * 1000,
+        'p50_ms' : get_percentile(frame_times, 0.5) * 1000,
+        'p90_ms' : get_percentile(frame_times, 0.9) * 1000,
+        'p99_ms' : get_percentile(frame_times, 0.99) * 1000,
+        'max_ms' : frame_times[-1] * 1000
+    }
+
+def print_results(results : list[ScenarioResult]):
+    print(f'{"scenario":<12}{"final state":<28}{"frames":>8}{"mean":>9}{"p50":>9}{"p90":>9}{"p99":>9}{"max":>9}{"fps":>9}')
+    for result in results:
+        print(f'{result["name"]:<12}{result["state"]:<28}{result["frames"]:>8}{result["mean_ms"]:>9.2f}{result["p50_ms"]:>9.2f}'
+              f'{result["p90_ms"]:>9.2f}{result["p99_ms"]:>9.2f}{result["max_ms"]:>9.2f}{1000 / result["mean_ms"]:>9.0f}')
+    print('(times in ms)')
+
+def main(argv : list[str]) -> int:
+    parser : argparse.ArgumentParser = argparse.ArgumentParser(description='Headless frame-time benchmark of the game modes.')
+    parser.add_argument('--frames', type=int, default=600, help='measured frames per scenario')
+    parser.add_argument('--warmup', type=int, default=30, help='frames run before measuring')
+    parser.add_argument('--only', nargs='+', choices=[scenario['name'] for scenario in SCENARIOS], default=None)
+    parser.add_argument('--save', default=None, help='write the results to this JSON file')
+    parser.add_argument('--trace', default=None, help='write a Chrome trace of the run to this file')
+    args : argparse.Namespace = parser.parse_args(argv)
+    if args.frames < 1 or args.warmup < 0: parser.error('--frames must be positive and --warmup not negative')
+    if args.trace is not None: game_main.core.tracer.enabled = True
+    results : list[ScenarioResult] = [run_scenario(scenario, args.frames, args.warmup) for scenario in SCENARIOS
+                                      if args.only is None or scenario['name'] in args.only]
+    print_results(results)
+    if args.trace is not None: print(f'Frame trace written to {game_main.core.tracer.dump(args.trace)}')
+    if args.save is not None:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump({'driver' : pygame.display.get_driver(), 'results' : results}, file, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,56 @@
+'''Times neat's default reproduction against ArrayReproduction on large populations with random fitnesses.
+Run from the repository root: python benchmarks/reproduction_benchmark.py [pop_size] [generations] [encoder]'''
+import sys
+sys.path.append(".")
+import random
+from time import perf_counter
+from typing import TypedDict
+import neat
+import non_pygame.block_dude_core as bd_core
+import non_pygame.ml_core as ml_core
+from non_pygame.reproduction import ArrayReproduction
+from non_pygame.species_sets import CachedSpeciesSet
+
+CONFIG_PATH : str = 'non_pygame/config-feedforward.txt'
+MAP_NAME : str = 'map4'
+SEED : int = 7
+
+class ReproductionResult(TypedDict):
+    reproduction : str
+    reproduce_times : list[float]
+    connections : float
+
+def benchmark_reproduction(reproduction_type : type[neat.DefaultReproduction], generations : int, pop_size : int,
+                           encoder_name : str) -> ReproductionResult:
+    random.seed(SEED)
+    ipop : ml_core.PopulationInterface = ml_core.get_pop_runner(CONFIG_PATH, bd_core.load_map(MAP_NAME), generations,
+                                                                 {'NEAT' : {'pop_size' : pop_size}}, encoder_name,
+                                                                 CachedSpeciesSet, reproduction_type)
+    pop : neat.Population = ipop.pop
+    reproduce_times : list[float] = []
+    for _ in range(generations):
+        #fitness does not matter here, only the amount of genes going through reproduction
+        for genome in pop.population.values(): genome.fitness = random.random()
+        start : float = perf_counter()
+        pop.population = pop.reproduction.reproduce(pop.config, pop.species, pop.config.pop_size, pop.generation)
+        reproduce_times.append(perf_counter() - start)
+        pop.species.speciate(pop.config, pop.population, pop.generation)
+        pop.generation += 1
+    return {
+        'reproduction' : reproduction_type.__name__,
+        'reproduce_times' : reproduce_times,
+        'connections' : sum(len(genome.connections) for genome in pop.population.values()) / len(pop.population)
+    }
+
+def print_results(results : list[ReproductionResult]):
+    print(f'{"reproduction":<24}{"mean (s)":>12}{"total (s)":>12}{"conns":>10}')
+    for result in results:
+        times : list[float] = result['reproduce_times']
+        print(f'{result["reproduction"]:<24}{sum(times) / len(times):>12.4f}{sum(times):>12.4f}{result["connections"]:>10.1f}')
+
+if __name__ == '__main__':
+    pop_size : int = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    generations : int = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    encoder_name : str = sys.argv[3] if len(sys.argv) > 3 else 'egocentric'
+    print_results([benchmark_reproduction(reproduction_type, generations, pop_size, encoder_name)
+                   for reproduction_type in (neat.DefaultReproduction, ArrayReproduction)])
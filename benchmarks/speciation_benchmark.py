@@ -0,0 +1,53 @@
+'''Compares neat's default speciation with CachedSpeciesSet, on the same seeded run.
+Run from the repository root: python benchmarks/speciation_benchmark.py [map_name] [generations] [pop_size] [encoder]'''
+import sys
+sys.path.append(".")
+import random
+from typing import TypedDict
+import non_pygame.block_dude_core as bd_core
+import non_pygame.ml_core as ml_core
+from non_pygame.species_sets import TimedSpeciesSet, CachedSpeciesSet
+
+CONFIG_PATH : str = 'non_pygame/config-feedforward.txt'
+SEED : int = 7
+
+class SpeciationResult(TypedDict):
+    species_set : str
+    speciate_times : list[float]
+    species_history : list[dict[int, int]]
+
+def benchmark_species_set(species_set_type : type[TimedSpeciesSet], the_map : bd_core.SavedMap, generations : int,
+                          pop_size : int, encoder_name : str) -> SpeciationResult:
+    random.seed(SEED)
+    ipop : ml_core.PopulationInterface = ml_core.get_pop_runner(CONFIG_PATH, the_map, generations, {'NEAT' : {'pop_size' : pop_size}},
+                                                                 encoder_name, species_set_type)
+    species_history : list[dict[int, int]] = []
+    ipop.start_running()
+    while True:
+        ipop.start_generation()
+        ml_core.eval_genomes(ipop.get_genome_list(), ipop.pop.config, the_map, compiler=ipop.network_compiler)
+        ipop.end_generation()
+        species_history.append(dict(ipop.pop.species.genome_to_species))
+        if ipop.isover(): break
+    return {
+        'species_set' : species_set_type.__name__,
+        'speciate_times' : ipop.pop.species.speciate_times,
+        'species_history' : species_history
+    }
+
+def print_results(results : list[SpeciationResult]):
+    print(f'{"species set":<20}{"mean (s)":>12}{"total (s)":>12}')
+    for result in results:
+        times : list[float] = result['speciate_times']
+        print(f'{result["species_set"]:<20}{sum(times) / len(times):>12.4f}{sum(times):>12.4f}')
+    same : bool = all(result['species_history'] == results[0]['species_history'] for result in results)
+    print('Species assignments match' if same else 'Species assignments DIFFER')
+
+if __name__ == '__main__':
+    map_name : str = sys.argv[1] if len(sys.argv) > 1 else 'map4'
+    generations : int = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    pop_size : int = int(sys.argv[3]) if len(sys.argv) > 3 else 400
+    encoder_name : str = sys.argv[4] if len(sys.argv) > 4 else ml_core.DEFAULT_ENCODER
+    the_map : bd_core.SavedMap = bd_core.load_map(map_name)
+    print_results([benchmark_species_set(species_set_type, the_map, generations, pop_size, encoder_name)
+                   for species_set_type in (TimedSpeciesSet, CachedSpeciesSet)])
@@ -15,6 +15,8 @@ from game.game_module import Game
 from core.task_scheduler import TaskScheduler
 from utils.tween_module import TweenTrack, TweenChain
 from utils.animation import AnimationTrack
+from utils.startup_report import StartupReport
+from utils.frame_tracer import FrameTracer
 import sys
 import platform
 from typing import Any
@@ -35,6 +37,7 @@ class Core:
         self.brightness_map = pygame.Surface((2000, 2000), pygame.SRCALPHA)
         pygame.draw.rect(self.brightness_map, (255, 255, 255, 0), (0,0, 2000, 2000))
         self.event_manager = EventManger()
+        self.tracer : FrameTracer = FrameTracer()
         self.make_connections()
 
         self.active_fingers : dict[int, tuple[float, float]] = {}
@@ -56,6 +59,7 @@ class Core:
         Timer.time_source = self.global_timer.get_time
 
         self.window_bools : dict = {'Shown' : True, 'input_focused' : True}
+        self.startup_report : StartupReport = StartupReport()
 
     def is_web(self) -> bool:
         return self.CURRENT_PLATFORM == WEBPLATFORM
@@ -113,6 +117,11 @@ class Core:
         self.event_manager.bind(pygame.FINGERDOWN, self.process_touch_event)
         self.event_manager.bind(pygame.FINGERMOTION, self.process_touch_event)
         self.event_manager.bind(pygame.FINGERUP, self.process_touch_event)
+        if self.tracer.enabled: self.event_manager.bind(pygame.KEYDOWN, self.handle_trace_key)
+
+    def handle_trace_key(self, event : pygame.Event):
+        if event.key != pygame.K_F9: return
+        print(f'Frame trace written to {self.tracer.dump()}')
     
     def process_touch_event(self, event : pygame.Event):
         if event.type == pygame.FINGERDOWN:
@@ -184,12 +193,16 @@ class Core:
 
 
     def update(self):
-        self.task_scheduler.update()
-        TweenTrack.update_all()
-        TweenChain.update_all()
+        with self.tracer.span('core.task_scheduler'):
+            self.task_scheduler.update()
+        with self.tracer.span('core.tweens'):
+            TweenTrack.update_all()
+            TweenChain.update_all()
         self.update_delta_stream()
-        self.bg_manager.update()
-        AnimationTrack.update_all_elements()
+        with self.tracer.span('core.bg_manager'):
+            self.bg_manager.update()
+        with self.tracer.span('core.animations'):
+            AnimationTrack.update_all_elements()
     
     def update_delta_stream(self):
         target_lentgh = round(30 / self.dt)
@@ -3,6 +3,10 @@ import json
 import os
 from typing import Any, TypedDict
 from utils.helpers import AnyJson
+import non_pygame.block_dude_core as bd_core
+from non_pygame.map_index import MapIndex
+import pygame
+from game.map_thumbnails import ThumbnailCache
 
 
 if PLATFORM == 'emscripten':
@@ -12,10 +16,46 @@ class GameData(TypedDict):
     pass
 
 class GameStorage:
+    map_index : MapIndex|None = None
+    thumbnails : ThumbnailCache|None = None
+
+    @staticmethod
+    def get_map_index() -> MapIndex:
+        '''The index is kept on disk (non_pygame/map_index.json), refreshing it only re-reads the map files that changed.'''
+        if GameStorage.map_index is None: GameStorage.map_index = MapIndex()
+        GameStorage.map_index.refresh()
+        return GameStorage.map_index
+
     @staticmethod
     def get_maplist() -> list[str]:
-        for root, dirs, files in os.walk('non_pygame/maps'):
-            return [file_name.removesuffix('.json') for file_name in files if file_name.endswith('.json')]
+        return GameStorage.get_map_index().get_names()
+
+    @staticmethod
+    def load_map(map_name : str) -> bd_core.SavedMap|None:
+        saved_map : bd_core.SavedMap|None = GameStorage.map_index.load(map_name) if GameStorage.map_index is not None else None
+        return saved_map if saved_map is not None else bd_core.load_map(map_name)
+
+    @staticmethod
+    def get_thumbnail_key(map_name : str) -> str|None:
+        if GameStorage.map_index is None: return None
+        entry = GameStorage.map_index.get_entry(map_name)
+        return None if entry is None else entry['thumbnail']
+
+    @staticmethod
+    def request_thumbnail(map_name : str) -> pygame.Surface|None:
+        '''Returns the map's thumbnail if it is ready, otherwise has it rendered in the background (see poll_thumbnails).'''
+        key : str|None = GameStorage.get_thumbnail_key(map_name)
+        if key is None: return None
+        if GameStorage.thumbnails is None: GameStorage.thumbnails = ThumbnailCache()
+        surface : pygame.Surface|None = GameStorage.thumbnails.get(key)
+        if surface is not None or key in GameStorage.thumbnails.pending or key in GameStorage.thumbnails.failed: return surface
+        saved_map : bd_core.SavedMap|None = GameStorage.load_map(map_name)
+        return None if saved_map is None else GameStorage.thumbnails.request(key, saved_map)
+
+    @staticmethod
+    def poll_thumbnails() -> list[str]:
+        '''Thumbnail keys that became ready since the last call.'''
+        return [] if GameStorage.thumbnails is None else GameStorage.thumbnails.poll()
     
     '''Most of these functions are incomplete and need implementing.\nThis module is made to handle file I/O and saving on multiple platforms.'''
     def __init__(self) -> None:
@@ -10,6 +10,7 @@ from utils.ui.brightness_overlay import BrightnessOverlay
 from math import floor
 from utils.helpers import ColorType
 from typing import Callable
+from game.map_thumbnails import THUMBNAIL_SIZE
 
 class BaseMenu:
     font_40 = pygame.font.Font(r'assets/fonts/Pixeltype.ttf', 40)
@@ -185,6 +186,8 @@ class Menu(BaseMenu):
     font_60 = pygame.font.Font(r'assets/fonts/Pixeltype.ttf', 60)
     font_70 = pygame.font.Font(r'assets/fonts/Pixeltype.ttf', 70)
     font_150 = pygame.font.Font(r'assets/fonts/Pixeltype.ttf', 150)
+    THUMBNAIL_PLACEHOLDER : pygame.Surface = pygame.Surface(THUMBNAIL_SIZE)
+    THUMBNAIL_PLACEHOLDER.fill((74, 102, 128))
     
     def init(self):
         window_size = core_object.main_display.get_size()
@@ -214,6 +217,8 @@ class Menu(BaseMenu):
         match self.stage:
             case 1:
                 pass
+            case 2:
+                self.update_stage2_thumbnails()
     
     def get_maplist(self) -> list[str]:
         return sorted(core_object.storage.get_maplist())
@@ -245,6 +250,7 @@ class Menu(BaseMenu):
         else:
             maps_used = maplist[start_index:]
         return_value : list[UiSprite] = []
+        stage_data['thumbnails'] = []
         current_x : int = 200
         current_y : int = 100
         for map_name in maps_used:
@@ -254,6 +260,14 @@ class Menu(BaseMenu):
                                                              (current_x, current_y-60), name=f'title_{map_name}')
             return_value.append(new_button)
             return_value.append(new_text_sprite)
+            #thumbnails that are not rendered yet show a placeholder, swapped in update_stage2_thumbnails
+            thumbnail_key : str|None = core_object.storage.get_thumbnail_key(map_name)
+            thumbnail : pygame.Surface|None = core_object.storage.request_thumbnail(map_name)
+            thumbnail_anchor : tuple[int, int] = (current_x + 70, current_y - 30)
+            thumbnail_sprite = UiSprite(thumbnail if thumbnail is not None else Menu.THUMBNAIL_PLACEHOLDER, None, 0, f'thumbnail_{map_name}')
+            thumbnail_sprite.rect.midleft = thumbnail_anchor
+            return_value.append(thumbnail_sprite)
+            if thumbnail is None and thumbnail_key is not None: stage_data['thumbnails'].append((thumbnail_key, thumbnail_sprite, thumbnail_anchor))
             if current_x > 200:
                 current_y += 150
                 current_x = 200
@@ -261,6 +275,16 @@ class Menu(BaseMenu):
                 current_x = 760
         return return_value
 
+    def update_stage2_thumbnails(self):
+        ready : list[str] = core_object.storage.poll_thumbnails()
+        if not ready: return
+        waiting : list[tuple[str, UiSprite, tuple[int, int]]] = self.stage_data[2].get('thumbnails', [])
+        for key, sprite, anchor in waiting:
+            if key not in ready: continue
+            sprite.surf = core_object.storage.thumbnails.get(key)
+            sprite.rect = sprite.surf.get_rect(midleft=anchor)
+        self.stage_data[2]['thumbnails'] = [item for item in waiting if item[0] not in ready]
+
     def clear_stage2_sprites(self):
         stage_data = self.stage_data[2]
         for sprite in stage_data['extra_sprites']:
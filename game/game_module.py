@@ -1,12 +1,10 @@
 import pygame
-from typing import Any
+from typing import Any, TypedDict
+from time import perf_counter
 from math import floor
 from random import shuffle, choice
 import random
 import os
-import neat
-import neat.config
-import non_pygame.ml_core as ml_core
 import non_pygame.block_dude_core as bd_core
 import utils.tween_module as TweenModule
 from utils.ui.ui_sprite import UiSprite
@@ -19,6 +17,32 @@ from game.sprite import Sprite
 from utils.helpers import average, random_float
 from utils.ui.brightness_overlay import BrightnessOverlay
 from game.game_states import GameState, GameStates
+import game.game_states as game_states
+
+class SimSettings(TypedDict):
+    map_name : str
+    encoder_name : str
+    use_novelty_search : bool
+    save_generation_replays : bool
+    use_genome_archive : bool
+    use_checkpoints : bool
+    #continue the last unfinished run of this map and encoder instead of starting a new one
+    resume_checkpoint : bool
+    write_run_log : bool
+    seed : int|None
+
+#a START_GAME event for the Sim mode can override any of these with a sim_settings dict (see benchmarks/render_benchmark.py)
+DEFAULT_SIM_SETTINGS : SimSettings = {
+    'map_name' : 'level2',
+    'encoder_name' : 'full',
+    'use_novelty_search' : False,
+    'save_generation_replays' : False,
+    'use_genome_archive' : False,
+    'use_checkpoints' : True,
+    'resume_checkpoint' : False,
+    'write_run_log' : True,
+    'seed' : None
+}
 
 class Game:
     font_40 = pygame.Font('assets/fonts/Pixeltype.ttf', 40)
@@ -42,23 +66,49 @@ class Game:
         self.game_data = {}
         self.make_connections()
         mode : str = event.mode
+        mode_start : float = perf_counter()
+        #neat, numpy and the training modules are only needed by these modes, so they are not imported before one starts
+        if mode in ('Sim', 'Replay', 'Replay_F'): simulation_imports()
 
         if mode == 'test':
             self.state = self.STATES.TestGameState(self)
         elif mode == 'MapEditor':
             self.state = self.STATES.MapEditorGameState(self)
         elif mode == 'Sim':
-            MAP_NAME : str = 'level2'
+            settings : SimSettings = {**DEFAULT_SIM_SETTINGS, **getattr(event, 'sim_settings', {})}
+            seed : int|None = settings['seed']
             config_path : str = "non_pygame/config-feedforward.txt"
-            map_used = bd_core.load_map(MAP_NAME)
-            ml_core.modify_config(config_path, map_used)
-            config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
-            pop : neat.Population = neat.Population(config)
-            ipop : ml_core.PopulationInterface = ml_core.PopulationInterface(pop, gens=3000)
+            map_used = bd_core.load_map(settings['map_name'])
+            config = ml_core.make_config(config_path, map_used, encoder_name=settings['encoder_name'])
+            archive : GenomeArchive|None = GenomeArchive(map_used) if settings['use_genome_archive'] else None
+            checkpoint_directory : str = f'{CHECKPOINT_DIRECTORY}/{settings["map_name"]}_{settings["encoder_name"]}'
+            checkpointer : Checkpointer|None = Checkpointer(checkpoint_directory) if settings['use_checkpoints'] else None
+
+            def make_runner() -> ml_core.PopulationInterface:
+                pop : neat.Population = ml_core.make_population(config, seed)
+                novelty_search : NoveltySearch|None = NoveltySearch() if settings['use_novelty_search'] else None
+                runner : ml_core.PopulationInterface = ml_core.PopulationInterface(pop, gens=3000, novelty_search=novelty_search, archive=archive,
+                                                                                   checkpointer=checkpointer, seed=seed)
+                if settings['write_run_log']: pop.add_reporter(RunLogReporter(population_interface=runner))
+                if settings['save_generation_replays']: pop.add_reporter(ReplayReporter(f'non_pygame/replays/{settings["map_name"]}', map_used))
+                return runner
+
+            ipop : ml_core.PopulationInterface = make_runner()
+            if checkpointer is not None and settings['resume_checkpoint']:
+                try:
+                    if restore_checkpoint(ipop, checkpoint_directory, checkpointer) and ipop.isover():
+                        raise ValueError(f'The run in {checkpoint_directory} already finished')
+                except Exception as error:
+                    #a snapshot that is finished, taken with another config or unreadable is dropped and the run starts over
+                    print(f'Starting a new run : {error}')
+                    checkpointer.clear()
+                    ipop = make_runner()
+            elif checkpointer is not None:
+                checkpointer.clear()
             self.state = self.STATES.SimulationGameState(self, ipop, config, map_used)
             pass
         elif mode == 'Replay':
-            replay : ml_core.GenomeReplay|None = ml_core.load_replay('non_pygame/winners/winner1')
+            replay : CompactReplay|None = replays.load_any_replay('non_pygame/winners/winner1')
             if replay is None:
                 self.alert_player('Replay was not found!')
                 event.mode = 'Sim'
@@ -66,7 +116,7 @@ class Game:
                 return
             self.state = self.STATES.ShowcaseGameState(self, replay)
         elif mode == 'Replay_F':
-            replay : ml_core.GenomeReplay|None = ml_core.load_replay('non_pygame/winners/failure')
+            replay : CompactReplay|None = replays.load_any_replay('non_pygame/winners/failure')
             if replay is None:
                 self.alert_player('Replay was not found!')
                 self.start_game('Sim')
@@ -75,7 +125,8 @@ class Game:
         
         elif mode == 'Player':
             map_name : str = event.map_name
-            self.state = self.STATES.PlayingGameState(self, bd_core.load_map(map_name))
+            self.state = self.STATES.PlayingGameState(self, core_object.storage.load_map(map_name))
+        core_object.startup_report.mark(f'{mode} mode', mode_start)
         
     def alert_player(self, text : str, alert_speed : float = 1):
         text_sprite = TextSprite(pygame.Vector2(core_object.main_display.get_width() // 2, 90), 'midtop', 0, text, 
@@ -150,6 +201,7 @@ class Game:
 
     def cleanup(self):
         #Cleanup basic variables
+        if self.state is not None: self.state.cleanup()
         self.active = False
         self.state = None
         self.game_timer = None
@@ -175,3 +227,17 @@ class Game:
 
         
     
+
+def simulation_imports():
+    global neat, ml_core, replays, NoveltySearch, RunLogReporter, GenomeArchive, Checkpointer, restore_checkpoint, CHECKPOINT_DIRECTORY
+    global CompactReplay, ReplayReporter
+    import neat
+    import neat.config
+    import non_pygame.ml_core as ml_core
+    from non_pygame.novelty import NoveltySearch
+    from non_pygame.run_log import RunLogReporter
+    from non_pygame.genome_archive import GenomeArchive
+    from non_pygame.checkpoints import Checkpointer, restore_checkpoint, CHECKPOINT_DIRECTORY
+    import non_pygame.replays as replays
+    from non_pygame.replays import CompactReplay, ReplayReporter
+    game_states.simulation_imports()
@@ -6,12 +6,8 @@ from random import shuffle, choice
 import random
 import json
 from enum import Enum, IntEnum
-from collections import deque
 from non_pygame.block_dude_core import CellType, save_map, load_map
 import non_pygame.block_dude_core as bd_core
-from non_pygame.ml_core import PopulationInterface
-import non_pygame.ml_core as ml_core
-import neat
 import utils.tween_module as TweenModule
 from utils.ui.ui_sprite import UiSprite
 from utils.ui.textbox import TextBox
@@ -42,6 +38,10 @@ class GameState:
     def handle_mouse_event(self, event : pygame.Event):
         pass
 
+    def cleanup(self):
+        '''Called when the game ends while this state is active.'''
+        pass
+
 class NormalGameState(GameState):
     def main_logic(self, delta : float):
         Sprite.update_all_sprites(delta)
@@ -165,7 +165,7 @@ class MapEditorGameState(NormalGameState):
         self.cursor.surf = pygame.transform.scale(Tile.TEXTURES[CellType(new_mode.value)], (50, 50))
 
 class SimulationGameState(NormalGameState):
-    def __init__(self, game_object : 'Game', sim_runner : PopulationInterface, config : neat.Config, map_used : 'SavedMap'):
+    def __init__(self, game_object : 'Game', sim_runner : 'PopulationInterface', config : 'neat.Config', map_used : 'SavedMap'):
         super().__init__(game_object)
         self.text_sprite_cycle_timer : Timer = Timer(0.5, self.game.game_timer.get_time)
         self.current_amount_of_dots : int = 2
@@ -190,7 +190,10 @@ class SimulationGameState(NormalGameState):
         self.config : neat.Config = config
         self.map_used : SavedMap = map_used
         self.update_phase : int = 0
-        self.genome_evaluator : ml_core.GenomeEvaluator = ml_core.GenomeEvaluator(self.sim_runner.get_genome_list(), self.config, self.map_used)
+        self.genome_evaluator : ml_core.GenomeEvaluator = ml_core.GenomeEvaluator(self.sim_runner.get_genome_list(), self.config, self.map_used,
+                                                                         compiler=self.sim_runner.network_compiler,
+                                                                         max_turns=self.sim_runner.get_turn_budget(self.map_used),
+                                                                         profiler=self.sim_runner.profiler)
      
         
 
@@ -206,29 +209,46 @@ class SimulationGameState(NormalGameState):
         self.continue_sim(total_budget)
         if self.sim_runner.isover():
             winner = self.sim_runner.end_run()
-            replay : ml_core.GenomeReplay = {'config' : self.config, 'genome' : winner, 'map_used' : self.map_used, 'net_used' : winner.net_used}
+            self.close_run(finished=True)
+            replay : CompactReplay = replays.make_replay(winner, self.config, self.map_used)
             Sprite.kill_all_sprites()
             core_object.main_ui.clear_all()
-            self.game.alert_player(f'{winner.fitness}')
+            self.game.alert_player(f'{ml_core.get_objective_fitness(winner)}')
             core_object.game.state = ShowcaseGameState(self.game, replay)
     
+    def cleanup(self):
+        #an unfinished run keeps its last snapshot, to be resumed with the resume_checkpoint Sim setting
+        self.close_run(finished=False)
+
+    def close_run(self, finished : bool):
+        '''Waits for the snapshot being written and closes the archive. A finished run (solved or out of generations) has its
+        snapshots deleted, so it is never resumed.'''
+        checkpointer = self.sim_runner.checkpointer
+        if checkpointer is not None:
+            checkpointer.close()
+            if finished: checkpointer.clear()
+        if self.sim_runner.archive is not None: self.sim_runner.archive.close()
+
     def handle_key_event(self, event : pygame.Event):
         super().handle_key_event(event)
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_s:
                 genome = self.sim_runner.current_best_genome
-                ml_core.save_replay('non_pygame/winners/failure', 
-                                    {'config' : self.config, 'genome' : genome, 'map_used' : self.map_used, 'net_used' : genome.net_used})
+                replays.save_compact_replay('non_pygame/winners/failure.json', replays.make_replay(genome, self.config, self.map_used))
 
     def continue_sim(self, frame_budget : float):
         timer : Timer = Timer(frame_budget, time_source=perf_counter)
         while not timer.isover():
             if self.genome_evaluator.isover():
+                self.sim_runner.report_dedup(self.genome_evaluator.deduplicator)
                 self.sim_runner.end_generation()
                 self.update_progress_sprite()
                 if self.sim_runner.isover(): return
-                self.genome_evaluator = ml_core.GenomeEvaluator(self.sim_runner.get_genome_list(), self.config, self.map_used)
                 self.sim_runner.start_generation()
+                self.genome_evaluator = ml_core.GenomeEvaluator(self.sim_runner.get_genome_list(), self.config, self.map_used,
+                                                                compiler=self.sim_runner.network_compiler,
+                                                                max_turns=self.sim_runner.get_turn_budget(self.map_used),
+                                                                profiler=self.sim_runner.profiler)
             self.genome_evaluator.do_genome()
             if self.genome_evaluator.isover():
                 pass
@@ -249,26 +269,23 @@ class SimulationGameState(NormalGameState):
         self.progress_sprite.text = the_text
         self.progress_sprite.rect = self.progress_sprite.surf.get_rect(bottomleft=(25, 515))
 
-        the_text2 : str = f'Best Fitness : {self.sim_runner.current_best_genome.fitness}'
+        the_text2 : str = f'Best Fitness : {ml_core.get_objective_fitness(self.sim_runner.current_best_genome)}'
         self.fitness_sprite.text = the_text2
         self.fitness_sprite.rect = self.fitness_sprite.surf.get_rect(bottomright = (935, 515))
 
 class ShowcaseGameState(NormalGameState):
-    MAX_TURNS : int = 100
-    def __init__(self, game_object : 'Game', replay : ml_core.GenomeReplay):
+    def __init__(self, game_object : 'Game', replay : 'CompactReplay'):
         super().__init__(game_object)
-        self.genome = replay['genome']
-        self.map_used = replay['map_used']
-        self.config = replay['config']
+        self.replay : CompactReplay = replay
+        self.map_used : SavedMap = replay['map']
+        #the recorded actions are played back directly, no network has to run
+        self.replay_actions : list[int] = replays.get_actions(replay)
         self.current_turn : int = 0
         self.player : bd_core.Game = bd_core.Game.from_saved_map(self.map_used, copy_map=True)
-        self.net = replay.get('net_used', None) or neat.nn.FeedForwardNetwork.create(self.genome, self.config)
         self.visual_map : TileMap = TileMap.spawn((480, 270), self.map_used, 75)
         self.visual_map.synchronise_with_player(self.player)
         self.action_timer : Timer = Timer(0.25, time_source=core_object.game.game_timer.get_time)
         self.first_frame : bool = True
-        self.state_stream : deque[bd_core.GameState] = deque([self.player.to_game_state()], maxlen=15)
-        self.action_stream : deque[int] = deque([], maxlen=14)
     
     def main_logic(self, delta : float):
         super().main_logic(delta)
@@ -283,46 +300,20 @@ class ShowcaseGameState(NormalGameState):
 
     
     def take_player_action(self):
-        verifications, actions = self.player.get_binds()
-        output : list[float] = self.net.activate([*ml_core.flatten_map_gen(self.player.map), self.player.player_x, self.player.player_y, 
-                                                    self.player.player_direction, self.player.player_holding_block])
-        output_dict : dict[int, float] = {i : output[i] for i in range(len(output))}
-        sorted_output = ml_core.sort_dict_by_values(output_dict, reverse=True)
-        duped_actions : list[int] = []
-        for action, game_state in zip(self.action_stream, self.state_stream):
-            if self.player == game_state:
-                print('dupe', bd_core.ActionType(action).name)
-                duped_actions.append(action)
-                break
-        took_action : bool = False
-        for action_type in sorted_output:
-            if action_type in duped_actions: continue
-            if not verifications[action_type](): continue
-            actions[action_type]()
-            print('going', bd_core.ActionType(action_type).name)
-            took_action = True
-            break
-        if not took_action:
-            for action_type in sorted_output:
-                if not verifications[action_type](): continue
+        if self.current_turn < len(self.replay_actions):
+            verifications, actions = self.player.get_binds()
+            action_type : int = self.replay_actions[self.current_turn]
+            if verifications[action_type]():
                 actions[action_type]()
                 print('going', bd_core.ActionType(action_type).name)
-                took_action = True
-                break
-        if len(self.state_stream) >= self.state_stream.maxlen: self.state_stream.popleft()
-        self.state_stream.append(self.player.to_game_state())
-        if len(self.action_stream) >= self.action_stream.maxlen: self.action_stream.popleft()
-        self.action_stream.append(action_type)
-        self.current_turn += 1
+            self.current_turn += 1
         if self.player.game_won():
             self.game.alert_player("GG!")
             self.game.state = ShowcaseOverGameState(self.game)
-            replay : ml_core.GenomeReplay = {'config' : self.config, 'genome' : self.genome, 'map_used' : self.map_used, 'net_used' : self.net}
-            ml_core.save_replay('non_pygame/winners/winner1', replay)
-        elif self.current_turn >= self.MAX_TURNS:
+            replays.save_compact_replay('non_pygame/winners/winner1.json', self.replay)
+        elif self.current_turn >= len(self.replay_actions):
             self.game.alert_player("It ran out of time...")
             self.game.state = ShowcaseOverGameState(self.game)
-            #ml_core.show_genome_playing(self.genome, self.config, 5, 40, 'It ran out of time...', self.map_used)
 
 class ShowcaseOverGameState(NormalGameState):
     def __init__(self, game_object):
@@ -449,6 +440,9 @@ class PausedGameState(GameState):
             if event.key == pygame.K_p:
                 self.unpause()
 
+    def cleanup(self):
+        self.previous_state.cleanup()
+
 def runtime_imports():
     global Game
     from game.game_module import Game
@@ -464,6 +458,15 @@ def runtime_imports():
     import game.map_sprites
     from game.map_sprites import TileMap, Tile, SavedMap
 
+def simulation_imports():
+    '''Imported by Game.start_game for the modes that need them, they are the slowest part of startup.'''
+    global neat, ml_core, replays, PopulationInterface, CompactReplay
+    import neat
+    import non_pygame.ml_core as ml_core
+    from non_pygame.ml_core import PopulationInterface
+    import non_pygame.replays as replays
+    from non_pygame.replays import CompactReplay
+
 class GameStates:
     NormalGameState = NormalGameState
     MapEditorGameState = MapEditorGameState
@@ -12,21 +12,34 @@ import non_pygame.block_dude_core as bd_core
 class Tile(Sprite):
     active_elements : list['Tile'] = []
     inactive_elements : list['Tile'] = []
-    BRICK_TEXTURE : pygame.Surface = pygame.image.load('assets/graphics/tilemap/brick.jpg').convert()
-    DOOR_TEXTURE : pygame.Surface = load_alpha_to_colorkey('assets/graphics/tilemap/door_green_colorkey.png', (0, 255, 0))
-    PLAYER_TEXTURE : pygame.Surface = load_alpha_to_colorkey('assets/graphics/tilemap/player1_thick.png', (0, 255, 0))
-    PLAYER_TEXTURE_MIRRORED : pygame.Surface = load_alpha_to_colorkey('assets/graphics/tilemap/player1_thick_mirrored.png', (0, 255, 0))
-    EMPTY_TEXTURE : pygame.Surface = pygame.surface.Surface((300, 300))
-    EMPTY_TEXTURE.fill((125, 125, 125))
-    BLOCK_TEXTURE : pygame.Surface = pygame.surface.Surface((300, 300))
-    BLOCK_TEXTURE.fill((205, 205, 205))
-    TEXTURES : dict[CellType, pygame.Surface] = {
-        CellType.EMPTY : EMPTY_TEXTURE,
-        CellType.BLOCK : BLOCK_TEXTURE,
-        CellType.DOOR : DOOR_TEXTURE,
-        CellType.BRICK : BRICK_TEXTURE,
-        CellType.PLAYER : PLAYER_TEXTURE
-    }
+    #textures are loaded by init_map_sprites, when the first map is shown
+    BRICK_TEXTURE : pygame.Surface
+    DOOR_TEXTURE : pygame.Surface
+    PLAYER_TEXTURE : pygame.Surface
+    PLAYER_TEXTURE_MIRRORED : pygame.Surface
+    EMPTY_TEXTURE : pygame.Surface
+    BLOCK_TEXTURE : pygame.Surface
+    TEXTURES : dict[CellType, pygame.Surface] = {}
+    POOL_SIZE : int = 500
+
+    @classmethod
+    def load_textures(cls):
+        cls.BRICK_TEXTURE = pygame.image.load('assets/graphics/tilemap/brick.jpg').convert()
+        cls.DOOR_TEXTURE = load_alpha_to_colorkey('assets/graphics/tilemap/door_green_colorkey.png', (0, 255, 0))
+        cls.PLAYER_TEXTURE = load_alpha_to_colorkey('assets/graphics/tilemap/player1_thick.png', (0, 255, 0))
+        cls.PLAYER_TEXTURE_MIRRORED = load_alpha_to_colorkey('assets/graphics/tilemap/player1_thick_mirrored.png', (0, 255, 0))
+        cls.EMPTY_TEXTURE = pygame.surface.Surface((300, 300))
+        cls.EMPTY_TEXTURE.fill((125, 125, 125))
+        cls.BLOCK_TEXTURE = pygame.surface.Surface((300, 300))
+        cls.BLOCK_TEXTURE.fill((205, 205, 205))
+        cls.TEXTURES = {
+            CellType.EMPTY : cls.EMPTY_TEXTURE,
+            CellType.BLOCK : cls.BLOCK_TEXTURE,
+            CellType.DOOR : cls.DOOR_TEXTURE,
+            CellType.BRICK : cls.BRICK_TEXTURE,
+            CellType.PLAYER : cls.PLAYER_TEXTURE
+        }
+
     def __init__(self) -> None:
         super().__init__()
         self.tile_type : CellType
@@ -87,8 +100,6 @@ class Tile(Sprite):
         self.zindex = None
 
 Sprite.register_class(Tile)
-for _ in range(500):
-    Tile()
 
 class TileMap(Sprite):
     active_elements : list['TileMap'] = []
@@ -106,6 +117,7 @@ class TileMap(Sprite):
 
     @classmethod
     def spawn(cls, center : tuple[float, float], starting_map : SavedMap, map_scale : int) -> 'TileMap':
+        init_map_sprites()
         element = cls.inactive_elements[0]
 
         element.image = cls.NOTHING_SURF
@@ -215,5 +227,11 @@ class TileMap(Sprite):
         self._position = pygame.Vector2(0,0)
         self.zindex = None
 
-for _ in range(1):
-    TileMap()
\ No newline at end of file
+def init_map_sprites():
+    '''Loads the tile textures and fills the sprite pools the first time a map is shown, so the menu does not wait for them.'''
+    if Tile.TEXTURES: return
+    Tile.load_textures()
+    for _ in range(Tile.POOL_SIZE):
+        Tile()
+    for _ in range(1):
+        TileMap()
@@ -0,0 +1,212 @@
+'''Map thumbnails for the map browser, rendered once at small scale and kept in PNG atlas pages keyed by map content hash
+(the thumbnail key of the map index). Rendering and atlas writes happen on a background thread that owns the atlas;
+the main thread only queues maps and picks up finished thumbnails in poll(), so drawing them costs one blit.'''
+import json
+import os
+import queue
+import sys
+import threading
+from typing import TypedDict
+import pygame
+from non_pygame.block_dude_core import CellType, SavedMap, get_map_size
+
+THUMBNAIL_DIRECTORY : str = 'assets/cache/thumbnails'
+THUMBNAIL_SIZE : tuple[int, int] = (120, 60)
+ATLAS_COLUMNS : int = 8
+ATLAS_ROWS : int = 8
+ATLAS_VERSION : int = 1
+#texture key of the player facing right
+PLAYER_MIRRORED : int = -1
+
+class AtlasSlot(TypedDict):
+    page : int
+    slot : int
+    width : int
+    height : int
+
+class AtlasFile(TypedDict):
+    version : int
+    slot_width : int
+    slot_height : int
+    slots : dict[str, AtlasSlot]
+
+def load_on_empty(path : str, empty : pygame.Surface) -> pygame.Surface:
+    image : pygame.Surface = pygame.image.load(path)
+    image.set_colorkey((0, 255, 0))
+    surface : pygame.Surface = empty.copy()
+    surface.blit(pygame.transform.scale(image, surface.get_size()), (0, 0))
+    return surface
+
+def load_cell_textures() -> dict[int, pygame.Surface]:
+    '''The same textures as map_sprites.Tile, loaded without convert() so this works off the main thread and without a display.'''
+    empty : pygame.Surface = pygame.Surface((300, 300))
+    empty.fill((125, 125, 125))
+    block : pygame.Surface = pygame.Surface((300, 300))
+    block.fill((205, 205, 205))
+    return {CellType.EMPTY : empty, CellType.BRICK : pygame.image.load('assets/graphics/tilemap/brick.jpg'), CellType.BLOCK : block,
+            CellType.DOOR : load_on_empty('assets/graphics/tilemap/door_green_colorkey.png', empty),
+            CellType.PLAYER : load_on_empty('assets/graphics/tilemap/player1_thick.png', empty),
+            PLAYER_MIRRORED : load_on_empty('assets/graphics/tilemap/player1_thick_mirrored.png', empty)}
+
+class ThumbnailRenderer:
+    def __init__(self, size : tuple[int, int] = THUMBNAIL_SIZE):
+        self.size : tuple[int, int] = size
+        self.textures : dict[int, pygame.Surface]|None = None
+        self.scaled_textures : dict[tuple[int, int], pygame.Surface] = {}
+
+    def get_texture(self, cell : int, cell_size : int) -> pygame.Surface:
+        texture : pygame.Surface|None = self.scaled_textures.get((cell, cell_size), None)
+        if texture is None:
+            if self.textures is None: self.textures = load_cell_textures()
+            texture = pygame.transform.smoothscale(self.textures[cell], (cell_size, cell_size))
+            self.scaled_textures[(cell, cell_size)] = texture
+        return texture
+
+    def render(self, saved_map : SavedMap) -> pygame.Surface:
+        '''The map at the biggest whole cell size that fits in size, with the player drawn at its start (facing left or right).'''
+        width, height = get_map_size(saved_map)
+        cell_size : int = max(1, min(self.size[0] // width, self.size[1] // height))
+        surface : pygame.Surface = pygame.Surface((cell_size * width, cell_size * height))
+        for y, row in enumerate(saved_map['map']):
+            for x, cell in enumerate(row):
+                surface.blit(self.get_texture(cell, cell_size), (x * cell_size, y * cell_size))
+        player : pygame.Surface = self.get_texture(PLAYER_MIRRORED if saved_map['start_direction'] == 1 else CellType.PLAYER, cell_size)
+        surface.blit(player, (saved_map['start_x'] * cell_size, saved_map['start_y'] * cell_size))
+        return surface
+
+class ThumbnailCache:
+    '''request() returns the thumbnail if it is ready, otherwise queues the map for the background thread
+    (started on the first request). Finished thumbnails are handed over by poll(), to be called once per frame.
+    Without threads (the web build) request() renders the thumbnail straight away and poll() saves the atlas.'''
+    def __init__(self, directory : str = THUMBNAIL_DIRECTORY, size : tuple[int, int] = THUMBNAIL_SIZE, threaded : bool|None = None):
+        self.directory : str = directory
+        self.size : tuple[int, int] = size
+        self.threaded : bool = sys.platform != 'emscripten' if threaded is None else threaded
+        self.surfaces : dict[str, pygame.Surface] = {}
+        self.pending : set[str] = set()
+        self.failed : set[str] = set()
+        self.requests : queue.Queue[tuple[str, SavedMap]|None] = queue.Queue()
+        self.results : queue.Queue[tuple[str, pygame.Surface|None]] = queue.Queue()
+        self.thread : threading.Thread|None = None
+        #owned by the background thread (or the main thread when there is none)
+        self.renderer : ThumbnailRenderer|None = None
+        self.atlas : AtlasFile|None = None
+        self.pages : dict[int, pygame.Surface] = {}
+        self.dirty_pages : set[int] = set()
+
+    def get(self, key : str) -> pygame.Surface|None:
+        return self.surfaces.get(key, None)
+
+    def request(self, key : str, saved_map : SavedMap) -> pygame.Surface|None:
+        surface : pygame.Surface|None = self.surfaces.get(key, None)
+        if surface is not None or key in self.pending or key in self.failed: return surface
+        self.pending.add(key)
+        if not self.threaded:
+            self.process(key, saved_map)
+            return None
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.work, name='thumbnails', daemon=True)
+            self.thread.start()
+        self.requests.put((key, saved_map))
+        return None
+
+    def poll(self) -> list[str]:
+        '''Keys of the thumbnails that became ready since the last call (the ones that failed are left out, they keep their placeholder).'''
+        ready : list[str] = []
+        while True:
+            try:
+                key, surface = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.discard(key)
+            if surface is None:
+                self.failed.add(key)
+                continue
+            self.surfaces[key] = surface.convert() if pygame.display.get_surface() is not None else surface
+            ready.append(key)
+        if not self.threaded: self.save()
+        return ready
+
+    def close(self):
+        if self.thread is None: return
+        self.requests.put(None)
+        self.thread.join()
+        self.thread = None
+
+    #everything below runs on the background thread, which is the only one touching the atlas
+    def work(self):
+        while True:
+            request : tuple[str, SavedMap]|None = self.requests.get()
+            if request is None: break
+            self.process(*request)
+            #the atlas is saved once the queue runs dry, not after every thumbnail of a page
+            if self.requests.empty(): self.save()
+        self.save()
+
+    def process(self, key : str, saved_map : SavedMap):
+        '''Always posts a result, None when the thumbnail could not be made, so the key never stays pending.'''
+        try:
+            surface : pygame.Surface|None = self.make_thumbnail(key, saved_map)
+        except Exception as error:
+            print(f'Could not make the thumbnail {key} : {type(error).__name__}: {error}')
+            surface = None
+        self.results.put((key, surface))
+
+    def make_thumbnail(self, key : str, saved_map : SavedMap) -> pygame.Surface:
+        if self.atlas is None: self.atlas = self.read_atlas()
+        if self.renderer is None: self.renderer = ThumbnailRenderer(self.size)
+        slot : AtlasSlot|None = self.atlas['slots'].get(key, None)
+        if slot is not None:
+            return self.get_page(self.pages, slot['page']).subsurface(self.get_slot_rect(slot)).copy()
+        surface : pygame.Surface = self.renderer.render(saved_map)
+        slot_index : int = len(self.atlas['slots'])
+        slot = {'page' : slot_index // (ATLAS_COLUMNS * ATLAS_ROWS), 'slot' : slot_index % (ATLAS_COLUMNS * ATLAS_ROWS),
+                'width' : surface.get_width(), 'height' : surface.get_height()}
+        self.get_page(self.pages, slot['page']).blit(surface, self.get_slot_rect(slot))
+        self.atlas['slots'][key] = slot
+        self.dirty_pages.add(slot['page'])
+        return surface
+
+    def save(self):
+        if not self.dirty_pages or self.atlas is None: return
+        try:
+            self.write_atlas(self.atlas, self.pages, self.dirty_pages)
+        except (OSError, pygame.error) as error:
+            #the thumbnails stay usable for this session, they are rendered again next time
+            print(f'Could not save the thumbnail atlas : {error}')
+        self.dirty_pages.clear()
+
+    def get_slot_rect(self, slot : AtlasSlot) -> pygame.Rect:
+        return pygame.Rect((slot['slot'] % ATLAS_COLUMNS) * self.size[0], (slot['slot'] // ATLAS_COLUMNS) * self.size[1], slot['width'], slot['height'])
+
+    def get_page_path(self, page_index : int) -> str:
+        return os.path.join(self.directory, f'atlas_{page_index}.png')
+
+    def get_page(self, pages : dict[int, pygame.Surface], page_index : int) -> pygame.Surface:
+        page : pygame.Surface|None = pages.get(page_index, None)
+        if page is not None: return page
+        page = pygame.Surface((self.size[0] * ATLAS_COLUMNS, self.size[1] * ATLAS_ROWS))
+        if os.path.exists(self.get_page_path(page_index)): page.blit(pygame.image.load(self.get_page_path(page_index)), (0, 0))
+        pages[page_index] = page
+        return page
+
+    def read_atlas(self) -> AtlasFile:
+        try:
+            with open(os.path.join(self.directory, 'atlas.json'), 'r', encoding='utf-8') as file:
+                atlas : AtlasFile = json.load(file)
+            if atlas['version'] == ATLAS_VERSION and (atlas['slot_width'], atlas['slot_height']) == self.size: return atlas
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        return {'version' : ATLAS_VERSION, 'slot_width' : self.size[0], 'slot_height' : self.size[1], 'slots' : {}}
+
+    def write_atlas(self, atlas : AtlasFile, pages : dict[int, pygame.Surface], dirty_pages : set[int]):
+        '''Pages are written before the slots pointing into them.'''
+        os.makedirs(self.directory, exist_ok=True)
+        for page_index in dirty_pages:
+            temporary_path : str = os.path.join(self.directory, f'atlas_{page_index}.tmp.png')
+            pygame.image.save(pages[page_index], temporary_path)
+            os.replace(temporary_path, self.get_page_path(page_index))
+        temporary_path = os.path.join(self.directory, 'atlas.json.tmp')
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(atlas, file, separators=(',', ':'))
+        os.replace(temporary_path, os.path.join(self.directory, 'atlas.json'))
@@ -1,5 +1,11 @@
 import pygame
 import asyncio
+import sys
+from time import perf_counter
+
+STARTUP_START : float = perf_counter()
+#imported by pygame itself rather than by the game (upstream pygame pulls in numpy for pygame.surfarray)
+PRELOADED_MODULES : set[str] = set(sys.modules)
 
 pygame.init()
 
@@ -13,8 +19,11 @@ window = pygame.display.set_mode(window_size)
 pygame.mixer.set_num_channels(32)
 
 from core.core import Core, core_object
+from utils.startup_report import StartupReport
 
 core = core_object
+core.startup_report = StartupReport(STARTUP_START, preloaded_modules=PRELOADED_MODULES)
+core.startup_report.mark('pygame and core')
 core.init(window)
 core.FPS = 120
 if core.is_web(): core.setup_web(1)
@@ -39,6 +48,7 @@ import utils.tween_module as TweenModule
 from game.test_player import TestPlayer
 
 TestPlayer()
+core.startup_report.mark('ui and sprite modules')
 
 core.settings.set_defualt({'Brightness' : 0})
 core.settings.load()
@@ -48,10 +58,12 @@ if core.is_web():
     core.storage.load_from_web()
 else:
     core.storage.load_from_file()
+core.startup_report.mark('settings and storage')
 core.menu.init()
 core.game.init()
 import game.game_states as game_state_module
 game_state_module.runtime_imports()
+core.startup_report.mark('menu and game init')
 
 clock = pygame.Clock()
 font_40 = pygame.font.Font('assets/fonts/Pixeltype.ttf', 40)
@@ -107,36 +119,52 @@ cycle_timer = Timer(0.1, core_object.global_timer.get_time)
 
 setup_debug_sprites()
 
-async def main():
-    while 1:
+def run_frame(events : list[pygame.Event]):
+    '''One frame of the main loop, without the frame cap (used as is by benchmarks/render_benchmark.py).'''
+    tracer = core.tracer
+    with tracer.span('frame'):
         core.update_dt(60)
-        for event in pygame.event.get():
-            core.event_manager.process_event(event)
+        with tracer.span('events'):
+            for event in events:
+                core.event_manager.process_event(event)
 
         if core.game.active == False:
-            window.fill(core.menu.bg_color)
-            core.menu.update(core.dt)
-            core.menu.render(window)
+            with tracer.span('menu.update'):
+                window.fill(core.menu.bg_color)
+                core.menu.update(core.dt)
+            with tracer.span('menu.render'):
+                core.menu.render(window)
         else:
-            core.game.update(core.dt)
+            with tracer.span('game.update'):
+                core.game.update(core.dt)
 
             window.fill((94,129,162))    
-            Sprite.draw_all_sprites(window)
-            core.main_ui.update()
-            core.main_ui.render(window)
-
-        core.update()
+            with tracer.span('sprite.draw_all_sprites'):
+                Sprite.draw_all_sprites(window)
+            with tracer.span('ui.update'):
+                core.main_ui.update()
+            with tracer.span('ui.render'):
+                core.main_ui.render(window)
+
+        with tracer.span('core.update'):
+            core.update()
         if cycle_timer.isover(): 
             fps_sprite.text = f'FPS : {core.get_fps():0.0f}'
             cycle_timer.restart()
         if core.settings.info['Brightness'] != 0:
-            window.blit(core.brightness_map, (0,0), special_flags=core.brightness_map_blend_mode)
+            with tracer.span('brightness'):
+                window.blit(core.brightness_map, (0,0), special_flags=core.brightness_map_blend_mode)
             
-        pygame.display.update()
-        core.frame_counter += 1
+        with tracer.span('display.update'):
+            pygame.display.update()
+    if core.frame_counter == 0: core.startup_report.finish()
+    core.frame_counter += 1
+
+async def main():
+    while 1:
+        run_frame(pygame.event.get())
         clock.tick(core.FPS)
         await asyncio.sleep(0)
 
-asyncio.run(main())
-
-
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,6 +1,9 @@
-from typing import TypeAlias, TypedDict, Callable, Union
+from typing import TypeAlias, TypedDict, Callable, Union, NotRequired
 from enum import Enum, IntEnum
 import json
+import math
+import mmap
+import struct
 import os
 from sys import exit
 import sys
@@ -32,6 +35,7 @@ class SavedMap(TypedDict):
     start_x : int
     start_y : int
     start_direction : int
+    optimal_length : NotRequired[int]
 
 class GameState(TypedDict):
     map : GameMap
@@ -97,8 +101,168 @@ def save_map(file_path : str, map : SavedMap) -> bool:
         file.write(f'],\n')
         file.write(f'"start_x" : {map["start_x"]},\n')
         file.write(f'"start_y" : {map["start_y"]},\n')
-        file.write(f'"start_direction" : {map["start_direction"]}\n')
+        if 'optimal_length' in map:
+            file.write(f'"start_direction" : {map["start_direction"]},\n')
+            file.write(f'"optimal_length" : {map["optimal_length"]}\n')
+        else:
+            file.write(f'"start_direction" : {map["start_direction"]}\n')
         file.write('\t}')
+
+#Binary map packs: a header, count fixed-size records (metadata then the cells, 2 bits each), an index of
+#(record offset, name offset, name length) and the utf-8 names. Records are read straight out of an mmap.
+MAP_PACK_MAGIC : bytes = b'BDMPACK\x00'
+MAP_PACK_VERSION : int = 1
+MAP_PACK_HEADER : struct.Struct = struct.Struct('<8sHHIQQQ')
+#width, height, start_x, start_y, start_direction, door_x, door_y, flags, optimal_length, difficulty
+MAP_RECORD_META : struct.Struct = struct.Struct('<BBBBbBBBHf')
+MAP_INDEX_ENTRY : struct.Struct = struct.Struct('<QIH')
+HAS_OPTIMAL_LENGTH : int = 1
+#every byte holds 4 cells, first cell in the low bits
+_unpacked_bytes : list[tuple[int, int, int, int]] = [(byte & 3, (byte >> 2) & 3, (byte >> 4) & 3, byte >> 6) for byte in range(256)]
+
+class MapInfo(TypedDict):
+    name : str
+    width : int
+    height : int
+    start_x : int
+    start_y : int
+    start_direction : int
+    door_x : int
+    door_y : int
+    optimal_length : int|None
+    difficulty : float
+
+def get_map_difficulty(map : SavedMap) -> float:
+    '''Optimal length plus 4 turns per block on the map, NaN when the optimal length is unknown.'''
+    if 'optimal_length' not in map: return math.nan
+    return map['optimal_length'] + 4 * sum(row.count(CellType.BLOCK) for row in map['map'])
+
+def pack_cells(map : GameMap, size : int) -> bytes:
+    cells : list[int] = [cell for row in map for cell in row]
+    if any(cell > CellType.DOOR for cell in cells): raise InvalidMapError('Only empty, brick, block and door cells can be packed!')
+    cells += [0] * (-len(cells) % 4)
+    packed : bytes = bytes(cells[i] | (cells[i + 1] << 2) | (cells[i + 2] << 4) | (cells[i + 3] << 6) for i in range(0, len(cells), 4))
+    return packed.ljust(size, b'\x00')
+
+def write_map_pack(file_path : str, named_maps : list[tuple[str, SavedMap]], difficulty : Callable[[SavedMap], float] = get_map_difficulty):
+    '''Every record is as big as the biggest map's, so record i sits at a fixed offset.'''
+    cell_bytes : int = max(((len(map['map']) * len(map['map'][0]) + 3) // 4 for _, map in named_maps), default=0)
+    record_size : int = MAP_RECORD_META.size + cell_bytes
+    records_offset : int = MAP_PACK_HEADER.size
+    index_offset : int = records_offset + record_size * len(named_maps)
+    names_offset : int = index_offset + MAP_INDEX_ENTRY.size * len(named_maps)
+    records : list[bytes] = []
+    index : list[bytes] = []
+    names : list[bytes] = []
+    name_position : int = 0
+    for position, (name, map) in enumerate(named_maps):
+        validate_map(map['map'], raise_errors=True)
+        width, height = get_map_size(map)
+        door_x, door_y = next((x, y) for y, row in enumerate(map['map']) for x, cell in enumerate(row) if cell == CellType.DOOR)
+        has_length : bool = 'optimal_length' in map
+        records.append(MAP_RECORD_META.pack(width, height, map['start_x'], map['start_y'], map['start_direction'], door_x, door_y,
+                                            HAS_OPTIMAL_LENGTH if has_length else 0, map['optimal_length'] if has_length else 0, difficulty(map))
+                       + pack_cells(map['map'], cell_bytes))
+        encoded_name : bytes = name.encode('utf-8')
+        index.append(MAP_INDEX_ENTRY.pack(records_offset + position * record_size, name_position, len(encoded_name)))
+        names.append(encoded_name)
+        name_position += len(encoded_name)
+    temporary_path : str = f'{file_path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(MAP_PACK_HEADER.pack(MAP_PACK_MAGIC, MAP_PACK_VERSION, record_size, len(named_maps), records_offset, index_offset, names_offset))
+        file.write(b''.join(records))
+        file.write(b''.join(index))
+        file.write(b''.join(names))
+    os.replace(temporary_path, file_path)
+
+class MapPack:
+    '''Read-only view of a binary map pack. Nothing is read up front: metadata is unpacked in place from the mmap
+    and a map's cells are only decoded when the map itself is asked for.'''
+    def __init__(self, file_path : str):
+        self.file = open(file_path, 'rb')
+        self.data : mmap.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.record_size, self.count, self.records_offset, self.index_offset, self.names_offset = MAP_PACK_HEADER.unpack_from(self.data, 0)
+        if magic != MAP_PACK_MAGIC: raise InvalidMapError(f'{file_path} is not a map pack')
+        if version > MAP_PACK_VERSION: raise InvalidMapError(f'{file_path} is a version {version} map pack, this version only reads up to {MAP_PACK_VERSION}')
+        self.name_positions : dict[str, int]|None = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get_record_offset(self, index : int) -> int:
+        if index < 0: index += self.count
+        if not 0 <= index < self.count: raise IndexError(index)
+        return MAP_INDEX_ENTRY.unpack_from(self.data, self.index_offset + index * MAP_INDEX_ENTRY.size)[0]
+
+    def get_name(self, index : int) -> str:
+        if index < 0: index += self.count
+        if not 0 <= index < self.count: raise IndexError(index)
+        _, name_position, name_length = MAP_INDEX_ENTRY.unpack_from(self.data, self.index_offset + index * MAP_INDEX_ENTRY.size)
+        start : int = self.names_offset + name_position
+        return self.data[start:start + name_length].decode('utf-8')
+
+    def get_info(self, index : int) -> MapInfo:
+        (width, height, start_x, start_y, start_direction, door_x, door_y, flags,
+         optimal_length, difficulty) = MAP_RECORD_META.unpack_from(self.data, self.get_record_offset(index))
+        return {'name' : self.get_name(index), 'width' : width, 'height' : height, 'start_x' : start_x, 'start_y' : start_y,
+                'start_direction' : start_direction, 'door_x' : door_x, 'door_y' : door_y,
+                'optimal_length' : optimal_length if flags & HAS_OPTIMAL_LENGTH else None, 'difficulty' : difficulty}
+
+    def get_cells(self, index : int) -> memoryview:
+        '''The packed cells of a map, without copying them out of the file.'''
+        offset : int = self.get_record_offset(index) + MAP_RECORD_META.size
+        return memoryview(self.data)[offset:offset + self.record_size - MAP_RECORD_META.size]
+
+    def __getitem__(self, index : int) -> SavedMap:
+        offset : int = self.get_record_offset(index)
+        width, height, start_x, start_y, start_direction, _, _, flags, optimal_length, _ = MAP_RECORD_META.unpack_from(self.data, offset)
+        cell_start : int = offset + MAP_RECORD_META.size
+        cells : list[int] = []
+        for byte in self.data[cell_start:cell_start + (width * height + 3) // 4]:
+            cells += _unpacked_bytes[byte]
+        map : SavedMap = {'map' : [cells[y * width:(y + 1) * width] for y in range(height)], 'start_x' : start_x, 'start_y' : start_y,
+                          'start_direction' : start_direction}
+        if flags & HAS_OPTIMAL_LENGTH: map['optimal_length'] = optimal_length
+        return map
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def get_index(self, name : str) -> int|None:
+        if self.name_positions is None: self.name_positions = {self.get_name(index) : index for index in range(self.count)}
+        return self.name_positions.get(name, None)
+
+    def load(self, name : str) -> SavedMap|None:
+        index : int|None = self.get_index(name)
+        return None if index is None else self[index]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self) -> 'MapPack':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def json_maps_to_pack(directory : str, file_path : str):
+    '''Packs every .json map of directory, named after their file.'''
+    names : list[str] = sorted(os.path.splitext(file_name)[0] for file_name in os.listdir(directory) if file_name.endswith('.json'))
+    named_maps : list[tuple[str, SavedMap]] = []
+    for name in names:
+        with open(os.path.join(directory, f'{name}.json'), 'r') as file:
+            named_maps.append((name, json.load(file)))
+    write_map_pack(file_path, named_maps)
+
+def pack_to_json_maps(file_path : str, directory : str):
+    '''Writes every map of the pack back as directory/<name>.json, with save_map.'''
+    os.makedirs(directory, exist_ok=True)
+    with MapPack(file_path) as pack:
+        for index in range(len(pack)):
+            save_map(os.path.join(directory, f'{pack.get_name(index)}.json'), pack[index])
+
 class Game:
     def __init__(self, starting_map : list[list[int]], start_player_pos : list[int, int], start_orientation : int = 1):
         if not validate_map(starting_map): raise InvalidMapError('Map isnt valid!')
@@ -391,9 +555,14 @@ def interactive_test():
                 clear_console()
                 print("Illegal Move!")
 
-TEST_MAP : SavedMap = load_map('map_test')
-TEST_MAP2 : SavedMap = load_map('map_test2')
-MAP3 : SavedMap = load_map('map3')
+#test maps, loaded on first access instead of at import
+LAZY_MAPS : dict[str, str] = {'TEST_MAP' : 'map_test', 'TEST_MAP2' : 'map_test2', 'MAP3' : 'map3'}
+
+def __getattr__(name : str) -> SavedMap:
+    if name not in LAZY_MAPS: raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    saved_map : SavedMap = load_map(LAZY_MAPS[name])
+    globals()[name] = saved_map
+    return saved_map
 
 if __name__ == '__main__':
     interactive_test()
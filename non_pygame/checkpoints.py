@@ -0,0 +1,284 @@
+'''Checkpoint and resume for PopulationInterface.
+A snapshot only writes the genomes that no earlier snapshot holds (genomes never change once created, elites are the same object),
+plus a small state file: species, counters, the random state and the bookkeeping of the interface. Files are written by a
+background thread (inline on the web build, which has no threads), and every snapshot is complete on disk before the previous
+one's files are deleted.'''
+import sys
+sys.path.append(".")
+import glob
+import os
+import pickle
+import random
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import count
+from time import perf_counter
+from typing import Any, NotRequired, TypedDict
+import neat
+from six import iteritems, itervalues
+from non_pygame.genome_archive import get_config_hash
+
+CHECKPOINT_VERSION : int = 1
+CHECKPOINT_DIRECTORY : str = 'non_pygame/checkpoints'
+
+#key, node genes, connection genes (every gene attribute, in the gene type's order)
+EncodedGenome = tuple[int, list[tuple], list[tuple]]
+
+class SpeciesState(TypedDict):
+    key : int
+    created : int
+    last_improved : int
+    representative : int
+    members : list[int]
+    fitness : float|None
+    adjusted_fitness : float|None
+    fitness_history : list[float]
+
+class EvaluatedGenome(TypedDict):
+    fitness : float|None
+    objective_fitness : NotRequired[float]
+    behaviour : NotRequired[tuple[float, ...]]
+    actions_played : NotRequired[list[int]]
+    turns_played : NotRequired[int]
+
+class CheckpointState(TypedDict):
+    version : int
+    config_hash : str
+    chunks : list[str]
+    generation : int
+    current_generation : int
+    random_state : tuple
+    population : list[int]
+    fitnesses : dict[int, float|None]
+    species : list[SpeciesState]
+    species_indexer : int
+    genome_indexer : int
+    node_indexer : int|None
+    ancestors : dict[int, tuple]
+    best_genome : int|None
+    current_best_genome : int|None
+    evaluated : dict[int, EvaluatedGenome]
+    turn_budget_history : list[int]
+    novelty_archive : list[tuple[float, ...]]|None
+    novelty_added_count : int
+
+def peek_counter(counter : count) -> tuple[int, count]:
+    '''Next value of an itertools.count, and a fresh counter in the same position to replace it with.'''
+    value : int = next(counter)
+    return value, count(value)
+
+def encode_genome_genes(genome : neat.DefaultGenome) -> EncodedGenome:
+    nodes : list[tuple] = [tuple(getattr(gene, attribute.name) for attribute in gene._gene_attributes) for gene in itervalues(genome.nodes)]
+    node_keys : list[int] = list(genome.nodes)
+    connections : list[tuple] = [(gene.key,) + tuple(getattr(gene, attribute.name) for attribute in gene._gene_attributes)
+                                 for gene in itervalues(genome.connections)]
+    return (genome.key, [(key,) + node for key, node in zip(node_keys, nodes)], connections)
+
+def decode_genome_genes(encoded : EncodedGenome, config : neat.Config) -> neat.DefaultGenome:
+    genome_config = config.genome_config
+    key, nodes, connections = encoded
+    genome : neat.DefaultGenome = config.genome_type(key)
+    for node in nodes:
+        gene = genome_config.node_gene_type(node[0])
+        for attribute, value in zip(gene._gene_attributes, node[1:]):
+            setattr(gene, attribute.name, value)
+        genome.nodes[node[0]] = gene
+    for connection in connections:
+        gene = genome_config.connection_gene_type(connection[0])
+        for attribute, value in zip(gene._gene_attributes, connection[1:]):
+            setattr(gene, attribute.name, value)
+        genome.connections[connection[0]] = gene
+    return genome
+
+def get_evaluation(genome : neat.DefaultGenome) -> EvaluatedGenome:
+    evaluation : EvaluatedGenome = {'fitness' : genome.fitness}
+    for attribute in ('objective_fitness', 'behaviour', 'actions_played', 'turns_played'):
+        if hasattr(genome, attribute): evaluation[attribute] = getattr(genome, attribute)
+    return evaluation
+
+def write_file(file_path : str, data : Any):
+    #written next to the target then renamed, so a crash never leaves a half written snapshot behind
+    temporary_path : str = f'{file_path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        #gene keys repeat across genomes, the fastest zlib level already takes a third off
+        file.write(zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), 1))
+    os.replace(temporary_path, file_path)
+
+def read_file(file_path : str) -> Any:
+    with open(file_path, 'rb') as file:
+        return pickle.loads(zlib.decompress(file.read()))
+
+class Checkpointer:
+    '''Takes a snapshot every every_generations generations or every_seconds seconds, whichever comes first (None turns a trigger off).
+    Once more than max_chunks genome files pile up, the next snapshot writes every live genome again and the older files are deleted.
+    Without threads (threaded defaults to off on the web build) snapshots are written straight away by save().'''
+    def __init__(self, directory : str, every_generations : int|None = 10, every_seconds : float|None = 300.0, max_chunks : int = 20,
+                 threaded : bool|None = None):
+        self.directory : str = directory
+        self.every_generations : int|None = every_generations
+        self.every_seconds : float|None = every_seconds
+        self.max_chunks : int = max_chunks
+        self.written_keys : set[int] = set()
+        self.chunks : list[str] = []
+        self.last_generation : int = 0
+        self.last_time : float = perf_counter()
+        self.threaded : bool = sys.platform != 'emscripten' if threaded is None else threaded
+        self.executor : ThreadPoolExecutor|None = ThreadPoolExecutor(max_workers=1, thread_name_prefix='checkpointer') if self.threaded else None
+        self.pending : Future|None = None
+        os.makedirs(directory, exist_ok=True)
+
+    def maybe_save(self, ipop : 'PopulationInterface'):
+        generation : int = ipop.pop.generation
+        if self.every_generations is not None and generation - self.last_generation >= self.every_generations:
+            self.save(ipop)
+        elif self.every_seconds is not None and perf_counter() - self.last_time >= self.every_seconds:
+            self.save(ipop)
+
+    def save(self, ipop : 'PopulationInterface'):
+        '''Collects the state on the calling thread (so it is consistent), then hands the encoding and writing to the background thread.'''
+        pop : neat.Population = ipop.pop
+        self.last_generation = pop.generation
+        self.last_time = perf_counter()
+        live : dict[int, neat.DefaultGenome] = dict(pop.population)
+        for s in itervalues(pop.species.species):
+            live[s.representative.key] = s.representative
+        for genome in (pop.best_genome, ipop.current_best_genome):
+            if genome is not None: live[genome.key] = genome
+        if len(self.chunks) >= self.max_chunks:
+            self.written_keys = set()
+            self.chunks = []
+        #genomes never change once created, so they are encoded on the background thread (their fitness is kept in the state)
+        new_genomes : list[neat.DefaultGenome] = [genome for key, genome in iteritems(live) if key not in self.written_keys]
+        self.written_keys.update(live)
+        chunk_name : str = f'genomes_{pop.generation}.pickle'
+        self.chunks.append(chunk_name)
+
+        species_indexer, pop.species.indexer = peek_counter(pop.species.indexer)
+        genome_indexer, pop.reproduction.genome_indexer = peek_counter(pop.reproduction.genome_indexer)
+        node_indexer : int|None = None
+        if pop.config.genome_config.node_indexer is not None:
+            node_indexer, pop.config.genome_config.node_indexer = peek_counter(pop.config.genome_config.node_indexer)
+        novelty_archive = ipop.novelty_search.archive if ipop.novelty_search is not None else None
+        state : CheckpointState = {
+            'version' : CHECKPOINT_VERSION,
+            'config_hash' : get_config_hash(pop.config),
+            'chunks' : list(self.chunks),
+            'generation' : pop.generation,
+            'current_generation' : ipop.current_generation,
+            'random_state' : random.getstate(),
+            'population' : list(pop.population),
+            'fitnesses' : {key : genome.fitness for key, genome in iteritems(live)},
+            'species' : [{'key' : s.key, 'created' : s.created, 'last_improved' : s.last_improved, 'representative' : s.representative.key,
+                          'members' : list(s.members), 'fitness' : s.fitness, 'adjusted_fitness' : s.adjusted_fitness,
+                          'fitness_history' : list(s.fitness_history)} for s in itervalues(pop.species.species)],
+            'species_indexer' : species_indexer,
+            'genome_indexer' : genome_indexer,
+            'node_indexer' : node_indexer,
+            #only the current population can be a parent, which is all NetworkCompiler looks up
+            'ancestors' : {key : pop.reproduction.ancestors[key] for key in pop.population if key in pop.reproduction.ancestors},
+            'best_genome' : None if pop.best_genome is None else pop.best_genome.key,
+            'current_best_genome' : None if ipop.current_best_genome is None else ipop.current_best_genome.key,
+            'evaluated' : {genome.key : get_evaluation(genome) for genome in (pop.best_genome, ipop.current_best_genome) if genome is not None},
+            'turn_budget_history' : list(ipop.turn_budget_history),
+            'novelty_archive' : None if novelty_archive is None else list(novelty_archive.behaviours),
+            'novelty_added_count' : 0 if novelty_archive is None else novelty_archive.added_count,
+        }
+        if self.executor is None:
+            self.write_snapshot(chunk_name, new_genomes, state, None)
+            return
+        previous : Future|None = self.pending
+        self.pending = self.executor.submit(self.write_snapshot, chunk_name, new_genomes, state, previous)
+
+    def write_snapshot(self, chunk_name : str, new_genomes : list[neat.DefaultGenome], state : CheckpointState, previous : Future|None):
+        if previous is not None: previous.result()
+        write_file(os.path.join(self.directory, chunk_name), [encode_genome_genes(genome) for genome in new_genomes])
+        write_file(os.path.join(self.directory, f'state_{state["generation"]}.pickle'), state)
+        #the new state is on disk, everything it does not need can go
+        for path in glob.glob(os.path.join(self.directory, 'state_*.pickle')):
+            if os.path.basename(path) != f'state_{state["generation"]}.pickle': os.remove(path)
+        for path in glob.glob(os.path.join(self.directory, 'genomes_*.pickle')):
+            if os.path.basename(path) not in state['chunks']: os.remove(path)
+
+    def wait(self):
+        '''Blocks until every snapshot handed to the background thread is written, and raises the error if one failed.'''
+        if self.pending is not None: self.pending.result()
+
+    def close(self):
+        self.wait()
+        if self.executor is not None: self.executor.shutdown()
+
+    def clear(self):
+        '''Deletes every snapshot in the directory (once the pending one is written), for runs that start fresh or are finished.'''
+        self.wait()
+        for path in glob.glob(os.path.join(self.directory, 'state_*.pickle')) + glob.glob(os.path.join(self.directory, 'genomes_*.pickle')):
+            os.remove(path)
+        self.written_keys = set()
+        self.chunks = []
+
+def load_state(directory : str) -> CheckpointState|None:
+    paths : list[str] = glob.glob(os.path.join(directory, 'state_*.pickle'))
+    if not paths: return None
+    latest : str = max(paths, key=lambda path: int(os.path.basename(path)[len('state_'):-len('.pickle')]))
+    state : CheckpointState = read_file(latest)
+    if state['version'] > CHECKPOINT_VERSION:
+        raise ValueError(f'{latest} is a version {state["version"]} checkpoint, this version only reads up to {CHECKPOINT_VERSION}')
+    return state
+
+def restore_checkpoint(ipop : 'PopulationInterface', directory : str, checkpointer : Checkpointer|None = None) -> bool:
+    '''Puts the run saved in directory back into ipop (built with the same config), random state included, so it continues
+    exactly as it would have. Returns False when there is no checkpoint. Pass the run's checkpointer so it keeps writing
+    incremental snapshots on top of the restored files.'''
+    state : CheckpointState|None = load_state(directory)
+    if state is None: return False
+    pop : neat.Population = ipop.pop
+    config : neat.Config = pop.config
+    if state['config_hash'] != get_config_hash(config):
+        raise ValueError(f'The checkpoint in {directory} was saved with a different config')
+    encoded : dict[int, EncodedGenome] = {}
+    for chunk_name in state['chunks']:
+        for encoded_genome in read_file(os.path.join(directory, chunk_name)):
+            encoded[encoded_genome[0]] = encoded_genome
+    genomes : dict[int, neat.DefaultGenome] = {}
+    for key, fitness in iteritems(state['fitnesses']):
+        genome : neat.DefaultGenome = decode_genome_genes(encoded[key], config)
+        genome.fitness = fitness
+        for attribute, value in iteritems(state['evaluated'].get(key, {})):
+            setattr(genome, attribute, value)
+        genomes[key] = genome
+
+    pop.population = {key : genomes[key] for key in state['population']}
+    pop.generation = state['generation']
+    pop.best_genome = None if state['best_genome'] is None else genomes[state['best_genome']]
+    species_set = pop.species
+    species_set.species = {}
+    species_set.genome_to_species = {}
+    for species_state in state['species']:
+        s : neat.species.Species = neat.species.Species(species_state['key'], species_state['created'])
+        s.last_improved = species_state['last_improved']
+        s.representative = genomes[species_state['representative']]
+        s.members = {key : genomes[key] for key in species_state['members']}
+        s.fitness = species_state['fitness']
+        s.adjusted_fitness = species_state['adjusted_fitness']
+        s.fitness_history = species_state['fitness_history']
+        species_set.species[s.key] = s
+        for key in s.members:
+            species_set.genome_to_species[key] = s.key
+    species_set.indexer = count(state['species_indexer'])
+    pop.reproduction.genome_indexer = count(state['genome_indexer'])
+    pop.reproduction.ancestors = dict(state['ancestors'])
+    config.genome_config.node_indexer = None if state['node_indexer'] is None else count(state['node_indexer'])
+
+    ipop.current_generation = state['current_generation']
+    ipop.current_best_genome = None if state['current_best_genome'] is None else genomes[state['current_best_genome']]
+    ipop.turn_budget_history = list(state['turn_budget_history'])
+    if ipop.novelty_search is not None and state['novelty_archive'] is not None:
+        ipop.novelty_search.archive.behaviours.clear()
+        ipop.novelty_search.archive.behaviours.extend(tuple(behaviour) for behaviour in state['novelty_archive'])
+        ipop.novelty_search.archive.added_count = state['novelty_added_count']
+    random.setstate(state['random_state'])
+    if checkpointer is not None:
+        checkpointer.chunks = list(state['chunks'])
+        checkpointer.written_keys = set(encoded)
+        checkpointer.last_generation = pop.generation
+    pop.reporters.info(f'Resumed from the checkpoint of generation {pop.generation} in {directory}')
+    return True
@@ -0,0 +1,205 @@
+'''Curriculum training: genomes are evaluated on several maps and get their mean fitness over the maps unlocked so far.
+Maps are ordered by optimal solution length, and the next one is unlocked once enough of the population wins the hardest unlocked map.
+Results are cached per genome and map, so genomes carried over to the next generation are not played again on maps they were already played on.
+Run from the repository root: python non_pygame/curriculum.py [--maps level1 map3 ... | --pack pack_directory] [--generations 300] [--workers 4] [--seed 1]'''
+import sys
+sys.path.append(".")
+import argparse
+import glob
+import os
+from typing import TypedDict
+import neat
+from six import iteritems, itervalues
+import non_pygame.block_dude_core as bd_core
+import non_pygame.ml_core as ml_core
+from non_pygame.novelty import Behaviour
+from non_pygame.replays import play_actions
+from non_pygame.solver import get_optimal_length
+from non_pygame.encoders import get_encoder_input_size
+from non_pygame.map_generator import iter_map_pack
+
+#the full map encoder's input size depends on the map size, the egocentric ones work on any map
+CURRICULUM_ENCODER : str = 'egocentric'
+
+class CurriculumMap(TypedDict):
+    name : str
+    map : bd_core.SavedMap
+    optimal_length : int|None
+
+class MapResult(TypedDict):
+    fitness : float
+    behaviour : Behaviour
+    actions : list[int]
+    turns : int
+    won : bool
+    max_turns : int
+
+def load_curriculum_maps(map_names : list[str]|None = None) -> list[CurriculumMap]:
+    '''The maps (every map in non_pygame/maps by default), easiest first. Maps the solver cannot solve come last.'''
+    if map_names is None: map_names = [os.path.splitext(os.path.basename(path))[0] for path in sorted(glob.glob('non_pygame/maps/*.json'))]
+    maps : list[CurriculumMap] = []
+    for map_name in map_names:
+        saved_map : bd_core.SavedMap|None = bd_core.load_map(map_name)
+        if saved_map is None: raise FileNotFoundError(f'Map {map_name} does not exist')
+        maps.append({'name' : map_name, 'map' : saved_map, 'optimal_length' : get_optimal_length(saved_map)})
+    maps.sort(key=lambda curriculum_map: (curriculum_map['optimal_length'] is None, curriculum_map['optimal_length'] or 0))
+    return maps
+
+def load_pack_curriculum(path : str, limit : int|None = None) -> list[CurriculumMap]:
+    '''The first limit maps of a generated map pack directory (see map_generator.py) or of a binary map pack file, easiest first.
+    Packs store each map's optimal length.'''
+    maps : list[CurriculumMap] = []
+    if os.path.isfile(path):
+        with bd_core.MapPack(path) as pack:
+            for index in range(len(pack) if limit is None else min(limit, len(pack))):
+                saved_map : bd_core.SavedMap = pack[index]
+                maps.append({'name' : pack.get_name(index), 'map' : saved_map, 'optimal_length' : saved_map.get('optimal_length', None)})
+    else:
+        pack_name : str = os.path.basename(os.path.normpath(path))
+        for index, saved_map in enumerate(iter_map_pack(path)):
+            if limit is not None and index >= limit: break
+            maps.append({'name' : f'{pack_name}_{index}', 'map' : saved_map, 'optimal_length' : saved_map.get('optimal_length', None)})
+    maps.sort(key=lambda curriculum_map: (curriculum_map['optimal_length'] is None, curriculum_map['optimal_length'] or 0))
+    return maps
+
+class Curriculum:
+    '''Starts with start_count maps unlocked. A map is mastered when mastery_share of the population wins it,
+    and the curriculum is complete when the last map is mastered.'''
+    def __init__(self, maps : list[CurriculumMap], encoder_name : str = CURRICULUM_ENCODER, start_count : int = 1, mastery_share : float = 0.2):
+        input_sizes : set[int] = {get_encoder_input_size(encoder_name, curriculum_map['map']) for curriculum_map in maps}
+        if len(input_sizes) > 1:
+            raise ValueError(f'Encoder {encoder_name} has a different input size on some of the maps, use a map independent encoder')
+        self.maps : list[CurriculumMap] = maps
+        self.encoder_name : str = encoder_name
+        self.active_count : int = max(1, min(start_count, len(maps)))
+        self.mastery_share : float = mastery_share
+        self.complete : bool = False
+        self.results : dict[str, dict[int, MapResult]] = {curriculum_map['name'] : {} for curriculum_map in maps}
+        self.cache_hits : int = 0
+        self.cache_misses : int = 0
+
+    def get_active_maps(self) -> list[CurriculumMap]:
+        return self.maps[:self.active_count]
+
+    def get_map_dict(self) -> dict[str, bd_core.SavedMap]:
+        return {curriculum_map['name'] : curriculum_map['map'] for curriculum_map in self.maps}
+
+    def evaluate_generation(self, ipop : ml_core.PopulationInterface, evaluator : ml_core.ParallelEvaluator|None = None) -> ml_core.GenomeDeduplicator:
+        '''Plays every genome on the unlocked maps it has no result for, then sets its fitness to the mean over the unlocked maps.
+        The behaviour and actions played are the ones of the hardest unlocked map. Returns the combined deduplication counts.'''
+        population : dict[int, neat.DefaultGenome] = ipop.pop.population
+        config : neat.Config = ipop.pop.config
+        jobs : list[ml_core.EvaluationJob] = []
+        for curriculum_map in self.get_active_maps():
+            map_results : dict[int, MapResult] = self.results[curriculum_map['name']]
+            #genomes that did not survive are never seen again
+            for genome_key in [genome_key for genome_key in map_results if genome_key not in population]:
+                del map_results[genome_key]
+            max_turns : int = ipop.turn_budget.get_turns(curriculum_map['map'], ipop.current_generation)
+            missing : list[tuple[int, neat.DefaultGenome]] = [(genome_key, genome) for genome_key, genome in iteritems(population)
+                                                              if genome_key not in map_results or map_results[genome_key]['max_turns'] != max_turns]
+            self.cache_hits += len(population) - len(missing)
+            self.cache_misses += len(missing)
+            if missing: jobs.append((curriculum_map['name'], missing, max_turns))
+        deduplicator : ml_core.GenomeDeduplicator = ml_core.GenomeDeduplicator()
+        if evaluator is not None:
+            job_results = evaluator.run_jobs(jobs)
+        else:
+            job_results = []
+            for map_name, genomes, max_turns in jobs:
+                job_deduplicator : ml_core.GenomeDeduplicator = ml_core.eval_genomes(genomes, config, self.get_map_dict()[map_name],
+                                                                                     compiler=ipop.network_compiler, max_turns=max_turns,
+                                                                                     profiler=ipop.profiler)
+                job_results.append(([(genome.fitness, genome.behaviour, genome.actions_played, genome.turns_played) for _, genome in genomes],
+                                    job_deduplicator))
+        map_dict : dict[str, bd_core.SavedMap] = self.get_map_dict()
+        for (map_name, genomes, max_turns), (results, job_deduplicator) in zip(jobs, job_results):
+            map_results : dict[int, MapResult] = self.results[map_name]
+            for (genome_key, _), (fitness, behaviour, actions, turns) in zip(genomes, results):
+                map_results[genome_key] = {'fitness' : fitness, 'behaviour' : behaviour, 'actions' : actions, 'turns' : turns,
+                                           'won' : play_actions(map_dict[map_name], actions).game_won(), 'max_turns' : max_turns}
+            deduplicator.genome_count += job_deduplicator.genome_count
+            deduplicator.duplicate_count += job_deduplicator.duplicate_count
+        self.aggregate(population)
+        return deduplicator
+
+    def aggregate(self, population : dict[int, neat.DefaultGenome]):
+        active_maps : list[CurriculumMap] = self.get_active_maps()
+        frontier_results : dict[int, MapResult] = self.results[active_maps[-1]['name']]
+        for genome_key, genome in iteritems(population):
+            genome.fitness = sum(self.results[curriculum_map['name']][genome_key]['fitness'] for curriculum_map in active_maps) / len(active_maps)
+            genome.behaviour = frontier_results[genome_key]['behaviour']
+            genome.actions_played = frontier_results[genome_key]['actions']
+            genome.turns_played = frontier_results[genome_key]['turns']
+
+    def get_win_share(self, map_name : str, population : dict[int, neat.DefaultGenome]) -> float:
+        map_results : dict[int, MapResult] = self.results[map_name]
+        return sum(map_results[genome_key]['won'] for genome_key in population) / len(population)
+
+    def update(self, ipop : ml_core.PopulationInterface) -> bool:
+        '''Unlocks the next map if the hardest unlocked one is mastered. Call it after evaluate_generation, before the population is bred.
+        Returns True when a map was unlocked.'''
+        population : dict[int, neat.DefaultGenome] = ipop.pop.population
+        frontier : CurriculumMap = self.get_active_maps()[-1]
+        win_share : float = self.get_win_share(frontier['name'], population)
+        ipop.pop.reporters.info(f'Curriculum : {self.active_count}/{len(self.maps)} maps, {win_share:0.2f} of the population wins {frontier["name"]} '
+                                f'(cached results : {self.cache_hits}/{self.cache_hits + self.cache_misses})')
+        if win_share < self.mastery_share: return False
+        if self.active_count >= len(self.maps):
+            self.complete = True
+            return False
+        self.active_count += 1
+        ipop.pop.reporters.info(f'Curriculum : {frontier["name"]} mastered, unlocking {self.maps[self.active_count - 1]["name"]}')
+        return True
+
+    def is_complete(self) -> bool:
+        return self.complete
+
+def get_curriculum_runner(config_path : str, curriculum : Curriculum, generations : int, seed : int|None = None) -> ml_core.PopulationInterface:
+    '''The config's fitness threshold is meant for a single map, so the run ends when the curriculum is complete instead.'''
+    return ml_core.get_pop_runner(config_path, curriculum.maps[0]['map'], generations, overrides={'NEAT' : {'no_fitness_termination' : True}},
+                                  encoder_name=curriculum.encoder_name, seed=seed)
+
+def run_curriculum(ipop : ml_core.PopulationInterface, curriculum : Curriculum, workers : int = 1) -> neat.DefaultGenome:
+    '''Like ml_core.run_interface. With workers > 1 the unlocked maps are evaluated in parallel, on one pool holding every map.'''
+    evaluator : ml_core.ParallelEvaluator|None = None
+    if workers > 1: evaluator = ml_core.ParallelEvaluator(workers, ipop.pop.config, curriculum.get_map_dict())
+    ipop.start_running()
+    try:
+        while True:
+            ipop.start_generation()
+            ipop.report_dedup(curriculum.evaluate_generation(ipop, evaluator))
+            curriculum.update(ipop)
+            if curriculum.is_complete():
+                #earlier generations were scored on fewer maps, the winner is the best genome on all of them
+                pop : neat.Population = ipop.pop
+                ipop.current_best_genome = pop.best_genome = max(itervalues(pop.population), key=lambda genome: genome.fitness)
+                pop.reporters.post_evaluate(pop.config, pop.population, pop.species, ipop.current_best_genome)
+                break
+            ipop.end_generation()
+            if ipop.isover(): break
+    finally:
+        if evaluator is not None: evaluator.close()
+    winner = ipop.end_run()
+    return winner
+
+if __name__ == '__main__':
+    parser : argparse.ArgumentParser = argparse.ArgumentParser(description='Train on several maps, unlocking harder ones as the easier ones are mastered')
+    parser.add_argument('--maps', nargs='*', default=None, help='map names (every map in non_pygame/maps by default)')
+    parser.add_argument('--pack', default=None, help='train on a generated map pack or a binary map pack instead (see map_generator.py)')
+    parser.add_argument('--pack-limit', type=int, default=None, help='number of maps used from the pack')
+    parser.add_argument('--generations', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--encoder', default=CURRICULUM_ENCODER)
+    parser.add_argument('--mastery-share', type=float, default=0.2)
+    args : argparse.Namespace = parser.parse_args()
+    maps : list[CurriculumMap] = load_curriculum_maps(args.maps) if args.pack is None else load_pack_curriculum(args.pack, args.pack_limit)
+    curriculum : Curriculum = Curriculum(maps, args.encoder, mastery_share=args.mastery_share)
+    ipop : ml_core.PopulationInterface = get_curriculum_runner('non_pygame/config-feedforward.txt', curriculum, args.generations, args.seed)
+    ipop.pop.add_reporter(ml_core.FixedStdOutReporter(True))
+    winner : neat.DefaultGenome = run_curriculum(ipop, curriculum, args.workers)
+    print(f'{curriculum.active_count}/{len(curriculum.maps)} maps unlocked, complete : {curriculum.is_complete()}, best fitness : {winner.fitness}')
+    for curriculum_map in curriculum.get_active_maps():
+        result : MapResult|None = curriculum.results[curriculum_map['name']].get(winner.key, None)
+        if result is not None: print(f'{curriculum_map["name"]} : fitness {result["fitness"]:0.1f}, {"won" if result["won"] else "not won"}')
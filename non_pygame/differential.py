@@ -0,0 +1,204 @@
+'''Differential testing of a game engine against the reference bd_core.Game.
+Both engines play the same random action sequences on every map in non_pygame/maps and on randomly generated maps,
+and their legality checks, states and errors are compared after every step. Failing sequences are shrunk to a minimal counterexample.
+Run from the repository root: python non_pygame/differential.py [--seed 0] [--sequences 200] [--length 60] [--generated 200]'''
+import sys
+sys.path.append(".")
+import argparse
+import glob
+import os
+import random
+from typing import Callable, Protocol, TypedDict
+import non_pygame.block_dude_core as bd_core
+from non_pygame.block_dude_core import ActionType, CellType, GameMap, GameState, SavedMap
+from non_pygame.fast_game import FastGame
+
+ACTIONS : tuple[int, ...] = tuple(action.value for action in ActionType)
+#walking off an open edge of the map is an IndexError in the reference game, engines have to fail the same way
+ENGINE_ERRORS : tuple[type[BaseException], ...] = (IndexError, bd_core.InvalidMapError)
+
+class Engine(Protocol):
+    def get_binds(self) -> tuple[dict[int, Callable[[], bool]], dict[int, Callable[[], bool]]]: ...
+    def to_game_state(self) -> GameState: ...
+    def game_won(self) -> bool: ...
+
+EngineFactory = Callable[[SavedMap], Engine]
+
+class StepOutcome(TypedDict):
+    legal : bool|None
+    error : str|None
+    won : bool|None
+    state : GameState|None
+
+class Mismatch(TypedDict):
+    step : int
+    action : int
+    reference : StepOutcome
+    candidate : StepOutcome
+
+def make_reference(saved_map : SavedMap) -> bd_core.Game:
+    return bd_core.Game.from_saved_map(saved_map, copy_map=True)
+
+def make_fast_game(saved_map : SavedMap) -> FastGame:
+    return FastGame.from_saved_map(saved_map, copy_map=True)
+
+CANDIDATES : dict[str, EngineFactory] = {'fast_game' : make_fast_game}
+
+def copy_state(game_state : GameState) -> GameState:
+    return {**game_state, 'map' : [row[:] for row in game_state['map']]}
+
+def play_step(engine : Engine, verifications : dict[int, Callable[[], bool]], actions : dict[int, Callable[[], bool]], action : int) -> StepOutcome:
+    '''Plays the action if it is legal, the way eval_genome does. After an error the engine's state is half updated,
+    so only the error type is compared.'''
+    legal : bool|None = None
+    try:
+        legal = verifications[action]()
+        if legal: actions[action]()
+    except ENGINE_ERRORS as error:
+        return {'legal' : legal, 'error' : type(error).__name__, 'won' : None, 'state' : None}
+    return {'legal' : legal, 'error' : None, 'won' : engine.game_won(), 'state' : copy_state(engine.to_game_state())}
+
+def find_mismatch(saved_map : SavedMap, action_sequence : list[int], candidate : EngineFactory,
+                  reference : EngineFactory = make_reference) -> Mismatch|None:
+    '''Returns the first step where the engines disagree, or None if they agree on the whole sequence.'''
+    reference_game : Engine = reference(saved_map)
+    candidate_game : Engine = candidate(saved_map)
+    start_state : GameState = reference_game.to_game_state()
+    if candidate_game.to_game_state() != start_state or candidate_game.game_won() != reference_game.game_won():
+        return {'step' : -1, 'action' : -1,
+                'reference' : {'legal' : None, 'error' : None, 'won' : reference_game.game_won(), 'state' : copy_state(start_state)},
+                'candidate' : {'legal' : None, 'error' : None, 'won' : candidate_game.game_won(),
+                               'state' : copy_state(candidate_game.to_game_state())}}
+    reference_binds = reference_game.get_binds()
+    candidate_binds = candidate_game.get_binds()
+    for step, action in enumerate(action_sequence):
+        reference_outcome : StepOutcome = play_step(reference_game, *reference_binds, action)
+        candidate_outcome : StepOutcome = play_step(candidate_game, *candidate_binds, action)
+        if reference_outcome != candidate_outcome:
+            return {'step' : step, 'action' : action, 'reference' : reference_outcome, 'candidate' : candidate_outcome}
+        if reference_outcome['error'] is not None: return None
+    return None
+
+def shrink_sequence(saved_map : SavedMap, action_sequence : list[int], candidate : EngineFactory,
+                    reference : EngineFactory = make_reference) -> list[int]:
+    '''Delta debugging: cuts the sequence after the first mismatch, then keeps removing chunks (halving their size down to
+    single actions) as long as the engines still disagree somewhere. The result is 1-minimal.'''
+    mismatch : Mismatch|None = find_mismatch(saved_map, action_sequence, candidate, reference)
+    if mismatch is None: return action_sequence
+    sequence : list[int] = action_sequence[:mismatch['step'] + 1]
+    chunk_size : int = max(len(sequence) // 2, 1)
+    while True:
+        removed_any : bool = False
+        start : int = 0
+        while start < len(sequence):
+            attempt : list[int] = sequence[:start] + sequence[start + chunk_size:]
+            mismatch = find_mismatch(saved_map, attempt, candidate, reference)
+            if mismatch is not None:
+                sequence = attempt[:mismatch['step'] + 1]
+                removed_any = True
+            else:
+                start += chunk_size
+        if chunk_size == 1 and not removed_any: return sequence
+        if not removed_any: chunk_size = max(chunk_size // 2, 1)
+
+def get_surface(game_map : GameMap, x : int) -> int|None:
+    '''Highest cell of the column something can stand in: empty, with something solid below it.'''
+    for y in range(len(game_map) - 1):
+        if game_map[y][x] == CellType.EMPTY and bd_core.is_solid(game_map[y + 1][x]): return y
+    return None
+
+def generate_map(rng : random.Random) -> SavedMap:
+    '''Random terrain made to hit the movement edge cases: brick columns, block stacks, overhangs and ceilings to drop held blocks
+    under, and sometimes no side walls so the player can walk off the map.'''
+    width : int = rng.randint(5, 16)
+    height : int = rng.randint(4, 10)
+    game_map : GameMap = [[CellType.EMPTY.value] * width for _ in range(height)]
+    game_map[-1] = [CellType.BRICK.value] * width
+    if rng.random() < 0.5: game_map[0] = [CellType.BRICK.value] * width
+    if rng.random() < 0.8:
+        for row in game_map:
+            row[0] = row[-1] = CellType.BRICK.value
+    for x in range(1, width - 1):
+        column_height : int = rng.randint(0, height // 2)
+        for y in range(height - 2, height - 2 - column_height, -1):
+            game_map[y][x] = CellType.BRICK.value
+        surface : int|None = get_surface(game_map, x)
+        for _ in range(rng.choice((0, 0, 1, 1, 2))):
+            if surface is None or surface < 1: break
+            game_map[surface][x] = CellType.BLOCK.value
+            surface -= 1
+    for _ in range(rng.randint(0, width // 2)):
+        x, y = rng.randrange(width), rng.randrange(1, height - 1)
+        if game_map[y][x] == CellType.EMPTY: game_map[y][x] = rng.choice((CellType.BRICK.value, CellType.BLOCK.value))
+    standable : list[tuple[int, int]] = [(x, y) for x in range(width) for y in [get_surface(game_map, x)] if y is not None]
+    if len(standable) < 2: return generate_map(rng)
+    door, start = rng.sample(standable, 2)
+    game_map[door[1]][door[0]] = CellType.DOOR.value
+    return {'map' : game_map, 'start_x' : start[0], 'start_y' : start[1], 'start_direction' : rng.choice((-1, 1))}
+
+def load_bundled_maps() -> dict[str, SavedMap]:
+    return {os.path.splitext(os.path.basename(path))[0] : bd_core.load_map(os.path.splitext(os.path.basename(path))[0])
+            for path in sorted(glob.glob('non_pygame/maps/*.json'))}
+
+def random_sequence(rng : random.Random, length : int) -> list[int]:
+    return [rng.choice(ACTIONS) for _ in range(length)]
+
+def render_state(game_state : GameState|None) -> str:
+    if game_state is None: return '  (no state, the step raised)'
+    ressources : str = ' #OD'
+    lines : list[str] = []
+    for y, row in enumerate(game_state['map']):
+        line : list[str] = [ressources[cell] for cell in row]
+        if y == game_state['player_y'] - 1 and game_state['player_holding_block']: line[game_state['player_x']] = 'O'
+        if y == game_state['player_y']: line[game_state['player_x']] = '>' if game_state['player_direction'] == 1 else '<'
+        lines.append('  |' + ''.join(line) + '|')
+    return '\n'.join(lines)
+
+def describe_outcome(outcome : StepOutcome) -> str:
+    return f'legal={outcome["legal"]} error={outcome["error"]} won={outcome["won"]}\n{render_state(outcome["state"])}'
+
+def describe_counterexample(map_name : str, saved_map : SavedMap, sequence : list[int], mismatch : Mismatch) -> str:
+    start_state : GameState = make_reference(saved_map).to_game_state()
+    return '\n'.join((f'Mismatch on {map_name} after {len(sequence)} action(s): {" ".join(ActionType(action).name for action in sequence)}',
+                      f'start:\n{render_state(start_state)}',
+                      f'reference: {describe_outcome(mismatch["reference"])}',
+                      f'candidate: {describe_outcome(mismatch["candidate"])}'))
+
+def check_map(map_name : str, saved_map : SavedMap, candidate : EngineFactory, rng : random.Random, sequences : int, length : int) -> str|None:
+    '''Plays random sequences until one disagrees, and returns the shrunk counterexample (None if every sequence agreed).'''
+    for _ in range(sequences):
+        sequence : list[int] = random_sequence(rng, length)
+        if find_mismatch(saved_map, sequence, candidate) is None: continue
+        sequence = shrink_sequence(saved_map, sequence, candidate)
+        return describe_counterexample(map_name, saved_map, sequence, find_mismatch(saved_map, sequence, candidate))
+    return None
+
+def run_differential(candidate : EngineFactory, seed : int = 0, sequences : int = 200, length : int = 60, generated : int = 200) -> list[str]:
+    '''Returns one counterexample per map the engines disagree on.'''
+    rng : random.Random = random.Random(seed)
+    maps : list[tuple[str, SavedMap]] = list(load_bundled_maps().items())
+    maps += [(f'generated_{index}', generate_map(rng)) for index in range(generated)]
+    failures : list[str] = []
+    for map_name, saved_map in maps:
+        #generated maps are many, so each one gets fewer sequences
+        map_sequences : int = sequences if not map_name.startswith('generated_') else max(sequences // 10, 1)
+        counterexample : str|None = check_map(map_name, saved_map, candidate, rng, map_sequences, length)
+        if counterexample is not None: failures.append(counterexample)
+    return failures
+
+def main(argv : list[str]) -> int:
+    parser : argparse.ArgumentParser = argparse.ArgumentParser(description='Compare a game engine against bd_core.Game on random action sequences')
+    parser.add_argument('--engine', choices=tuple(CANDIDATES), default='fast_game')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sequences', type=int, default=200, help='random sequences per bundled map (a tenth of that per generated map)')
+    parser.add_argument('--length', type=int, default=60, help='actions per sequence')
+    parser.add_argument('--generated', type=int, default=200, help='number of generated maps')
+    args : argparse.Namespace = parser.parse_args(argv)
+    failures : list[str] = run_differential(CANDIDATES[args.engine], args.seed, args.sequences, args.length, args.generated)
+    for failure in failures:
+        print(failure, end='\n\n')
+    print(f'{args.engine}: {len(failures)} map(s) with a mismatch')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
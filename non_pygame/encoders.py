@@ -0,0 +1,136 @@
+import sys
+sys.path.append(".")
+import non_pygame.block_dude_core as bd_core
+from non_pygame.block_dude_core import CellType
+
+class EncoderFeature:
+    '''A slice of the network input. Features write straight into the encoder's buffer, starting at offset.'''
+    def __init__(self, the_map : bd_core.SavedMap):
+        self.map_size : tuple[int, int] = bd_core.get_map_size(the_map)
+        self.size : int = 0
+
+    def fill(self, game : bd_core.Game, buffer : list[float], offset : int):
+        pass
+
+class FullMapFeature(EncoderFeature):
+    def __init__(self, the_map : bd_core.SavedMap):
+        super().__init__(the_map)
+        self.size = self.map_size[0] * self.map_size[1]
+
+    def fill(self, game : bd_core.Game, buffer : list[float], offset : int):
+        width : int = self.map_size[0]
+        for row in game.map:
+            buffer[offset:offset + width] = row
+            offset += width
+
+class PlayerPositionFeature(EncoderFeature):
+    def __init__(self, the_map : bd_core.SavedMap):
+        super().__init__(the_map)
+        self.size = 4
+
+    def fill(self, game : bd_core.Game, buffer : list[float], offset : int):
+        buffer[offset] = game.player_x
+        buffer[offset + 1] = game.player_y
+        buffer[offset + 2] = game.player_direction
+        buffer[offset + 3] = game.player_holding_block
+
+class PlayerStateFeature(EncoderFeature):
+    def __init__(self, the_map : bd_core.SavedMap):
+        super().__init__(the_map)
+        self.size = 2
+
+    def fill(self, game : bd_core.Game, buffer : list[float], offset : int):
+        buffer[offset] = game.player_direction
+        buffer[offset + 1] = game.player_holding_block
+
+class DoorDistanceFeature(EncoderFeature):
+    def __init__(self, the_map : bd_core.SavedMap):
+        super().__init__(the_map)
+        self.size = 3
+
+    def fill(self, game : bd_core.Game, buffer : list[float], offset : int):
+        buffer[offset] = game.door_coords[0] - game.player_x
+        buffer[offset + 1] = game.door_coords[1] - game.player_y
+        buffer[offset + 2] = game.get_adjusted_dist()
+
+class WindowFeature(EncoderFeature):
+    '''Square window of cells centered on the player. Cells outside of the map count as bricks.'''
+    OUTSIDE_CELL : int = CellType.BRICK.value
+    def __init__(self, the_map : bd_core.SavedMap, radius : int = 2):
+        super().__init__(the_map)
+        self.radius : int = radius
+        self.side : int = 2 * radius + 1
+        self.size = self.side * self.side
+
+    def fill(self, game : bd_core.Game, buffer : list[float], offset : int):
+        width, height = self.map_size
+        radius : int = self.radius
+        the_map : bd_core.GameMap = game.map
+        for y in range(game.player_y - radius, game.player_y + radius + 1):
+            if y < 0 or y >= height:
+                buffer[offset:offset + self.side] = [self.OUTSIDE_CELL] * self.side
+                offset += self.side
+                continue
+            row : list[int] = the_map[y]
+            for x in range(game.player_x - radius, game.player_x + radius + 1):
+                buffer[offset] = row[x] if 0 <= x < width else self.OUTSIDE_CELL
+                offset += 1
+
+class OneHotWindowFeature(WindowFeature):
+    '''Same window as WindowFeature, but with one channel per solid/door cell type. Empty cells are all zeros.'''
+    CHANNELS : tuple[int, ...] = (CellType.BRICK.value, CellType.BLOCK.value, CellType.DOOR.value)
+    def __init__(self, the_map : bd_core.SavedMap, radius : int = 2):
+        super().__init__(the_map, radius)
+        self.channel_count : int = len(self.CHANNELS)
+        self.size = self.side * self.side * self.channel_count
+        self.channel_lookup : dict[int, int] = {cell : index for index, cell in enumerate(self.CHANNELS)}
+
+    def fill(self, game : bd_core.Game, buffer : list[float], offset : int):
+        width, height = self.map_size
+        radius : int = self.radius
+        channel_count : int = self.channel_count
+        lookup : dict[int, int] = self.channel_lookup
+        outside_channel : int = lookup[self.OUTSIDE_CELL]
+        buffer[offset:offset + self.size] = [0] * self.size
+        the_map : bd_core.GameMap = game.map
+        for y in range(game.player_y - radius, game.player_y + radius + 1):
+            row : list[int]|None = the_map[y] if 0 <= y < height else None
+            for x in range(game.player_x - radius, game.player_x + radius + 1):
+                if row is None or x < 0 or x >= width:
+                    buffer[offset + outside_channel] = 1
+                else:
+                    channel : int|None = lookup.get(row[x], None)
+                    if channel is not None: buffer[offset + channel] = 1
+                offset += channel_count
+
+class ObservationEncoder:
+    '''Turns a game into the network's input list. The same preallocated buffer is refilled and returned on every call.'''
+    def __init__(self, name : str, features : list[EncoderFeature]):
+        self.name : str = name
+        self.features : list[EncoderFeature] = features
+        self.input_size : int = sum(feature.size for feature in features)
+        self.buffer : list[float] = [0] * self.input_size
+
+    def encode(self, game : bd_core.Game) -> list[float]:
+        buffer : list[float] = self.buffer
+        offset : int = 0
+        for feature in self.features:
+            feature.fill(game, buffer, offset)
+            offset += feature.size
+        return buffer
+
+DEFAULT_ENCODER : str = 'full'
+ENCODERS : dict[str, list[tuple[type[EncoderFeature], dict]]] = {
+    #'full' has to stay in this exact order: the saved winners were trained on it
+    'full' : [(FullMapFeature, {}), (PlayerPositionFeature, {})],
+    'egocentric' : [(WindowFeature, {'radius' : 2}), (PlayerStateFeature, {}), (DoorDistanceFeature, {})],
+    'egocentric_large' : [(WindowFeature, {'radius' : 3}), (PlayerStateFeature, {}), (DoorDistanceFeature, {})],
+    'egocentric_onehot' : [(OneHotWindowFeature, {'radius' : 2}), (PlayerStateFeature, {}), (DoorDistanceFeature, {})],
+}
+
+def make_encoder(name : str, the_map : bd_core.SavedMap) -> ObservationEncoder:
+    if name not in ENCODERS: raise KeyError(f'Encoder {name} does not exist! (options : {", ".join(ENCODERS)})')
+    return ObservationEncoder(name, [feature_type(the_map, **kwargs) for feature_type, kwargs in ENCODERS[name]])
+
+def get_encoder_input_size(name : str, the_map : bd_core.SavedMap) -> int:
+    return make_encoder(name, the_map).input_size
@@ -0,0 +1,161 @@
+import sys
+sys.path.append(".")
+from typing import Callable
+import non_pygame.block_dude_core as bd_core
+from non_pygame.block_dude_core import ActionType, GameMap, GameState, InvalidMapError, SavedMap
+
+EMPTY : int = bd_core.CellType.EMPTY.value
+BRICK : int = bd_core.CellType.BRICK.value
+BLOCK : int = bd_core.CellType.BLOCK.value
+DOOR : int = bd_core.CellType.DOOR.value
+
+class FastGame:
+    '''Same rules and interface as bd_core.Game, with the cell lookups and solidity checks written out in every action
+    instead of going through helper methods and CellType comparisons.
+    Any change here has to keep non_pygame/differential.py passing against bd_core.Game.'''
+    def __init__(self, starting_map : GameMap, start_player_pos : list[int], start_orientation : int = 1):
+        if not bd_core.validate_map(starting_map): raise InvalidMapError('Map isnt valid!')
+        self.map : GameMap = starting_map
+        self.player_x : int = start_player_pos[0]
+        self.player_y : int = start_player_pos[1]
+        self.player_holding_block : bool = False
+        self.player_direction : int = start_orientation
+        self.door_coords : list[int]
+        for y, row in enumerate(self.map):
+            for x, cell in enumerate(row):
+                if cell == DOOR:
+                    self.door_coords = [x, y]
+                    return
+
+    @staticmethod
+    def from_saved_map(saved_map : SavedMap, copy_map : bool = False) -> 'FastGame':
+        starting_map : GameMap = [row[:] for row in saved_map['map']] if copy_map else saved_map['map']
+        return FastGame(starting_map, [saved_map['start_x'], saved_map['start_y']], saved_map['start_direction'])
+
+    @staticmethod
+    def from_game_state(game_state : GameState, copy_map : bool = False) -> 'FastGame':
+        starting_map : GameMap = [row[:] for row in game_state['map']] if copy_map else game_state['map']
+        new_game = FastGame(starting_map, [game_state['player_x'], game_state['player_y']], game_state['player_direction'])
+        new_game.player_holding_block = game_state['player_holding_block']
+        return new_game
+
+    def to_game_state(self) -> GameState:
+        return {'map' : self.map, 'player_x' : self.player_x, 'player_y' : self.player_y,
+                'player_direction' : self.player_direction, 'player_holding_block' : self.player_holding_block}
+
+    def __eq__(self, value : GameState|object) -> bool:
+        if type(value) == dict:
+            return (self.player_x == value['player_x'] and self.player_y == value['player_y']
+                    and self.player_direction == value['player_direction'] and self.player_holding_block == value['player_holding_block']
+                    and self.map == value['map'])
+        if isinstance(value, (FastGame, bd_core.Game)):
+            return (self.player_x == value.player_x and self.player_y == value.player_y
+                    and self.player_direction == value.player_direction and self.player_holding_block == value.player_holding_block
+                    and self.map == value.map)
+        raise TypeError(f'Wrong type (sent a {type(value)})')
+
+    def game_won(self) -> bool:
+        return self.player_x == self.door_coords[0] and self.player_y == self.door_coords[1]
+
+    def up_legal(self) -> bool:
+        x : int = self.player_x + self.player_direction
+        facing : int = self.map[self.player_y][x]
+        if facing == BRICK or facing == BLOCK:
+            target : int = self.map[self.player_y - 1][x]
+            return target != BRICK and target != BLOCK
+        return False
+
+    def up(self) -> bool:
+        if not self.up_legal(): return False
+        self.player_x += self.player_direction
+        self.player_y -= 1
+        return True
+
+    def left_legal(self) -> bool:
+        facing : int = self.map[self.player_y][self.player_x + self.player_direction]
+        return not ((facing == BRICK or facing == BLOCK) and self.player_direction == -1)
+
+    def right_legal(self) -> bool:
+        facing : int = self.map[self.player_y][self.player_x + self.player_direction]
+        return not ((facing == BRICK or facing == BLOCK) and self.player_direction == 1)
+
+    def left(self) -> bool:
+        return self.walk(-1)
+
+    def right(self) -> bool:
+        return self.walk(1)
+
+    def walk(self, direction : int) -> bool:
+        '''Turns the player, then moves them one cell if it is free. A held block falls off (from where the player stood)
+        when the new cell has something above it, then the player falls until they stand on something solid.'''
+        self.player_direction = direction
+        game_map : GameMap = self.map
+        y : int = self.player_y
+        x : int = self.player_x + direction
+        facing : int = game_map[y][x]
+        if facing == BRICK or facing == BLOCK: return True
+        self.player_x = x
+        if self.player_holding_block and game_map[y - 1][x] != EMPTY:
+            self.player_holding_block = False
+            self.drop_block(x - direction, y)
+        below : int = game_map[y + 1][x]
+        while below != BRICK and below != BLOCK:
+            y += 1
+            if y > 9999: raise InvalidMapError('No floor detected!')
+            below = game_map[y + 1][x]
+        self.player_y = y
+        return True
+
+    def down_legal(self) -> bool:
+        game_map : GameMap = self.map
+        y : int = self.player_y
+        x : int = self.player_x + self.player_direction
+        if self.player_holding_block:
+            return game_map[y - 1][x] == EMPTY
+        return game_map[y][x] == BLOCK and game_map[y - 1][x] == EMPTY and game_map[y - 1][self.player_x] == EMPTY
+
+    def down(self) -> bool:
+        if not self.down_legal(): return False
+        if self.player_holding_block:
+            self.player_holding_block = False
+            self.drop_block(self.player_x + self.player_direction, self.player_y - 1)
+        else:
+            self.player_holding_block = True
+            self.map[self.player_y][self.player_x + self.player_direction] = EMPTY
+        return True
+
+    def drop_block(self, x : int, y : int):
+        game_map : GameMap = self.map
+        while game_map[y + 1][x] == EMPTY:
+            y += 1
+            if y > 9999: raise InvalidMapError('No floor detected!')
+        game_map[y][x] = BLOCK
+
+    def get_binds(self) -> tuple[dict[int, Callable[[], bool]], dict[int, Callable[[], bool]]]:
+        verifications : dict[int, Callable[[], bool]] = {
+            ActionType.DOWN.value : self.down_legal,
+            ActionType.UP.value : self.up_legal,
+            ActionType.LEFT.value : self.left_legal,
+            ActionType.RIGHT.value : self.right_legal,
+        }
+        actions : dict[int, Callable[[], bool]] = {
+            ActionType.DOWN.value : self.down,
+            ActionType.UP.value : self.up,
+            ActionType.LEFT.value : self.left,
+            ActionType.RIGHT.value : self.right,
+        }
+        return verifications, actions
+
+    def get_dist(self) -> float:
+        return float(abs(self.player_x - self.door_coords[0]) + abs(self.player_y - self.door_coords[1]))
+
+    def get_facing_dist(self) -> float:
+        return float(abs((self.player_x + self.player_direction) - self.door_coords[0]) + abs(self.player_y - self.door_coords[1]))
+
+    def get_dist_int(self) -> int:
+        return abs(self.player_x - self.door_coords[0]) + abs(self.player_y - self.door_coords[1])
+
+    def get_adjusted_dist(self) -> float:
+        y_diff : int = abs(self.player_y - self.door_coords[1])
+        if self.player_y > self.door_coords[1]: y_diff *= 2
+        return float(abs(self.player_x - self.door_coords[0]) + y_diff)
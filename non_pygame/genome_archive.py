@@ -0,0 +1,165 @@
+'''SQLite archive of the best genomes of every generation, across runs, maps and configs.
+Genomes are stored once per (network fingerprint, map, config), with their fitness, solve length, actions and a compressed
+GenomeEncoding, and are indexed by map and fitness so "the best genome for this map under this config" is one query.'''
+import sys
+sys.path.append(".")
+import hashlib
+import io
+import json
+import sqlite3
+import zlib
+from time import strftime
+from typing import TypedDict
+import neat
+from neat.config import ConfigParameter, write_pretty_params
+from six import itervalues
+import non_pygame.block_dude_core as bd_core
+from non_pygame.genome_encoding import GenomeEncoding, encode_genome, decode_network, get_fingerprint
+
+ARCHIVE_PATH : str = 'non_pygame/genome_archive.sqlite3'
+
+SCHEMA : str = '''
+CREATE TABLE IF NOT EXISTS maps (
+    map_hash TEXT PRIMARY KEY,
+    map TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS genomes (
+    id INTEGER PRIMARY KEY,
+    run TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    genome_key INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    map_hash TEXT NOT NULL REFERENCES maps(map_hash),
+    config_hash TEXT NOT NULL,
+    fitness REAL NOT NULL,
+    solve_length INTEGER,
+    actions TEXT NOT NULL,
+    genome BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS genomes_identity ON genomes (fingerprint, map_hash, config_hash);
+CREATE INDEX IF NOT EXISTS genomes_by_map_fitness ON genomes (map_hash, fitness DESC);
+CREATE INDEX IF NOT EXISTS genomes_by_map_config_fitness ON genomes (map_hash, config_hash, fitness DESC);
+'''
+
+class ArchivedGenome(TypedDict):
+    id : int
+    run : str
+    generation : int
+    genome_key : int
+    fingerprint : str
+    map_hash : str
+    config_hash : str
+    fitness : float
+    solve_length : int|None
+    actions : str
+
+ARCHIVED_COLUMNS : str = 'id, run, generation, genome_key, fingerprint, map_hash, config_hash, fitness, solve_length, actions'
+INSERT_QUERY : str = ('INSERT OR IGNORE INTO genomes (run, generation, genome_key, fingerprint, map_hash, config_hash, fitness, solve_length, actions, genome) '
+                      'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+def get_map_hash(saved_map : bd_core.SavedMap) -> str:
+    layout : dict = {'map' : saved_map['map'], 'start_x' : saved_map['start_x'], 'start_y' : saved_map['start_y'],
+                     'start_direction' : saved_map['start_direction']}
+    return hashlib.sha1(json.dumps(layout, separators=(',', ':')).encode()).hexdigest()[:16]
+
+#the [NEAT] section's parameters, as neat.Config reads and saves them
+NEAT_PARAMETERS : list[ConfigParameter] = [ConfigParameter('pop_size', int), ConfigParameter('fitness_criterion', str),
+                                           ConfigParameter('fitness_threshold', float), ConfigParameter('reset_on_extinction', bool),
+                                           ConfigParameter('no_fitness_termination', bool, False)]
+
+def get_config_hash(config : neat.Config) -> str:
+    '''Hash of every parameter the config would save, plus the encoder. Computed once per config object.'''
+    config_hash : str|None = getattr(config, 'archive_hash', None)
+    if config_hash is not None: return config_hash
+    buffer : io.StringIO = io.StringIO()
+    #the same sections neat.Config.save writes, without going through a file
+    write_pretty_params(buffer, config, NEAT_PARAMETERS)
+    for section_type, section_config in ((config.genome_type, config.genome_config), (config.species_set_type, config.species_set_config),
+                                         (config.stagnation_type, config.stagnation_config), (config.reproduction_type, config.reproduction_config)):
+        buffer.write(f'[{section_type.__name__}]\n')
+        section_type.write_config(buffer, section_config)
+    buffer.write(f'encoder = {getattr(config, "encoder_name", None)}\n')
+    config_hash = hashlib.sha1(buffer.getvalue().encode()).hexdigest()[:16]
+    config.archive_hash = config_hash
+    return config_hash
+
+def get_solve_length(used_map : bd_core.SavedMap, action_list : list[int], turns_played : int|None = None) -> int|None:
+    '''Turns it took to reach the door, None if the actions never reach it. A turn can play two actions, so the count comes from
+    the evaluation (genome.turns_played), the number of actions is only used for genomes evaluated without one.'''
+    game : bd_core.Game = bd_core.Game.from_saved_map(used_map, copy_map=True)
+    verifications, actions = game.get_binds()
+    for index, action in enumerate(action_list):
+        if verifications[action](): actions[action]()
+        if game.game_won(): return index + 1 if turns_played is None else turns_played
+    return None
+
+class GenomeArchive:
+    '''Archives the top_count genomes of every generation played on used_map.
+    A generation is written in one transaction. Elites surviving from earlier generations are skipped before they are encoded,
+    and networks already in the archive are left out by its unique index.'''
+    def __init__(self, used_map : bd_core.SavedMap, file_path : str = ARCHIVE_PATH, top_count : int = 5):
+        self.used_map : bd_core.SavedMap = used_map
+        self.map_hash : str = get_map_hash(used_map)
+        self.file_path : str = file_path
+        self.top_count : int = top_count
+        self.run_name : str = strftime('%Y-%m-%dT%H:%M:%S')
+        self.known_keys : set[int] = set()
+        self.connection : sqlite3.Connection = sqlite3.connect(file_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute('INSERT OR IGNORE INTO maps VALUES (?, ?)', (self.map_hash, json.dumps(used_map)))
+
+    def write_generation(self, population : dict[int, neat.DefaultGenome], config : neat.Config, generation : int):
+        config_hash : str = get_config_hash(config)
+        #novelty search adds a bonus to genome.fitness, the archive ranks genomes on the game alone
+        ranked : list[neat.DefaultGenome] = sorted(itervalues(population), key=lambda genome: getattr(genome, 'objective_fitness', genome.fitness),
+                                                   reverse=True)
+        rows : list[tuple] = []
+        for genome in ranked[:self.top_count]:
+            #genome keys are unique within a run, so a known key is a genome that was already written
+            if genome.key in self.known_keys: continue
+            self.known_keys.add(genome.key)
+            encoding : GenomeEncoding = encode_genome(genome, config)
+            action_list : list[int] = getattr(genome, 'actions_played', [])
+            rows.append((self.run_name, generation, genome.key, get_fingerprint(encoding), self.map_hash, config_hash,
+                         getattr(genome, 'objective_fitness', genome.fitness), get_solve_length(self.used_map, action_list, getattr(genome, 'turns_played', None)),
+                         ''.join(str(action) for action in action_list), zlib.compress(json.dumps(encoding, separators=(',', ':')).encode())))
+        if not rows: return
+        with self.connection:
+            self.connection.executemany(INSERT_QUERY, rows)
+
+    def get_best(self, saved_map : bd_core.SavedMap|None = None, config : neat.Config|None = None, limit : int = 10,
+                 solved_only : bool = False) -> list[ArchivedGenome]:
+        '''Best genomes for the map (this archive's map by default), optionally only under one config or only the ones that solve it.'''
+        query : str = f'SELECT {ARCHIVED_COLUMNS} FROM genomes WHERE map_hash = ?'
+        parameters : list = [self.map_hash if saved_map is None else get_map_hash(saved_map)]
+        if config is not None:
+            query += ' AND config_hash = ?'
+            parameters.append(get_config_hash(config))
+        if solved_only: query += ' AND solve_length IS NOT NULL'
+        query += ' ORDER BY fitness DESC LIMIT ?'
+        parameters.append(limit)
+        return [dict(zip(ArchivedGenome.__annotations__, row)) for row in self.connection.execute(query, parameters)]
+
+    def get_shortest_solutions(self, saved_map : bd_core.SavedMap|None = None, limit : int = 10) -> list[ArchivedGenome]:
+        query : str = (f'SELECT {ARCHIVED_COLUMNS} FROM genomes WHERE map_hash = ? AND solve_length IS NOT NULL '
+                       'ORDER BY solve_length, fitness DESC LIMIT ?')
+        parameters : tuple = (self.map_hash if saved_map is None else get_map_hash(saved_map), limit)
+        return [dict(zip(ArchivedGenome.__annotations__, row)) for row in self.connection.execute(query, parameters)]
+
+    def get_encoding(self, genome_id : int) -> GenomeEncoding|None:
+        row : tuple|None = self.connection.execute('SELECT genome FROM genomes WHERE id = ?', (genome_id,)).fetchone()
+        return None if row is None else json.loads(zlib.decompress(row[0]))
+
+    def get_network(self, genome_id : int) -> neat.nn.FeedForwardNetwork|None:
+        encoding : GenomeEncoding|None = self.get_encoding(genome_id)
+        return None if encoding is None else decode_network(encoding)
+
+    def get_map(self, map_hash : str) -> bd_core.SavedMap|None:
+        row : tuple|None = self.connection.execute('SELECT map FROM maps WHERE map_hash = ?', (map_hash,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def close(self):
+        self.connection.close()
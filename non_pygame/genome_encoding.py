@@ -0,0 +1,46 @@
+import sys
+sys.path.append(".")
+import hashlib
+import json
+from typing import TypedDict
+import neat
+from neat.activations import ActivationFunctionSet
+from neat.aggregations import AggregationFunctionSet
+from neat.graphs import feed_forward_layers
+from six import itervalues
+
+class GenomeEncoding(TypedDict):
+    input_keys : list[int]
+    output_keys : list[int]
+    #key, bias, response, activation, aggregation
+    nodes : list[tuple[int, float, float, str, str]]
+    #in node, out node, weight (enabled connections only, in the genome's order so sums add up in the same order)
+    connections : list[tuple[int, int, float]]
+
+def encode_genome(genome : neat.DefaultGenome, config : neat.Config) -> GenomeEncoding:
+    genome_config = config.genome_config
+    return {
+        'input_keys' : list(genome_config.input_keys),
+        'output_keys' : list(genome_config.output_keys),
+        'nodes' : [(key, node.bias, node.response, node.activation, node.aggregation) for key, node in genome.nodes.items()],
+        'connections' : [(connection.key[0], connection.key[1], connection.weight)
+                         for connection in itervalues(genome.connections) if connection.enabled],
+    }
+
+def decode_network(encoding : GenomeEncoding) -> neat.nn.FeedForwardNetwork:
+    '''Builds the same network as FeedForwardNetwork.create would have from the original genome and config.'''
+    activations : ActivationFunctionSet = ActivationFunctionSet()
+    aggregations : AggregationFunctionSet = AggregationFunctionSet()
+    nodes : dict[int, tuple[int, float, float, str, str]] = {node[0] : node for node in encoding['nodes']}
+    connections : list[tuple[int, int]] = [(in_node, out_node) for in_node, out_node, _ in encoding['connections']]
+    node_evals : list = []
+    for layer in feed_forward_layers(encoding['input_keys'], encoding['output_keys'], connections):
+        for node in layer:
+            inputs : list[tuple[int, float]] = [(in_node, weight) for in_node, out_node, weight in encoding['connections'] if out_node == node]
+            _, bias, response, activation, aggregation = nodes[node]
+            node_evals.append((node, activations.get(activation), aggregations.get(aggregation), bias, response, inputs))
+    return neat.nn.FeedForwardNetwork(encoding['input_keys'], encoding['output_keys'], node_evals)
+
+def get_fingerprint(encoding : GenomeEncoding) -> str:
+    '''Identical networks (same nodes, connections and numbers, in the same order) get the same fingerprint across runs.'''
+    return hashlib.sha1(json.dumps(encoding, separators=(',', ':')).encode()).hexdigest()
@@ -0,0 +1,251 @@
+'''Procedural map generator: random walled terrain with blocks, kept only if the solver proves it solvable in enough turns.
+Maps are deduplicated by a canonical hash (a map and its mirror image are the same puzzle) and written to a map pack,
+a directory of NDJSON shards (one SavedMap per line, optimal_length included) described by a manifest.
+Generation is deterministic for a seed whatever the number of workers, and an interrupted pack picks up where its last shard ended.
+Run from the repository root: python non_pygame/map_generator.py non_pygame/map_packs/pack_name [--count 100000] [--workers 8] [--seed 0]'''
+import sys
+sys.path.append(".")
+import argparse
+import json
+import multiprocessing
+import os
+import random
+from time import perf_counter
+from typing import Iterator, TypedDict
+import non_pygame.block_dude_core as bd_core
+from non_pygame.block_dude_core import ActionType, CellType, GameMap, SavedMap
+from non_pygame.genome_archive import get_map_hash
+from non_pygame.solver import solve
+
+MAP_PACK_FORMAT : str = 'block_dude_map_pack'
+MAP_PACK_VERSION : int = 1
+MANIFEST_NAME : str = 'manifest.json'
+
+class GeneratorSettings(TypedDict):
+    min_width : int
+    max_width : int
+    min_height : int
+    max_height : int
+    min_length : int
+    max_length : int
+    require_blocks : bool
+    max_states : int
+    attempts_per_task : int
+
+DEFAULT_SETTINGS : GeneratorSettings = {
+    'min_width' : 8,
+    'max_width' : 16,
+    'min_height' : 5,
+    'max_height' : 8,
+    #shorter solutions are trivial, longer ones are rarely found within max_states anyway
+    'min_length' : 8,
+    'max_length' : 80,
+    'require_blocks' : True,
+    'max_states' : 20_000,
+    'attempts_per_task' : 20,
+}
+
+class ShardInfo(TypedDict):
+    file : str
+    count : int
+
+class MapPackManifest(TypedDict):
+    format : str
+    version : int
+    seed : int
+    settings : GeneratorSettings
+    shard_size : int
+    shards : list[ShardInfo]
+    count : int
+    next_task : int
+
+def get_surface(game_map : GameMap, x : int) -> int|None:
+    '''Lowest empty cell of the column with something solid below it, where the player or a block ends up falling.'''
+    for y in range(len(game_map) - 2, 0, -1):
+        if game_map[y][x] == CellType.EMPTY and bd_core.is_solid(game_map[y + 1][x]): return y
+    return None
+
+def generate_candidate(rng : random.Random, settings : GeneratorSettings) -> SavedMap:
+    '''Brick walls all around, a random walk of brick columns, a few floating ledges and block stacks, then a door and a start
+    on two different surfaces. The result is not checked for solvability.'''
+    width : int = rng.randint(settings['min_width'], settings['max_width'])
+    height : int = rng.randint(settings['min_height'], settings['max_height'])
+    game_map : GameMap = [[CellType.BRICK.value] * width] + [[CellType.BRICK.value] + [CellType.EMPTY.value] * (width - 2) + [CellType.BRICK.value]
+                                                             for _ in range(height - 2)] + [[CellType.BRICK.value] * width]
+    column_height : int = 0
+    for x in range(1, width - 1):
+        column_height = max(0, min(height - 4, column_height + rng.choice((-2, -1, 0, 0, 0, 1, 1, 2))))
+        for y in range(height - 2, height - 2 - column_height, -1):
+            game_map[y][x] = CellType.BRICK.value
+    for _ in range(rng.randint(0, width // 4)):
+        x, y = rng.randrange(1, width - 1), rng.randrange(2, height - 2)
+        if game_map[y][x] == CellType.EMPTY: game_map[y][x] = CellType.BRICK.value
+    for _ in range(rng.randint(1, max(1, width // 3))):
+        x : int = rng.randrange(1, width - 1)
+        surface : int|None = get_surface(game_map, x)
+        for _ in range(rng.choice((1, 1, 1, 2))):
+            if surface is None or surface < 2: break
+            game_map[surface][x] = CellType.BLOCK.value
+            surface -= 1
+    standable : list[tuple[int, int]] = [(x, y) for x in range(1, width - 1) for y in [get_surface(game_map, x)] if y is not None]
+    if len(standable) < 2: return generate_candidate(rng, settings)
+    door, start = rng.sample(standable, 2)
+    game_map[door[1]][door[0]] = CellType.DOOR.value
+    return {'map' : game_map, 'start_x' : start[0], 'start_y' : start[1], 'start_direction' : rng.choice((-1, 1))}
+
+def mirror_map(saved_map : SavedMap) -> SavedMap:
+    width : int = len(saved_map['map'][0])
+    return {'map' : [row[::-1] for row in saved_map['map']], 'start_x' : width - 1 - saved_map['start_x'], 'start_y' : saved_map['start_y'],
+            'start_direction' : -saved_map['start_direction']}
+
+def get_canonical_hash(saved_map : SavedMap) -> str:
+    '''The same for a map and its mirror image, which play the same with left and right swapped.'''
+    return min(get_map_hash(saved_map), get_map_hash(mirror_map(saved_map)))
+
+def verify_candidate(saved_map : SavedMap, settings : GeneratorSettings) -> int|None:
+    '''Optimal solution length if the map is worth keeping, None if it is unsolvable (within max_states), trivial or too long.'''
+    solution : list[int]|None = solve(saved_map, settings['max_states'])
+    if solution is None: return None
+    if not settings['min_length'] <= len(solution) <= settings['max_length']: return None
+    if settings['require_blocks'] and ActionType.DOWN.value not in solution: return None
+    return len(solution)
+
+_worker_settings : dict[str, GeneratorSettings] = {}
+
+def init_generator_worker(settings : GeneratorSettings):
+    _worker_settings['settings'] = settings
+
+def generate_task(task : tuple[int, int]) -> list[tuple[str, SavedMap]]:
+    '''Tries attempts_per_task candidates from the task's own random stream, so a task's output only depends on (seed, task index).'''
+    seed, task_index = task
+    settings : GeneratorSettings = _worker_settings['settings']
+    rng : random.Random = random.Random(f'{seed}:{task_index}')
+    found : list[tuple[str, SavedMap]] = []
+    for _ in range(settings['attempts_per_task']):
+        saved_map : SavedMap = generate_candidate(rng, settings)
+        optimal_length : int|None = verify_candidate(saved_map, settings)
+        if optimal_length is None: continue
+        saved_map['optimal_length'] = optimal_length
+        found.append((get_canonical_hash(saved_map), saved_map))
+    return found
+
+def get_shard_name(index : int) -> str:
+    return f'shard_{index:05d}.ndjson'
+
+def write_atomic(file_path : str, text : str):
+    temporary_path : str = f'{file_path}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(temporary_path, file_path)
+
+def load_manifest(directory : str) -> MapPackManifest|None:
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+            manifest : MapPackManifest = json.load(file)
+    except FileNotFoundError:
+        return None
+    if manifest.get('format', None) != MAP_PACK_FORMAT: raise ValueError(f'{directory} is not a map pack')
+    if manifest['version'] > MAP_PACK_VERSION:
+        raise ValueError(f'{directory} is a version {manifest["version"]} map pack, this version only reads up to {MAP_PACK_VERSION}')
+    return manifest
+
+def iter_map_pack(directory : str) -> Iterator[SavedMap]:
+    '''Yields every map of the pack, shard by shard, without loading a whole shard at once.'''
+    manifest : MapPackManifest|None = load_manifest(directory)
+    if manifest is None: raise FileNotFoundError(f'{directory} has no {MANIFEST_NAME}')
+    for shard in manifest['shards']:
+        with open(os.path.join(directory, shard['file']), 'r', encoding='utf-8') as file:
+            for line in file:
+                yield json.loads(line)
+
+def write_binary_pack(directory : str, file_path : str):
+    '''Converts the pack to a single binary map pack (see bd_core.MapPack), maps named <pack name>_<index>.'''
+    pack_name : str = os.path.basename(os.path.normpath(directory))
+    bd_core.write_map_pack(file_path, [(f'{pack_name}_{index}', saved_map) for index, saved_map in enumerate(iter_map_pack(directory))])
+
+class MapPackWriter:
+    '''Appends maps to a pack. Shards are only written between tasks (so they can hold a few more than shard_size maps),
+    and the manifest is updated once a shard is on disk, with the task the generation has to resume from.'''
+    def __init__(self, directory : str, seed : int, settings : GeneratorSettings, shard_size : int = 5000):
+        self.directory : str = directory
+        os.makedirs(directory, exist_ok=True)
+        manifest : MapPackManifest|None = load_manifest(directory)
+        if manifest is None:
+            manifest = {'format' : MAP_PACK_FORMAT, 'version' : MAP_PACK_VERSION, 'seed' : seed, 'settings' : settings,
+                        'shard_size' : shard_size, 'shards' : [], 'count' : 0, 'next_task' : 0}
+        elif manifest['seed'] != seed or manifest['settings'] != settings:
+            raise ValueError(f'{directory} was generated with another seed or other settings')
+        self.manifest : MapPackManifest = manifest
+        self.hashes : set[str] = {get_canonical_hash(saved_map) for saved_map in iter_map_pack(directory)} if manifest['shards'] else set()
+        self.pending : list[SavedMap] = []
+
+    def add(self, map_hash : str, saved_map : SavedMap) -> bool:
+        '''Returns False if the map (or its mirror image) is already in the pack.'''
+        if map_hash in self.hashes: return False
+        self.hashes.add(map_hash)
+        self.pending.append(saved_map)
+        return True
+
+    def end_task(self, task_index : int):
+        if len(self.pending) >= self.manifest['shard_size']: self.flush(task_index + 1)
+
+    def get_count(self) -> int:
+        return self.manifest['count'] + len(self.pending)
+
+    def flush(self, next_task : int):
+        if self.pending:
+            shard_name : str = get_shard_name(len(self.manifest['shards']))
+            write_atomic(os.path.join(self.directory, shard_name), ''.join(json.dumps(saved_map, separators=(',', ':')) + '\n' for saved_map in self.pending))
+            self.manifest['shards'].append({'file' : shard_name, 'count' : len(self.pending)})
+            self.manifest['count'] += len(self.pending)
+            self.pending = []
+        self.manifest['next_task'] = next_task
+        write_atomic(os.path.join(self.directory, MANIFEST_NAME), json.dumps(self.manifest, indent=1))
+
+def generate_map_pack(directory : str, count : int, seed : int = 0, workers : int = 1, settings : GeneratorSettings|None = None,
+                      shard_size : int = 5000, report_every : float = 30.0) -> MapPackManifest:
+    '''Generates maps until the pack holds count of them. Tasks are handed out in order and their results are used in order
+    (Pool.imap), so the pack is the same for a seed with any number of workers. The last task's surplus maps are kept.'''
+    if settings is None: settings = DEFAULT_SETTINGS
+    writer : MapPackWriter = MapPackWriter(directory, seed, settings, shard_size)
+    if writer.get_count() >= count: return writer.manifest
+    first_task : int = writer.manifest['next_task']
+    task_index : int = first_task
+    start : float = perf_counter()
+    last_report : float = start
+    pool = multiprocessing.Pool(workers, initializer=init_generator_worker, initargs=(settings,)) if workers > 1 else None
+    if pool is None: init_generator_worker(settings)
+    try:
+        tasks : Iterator[tuple[int, int]] = ((seed, index) for index in range(first_task, sys.maxsize))
+        results : Iterator[list[tuple[str, SavedMap]]] = pool.imap(generate_task, tasks, chunksize=4) if pool is not None else map(generate_task, tasks)
+        for task_index, found in enumerate(results, first_task):
+            for map_hash, saved_map in found:
+                writer.add(map_hash, saved_map)
+            writer.end_task(task_index)
+            if writer.get_count() >= count: break
+            if perf_counter() - last_report >= report_every:
+                last_report = perf_counter()
+                print(f'{writer.get_count()}/{count} maps, {task_index + 1 - first_task} tasks, {last_report - start:0.0f}s')
+        writer.flush(task_index + 1)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return writer.manifest
+
+if __name__ == '__main__':
+    parser : argparse.ArgumentParser = argparse.ArgumentParser(description='Generate a pack of verified solvable maps')
+    parser.add_argument('directory')
+    parser.add_argument('--count', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shard-size', type=int, default=5000)
+    parser.add_argument('--min-length', type=int, default=DEFAULT_SETTINGS['min_length'])
+    parser.add_argument('--max-states', type=int, default=DEFAULT_SETTINGS['max_states'])
+    parser.add_argument('--binary', default=None, help='also write the whole pack to this binary map pack file')
+    args : argparse.Namespace = parser.parse_args()
+    generator_settings : GeneratorSettings = {**DEFAULT_SETTINGS, 'min_length' : args.min_length, 'max_states' : args.max_states}
+    generation_start : float = perf_counter()
+    pack_manifest : MapPackManifest = generate_map_pack(args.directory, args.count, args.seed, args.workers, generator_settings, args.shard_size)
+    print(f'{pack_manifest["count"]} maps in {len(pack_manifest["shards"])} shard(s), {perf_counter() - generation_start:0.1f}s')
+    if args.binary is not None: write_binary_pack(args.directory, args.binary)
@@ -0,0 +1,177 @@
+'''Persistent index of the map library: name, size, content hash, validation result and thumbnail key of every map,
+for the .json maps of a directory and the maps inside its binary map packs (.bdpack, listed as <pack name>/<map name>).
+An entry is reused as long as its file keeps the same mtime and size, so listing the library only stats the files,
+and maps that were already validated load without being validated again.'''
+import sys
+sys.path.append(".")
+import hashlib
+import json
+import os
+from typing import TypedDict
+import non_pygame.block_dude_core as bd_core
+
+MAP_DIRECTORY : str = 'non_pygame/maps'
+MAP_INDEX_PATH : str = 'non_pygame/map_index.json'
+MAP_INDEX_VERSION : int = 1
+MAP_PACK_EXTENSION : str = '.bdpack'
+
+class MapEntry(TypedDict):
+    file : str
+    pack_index : int|None
+    width : int
+    height : int
+    hash : str
+    valid : bool
+    error : str|None
+    optimal_length : int|None
+    thumbnail : str
+
+class FileStamp(TypedDict):
+    mtime_ns : int
+    size : int
+    names : list[str]
+
+class MapIndexFile(TypedDict):
+    version : int
+    directory : str
+    files : dict[str, FileStamp]
+    maps : dict[str, MapEntry]
+
+def get_content_hash(data : bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:16]
+
+def get_thumbnail_key(entry_hash : str) -> str:
+    '''Maps with the same content share a thumbnail.'''
+    return f'map_{entry_hash}'
+
+def index_json_map(file_name : str, data : bytes) -> MapEntry:
+    content_hash : str = get_content_hash(data)
+    entry : MapEntry = {'file' : file_name, 'pack_index' : None, 'width' : 0, 'height' : 0, 'hash' : content_hash, 'valid' : False,
+                        'error' : None, 'optimal_length' : None, 'thumbnail' : get_thumbnail_key(content_hash)}
+    try:
+        saved_map : bd_core.SavedMap = json.loads(data)
+        entry['width'], entry['height'] = bd_core.get_map_size(saved_map)
+        entry['optimal_length'] = saved_map.get('optimal_length', None)
+        bd_core.validate_map(saved_map['map'], raise_errors=True)
+        entry['valid'] = True
+    except (ValueError, KeyError, IndexError, TypeError, bd_core.InvalidMapError) as error:
+        entry['error'] = f'{type(error).__name__}: {error}'
+    return entry
+
+def index_map_pack(file_name : str, file_path : str) -> dict[str, MapEntry]:
+    '''Packs are validated when they are written, so only their metadata is read (nothing is decoded).'''
+    entries : dict[str, MapEntry] = {}
+    pack_name : str = file_name.removesuffix(MAP_PACK_EXTENSION)
+    with bd_core.MapPack(file_path) as pack:
+        for index in range(len(pack)):
+            info : bd_core.MapInfo = pack.get_info(index)
+            layout : str = f'{info["width"]}x{info["height"]},{info["start_x"]},{info["start_y"]},{info["start_direction"]}:'
+            content_hash : str = get_content_hash(layout.encode() + bytes(pack.get_cells(index)))
+            entries[f'{pack_name}/{info["name"]}'] = {'file' : file_name, 'pack_index' : index, 'width' : info['width'], 'height' : info['height'],
+                                                      'hash' : content_hash, 'valid' : True, 'error' : None,
+                                                      'optimal_length' : info['optimal_length'], 'thumbnail' : get_thumbnail_key(content_hash)}
+    return entries
+
+class MapIndex:
+    def __init__(self, directory : str = MAP_DIRECTORY, index_path : str = MAP_INDEX_PATH):
+        self.directory : str = directory
+        self.index_path : str = index_path
+        self.data : MapIndexFile = self.read_index()
+        self.names : list[str] = []
+        self.packs : dict[str, bd_core.MapPack] = {}
+
+    def read_index(self) -> MapIndexFile:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                data : MapIndexFile = json.load(file)
+            if data.get('version', None) == MAP_INDEX_VERSION and data.get('directory', None) == self.directory: return data
+        except (FileNotFoundError, ValueError):
+            pass
+        return {'version' : MAP_INDEX_VERSION, 'directory' : self.directory, 'files' : {}, 'maps' : {}}
+
+    def write_index(self):
+        temporary_path : str = f'{self.index_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(self.data, file, separators=(',', ':'))
+        os.replace(temporary_path, self.index_path)
+
+    def refresh(self) -> int:
+        '''Re-indexes the files that were added or changed (by mtime or size) and drops the removed ones.
+        Returns the number of files that had to be read. The index is written back only when something changed.'''
+        files : dict[str, FileStamp] = self.data['files']
+        maps : dict[str, MapEntry] = self.data['maps']
+        seen : set[str] = set()
+        read_count : int = 0
+        for dir_entry in os.scandir(self.directory):
+            if not dir_entry.is_file() or not dir_entry.name.endswith(('.json', MAP_PACK_EXTENSION)): continue
+            seen.add(dir_entry.name)
+            stat : os.stat_result = dir_entry.stat()
+            stamp : FileStamp|None = files.get(dir_entry.name, None)
+            if stamp is not None and stamp['mtime_ns'] == stat.st_mtime_ns and stamp['size'] == stat.st_size: continue
+            read_count += 1
+            self.forget_file(dir_entry.name)
+            if dir_entry.name.endswith('.json'):
+                with open(dir_entry.path, 'rb') as file:
+                    new_entries : dict[str, MapEntry] = {dir_entry.name.removesuffix('.json') : index_json_map(dir_entry.name, file.read())}
+            else:
+                self.close_pack(dir_entry.name)
+                new_entries = index_map_pack(dir_entry.name, dir_entry.path)
+            maps.update(new_entries)
+            files[dir_entry.name] = {'mtime_ns' : stat.st_mtime_ns, 'size' : stat.st_size, 'names' : list(new_entries)}
+        removed : list[str] = [file_name for file_name in files if file_name not in seen]
+        for file_name in removed:
+            self.forget_file(file_name)
+            self.close_pack(file_name)
+        self.names = sorted(maps)
+        if read_count or removed: self.write_index()
+        return read_count
+
+    def forget_file(self, file_name : str):
+        stamp : FileStamp|None = self.data['files'].pop(file_name, None)
+        if stamp is None: return
+        for name in stamp['names']:
+            self.data['maps'].pop(name, None)
+
+    def close_pack(self, file_name : str):
+        pack : bd_core.MapPack|None = self.packs.pop(file_name, None)
+        if pack is not None: pack.close()
+
+    def get_names(self, valid_only : bool = True) -> list[str]:
+        if not valid_only: return self.names
+        maps : dict[str, MapEntry] = self.data['maps']
+        return [name for name in self.names if maps[name]['valid']]
+
+    def get_page(self, page_index : int, page_size : int, valid_only : bool = True) -> list[str]:
+        return self.get_names(valid_only)[page_index * page_size:(page_index + 1) * page_size]
+
+    def get_entry(self, name : str) -> MapEntry|None:
+        return self.data['maps'].get(name, None)
+
+    def is_stale(self, file_name : str) -> bool:
+        stamp : FileStamp|None = self.data['files'].get(file_name, None)
+        try:
+            stat : os.stat_result = os.stat(os.path.join(self.directory, file_name))
+        except FileNotFoundError:
+            return True
+        return stamp is None or stamp['mtime_ns'] != stat.st_mtime_ns or stamp['size'] != stat.st_size
+
+    def load(self, name : str) -> bd_core.SavedMap|None:
+        '''Loads an indexed map without validating it again (unless its file changed since it was indexed).
+        Returns None for unknown or invalid maps.'''
+        entry : MapEntry|None = self.get_entry(name)
+        if entry is not None and self.is_stale(entry['file']):
+            self.refresh()
+            entry = self.get_entry(name)
+        if entry is None or not entry['valid']: return None
+        if entry['pack_index'] is None:
+            with open(os.path.join(self.directory, entry['file']), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        pack : bd_core.MapPack|None = self.packs.get(entry['file'], None)
+        if pack is None:
+            pack = bd_core.MapPack(os.path.join(self.directory, entry['file']))
+            self.packs[entry['file']] = pack
+        return pack[entry['pack_index']]
+
+    def close(self):
+        for file_name in list(self.packs):
+            self.close_pack(file_name)
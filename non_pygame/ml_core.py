@@ -1,9 +1,13 @@
 import os
-from typing import Callable, TypedDict
+from typing import Callable, TypedDict, TypeAlias, Any, NotRequired
 from collections import deque
+from configparser import ConfigParser
+from copy import deepcopy, copy
 from time import sleep
 import sys
 import pickle
+import random
+import multiprocessing
 import neat.math_util
 from six import itervalues, iteritems
 from neat.population import CompleteExtinctionException
@@ -13,31 +17,118 @@ import neat.config
 from neat.config import Config as NeatConfig
 import neat.population
 from neat.population import Population
+from neat.graphs import feed_forward_layers
 import non_pygame.block_dude_core as bd_core
 from non_pygame.non_pygame_utils import stall
-
-MAP_USED : bd_core.SavedMap = bd_core.load_map('level2')
+from non_pygame.encoders import ObservationEncoder, make_encoder, get_encoder_input_size, DEFAULT_ENCODER
+from non_pygame.novelty import NoveltySearch, Behaviour, get_objective_fitness
+from non_pygame.turn_budget import TurnBudget, DEFAULT_TURN_BUDGET
+from non_pygame.profiling import GenerationProfiler, ProfilingReporter
+from non_pygame.run_log import RunLogReporter
+from non_pygame.genome_archive import GenomeArchive
+from non_pygame.checkpoints import Checkpointer, EncodedGenome, encode_genome_genes, decode_genome_genes
+
+DEFAULT_MAP_NAME : str = 'level2'
+
+def get_default_map() -> bd_core.SavedMap:
+    '''The map used when none is given, loaded on first use rather than at import (also available as MAP_USED).'''
+    saved_map : bd_core.SavedMap|None = globals().get('MAP_USED', None)
+    if saved_map is None:
+        saved_map = bd_core.load_map(DEFAULT_MAP_NAME)
+        globals()['MAP_USED'] = saved_map
+    return saved_map
+
+def __getattr__(name : str) -> Any:
+    if name == 'MAP_USED': return get_default_map()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 class GenomeReplay(TypedDict):
     genome : neat.DefaultGenome
     config : neat.Config
     map_used : bd_core.SavedMap
     net_used : neat.nn.FeedForwardNetwork
+    max_turns : NotRequired[int]
+
+class NetworkLayout:
+    def __init__(self, connection_keys : frozenset[tuple[int, int]], node_order : list[int]):
+        self.connection_keys : frozenset[tuple[int, int]] = connection_keys
+        self.node_order : list[int] = node_order
+
+class NetworkCompiler:
+    '''Builds the same networks as FeedForwardNetwork.create, but reuses the evaluation order of the genome itself or of a parent
+    when the enabled connections did not change. Weight and bias mutations then only need the numbers to be refilled.'''
+    def __init__(self, reproduction : neat.DefaultReproduction|None = None):
+        self.reproduction : neat.DefaultReproduction|None = reproduction
+        self.previous_layouts : dict[int, NetworkLayout] = {}
+        self.current_layouts : dict[int, NetworkLayout] = {}
+        self.full_compiles : int = 0
+        self.patched_compiles : int = 0
+
+    def next_generation(self):
+        '''Only the last generation can be a parent, so anything older is dropped.'''
+        self.previous_layouts = self.current_layouts
+        self.current_layouts = {}
+
+    def get_layout(self, genome_key : int) -> NetworkLayout|None:
+        return self.current_layouts.get(genome_key, None) or self.previous_layouts.get(genome_key, None)
+
+    def find_layout(self, genome_key : int, connection_keys : frozenset[tuple[int, int]]) -> NetworkLayout|None:
+        candidate_keys : list[int] = [genome_key]
+        if self.reproduction is not None:
+            candidate_keys += getattr(self.reproduction, 'ancestors', {}).get(genome_key, ())
+        for candidate_key in candidate_keys:
+            layout : NetworkLayout|None = self.get_layout(candidate_key)
+            if layout is not None and layout.connection_keys == connection_keys:
+                return layout
+        return None
+
+    def compile(self, genome : neat.DefaultGenome, config : neat.Config) -> neat.nn.FeedForwardNetwork:
+        genome_config = config.genome_config
+        enabled_connections : list = [cg for cg in itervalues(genome.connections) if cg.enabled]
+        connection_keys : frozenset[tuple[int, int]] = frozenset(cg.key for cg in enabled_connections)
+        layout : NetworkLayout|None = self.find_layout(genome.key, connection_keys)
+        if layout is None:
+            self.full_compiles += 1
+            layers = feed_forward_layers(genome_config.input_keys, genome_config.output_keys, [cg.key for cg in enabled_connections])
+            layout = NetworkLayout(connection_keys, [node for layer in layers for node in layer])
+        else:
+            self.patched_compiles += 1
+        self.current_layouts[genome.key] = layout
+
+        #links keep the genome's connection order so the sums add up in the same order as FeedForwardNetwork.create
+        links_by_node : dict[int, list[tuple[int, float]]] = {}
+        for cg in enabled_connections:
+            links_by_node.setdefault(cg.key[1], []).append((cg.key[0], cg.weight))
+        node_evals : list[tuple] = []
+        for node in layout.node_order:
+            ng = genome.nodes[node]
+            node_evals.append((node, genome_config.activation_defs.get(ng.activation), genome_config.aggregation_function_defs.get(ng.aggregation),
+                               ng.bias, ng.response, links_by_node.get(node, [])))
+        return neat.nn.FeedForwardNetwork(genome_config.input_keys, genome_config.output_keys, node_evals)
 
 class GenomeEvaluator:
-    def __init__(self, genomes : list[tuple[int, neat.DefaultGenome]], config : neat.Config, the_map_used : bd_core.SavedMap):
+    def __init__(self, genomes : list[tuple[int, neat.DefaultGenome]], config : neat.Config, the_map_used : bd_core.SavedMap,
+                 share_prefixes : bool = True, compiler : NetworkCompiler|None = None, max_turns : int|None = None,
+                 profiler : GenerationProfiler|None = None):
         self.genomes = genomes
         self.config : neat.Config = config
         self.map_used : bd_core.SavedMap = the_map_used
         self.progress : int = 0
         self.genome_count : int = len(genomes)
+        self.encoder : ObservationEncoder = get_config_encoder(config, the_map_used)
+        self.trajectory_tree : TrajectoryTree|None = TrajectoryTree(the_map_used, profiler=profiler) if share_prefixes else None
+        self.deduplicator : GenomeDeduplicator = GenomeDeduplicator()
+        self.compiler : NetworkCompiler|None = compiler
+        self.profiler : GenerationProfiler|None = profiler
+        self.max_turns : int = DEFAULT_TURN_BUDGET.get_turns(the_map_used) if max_turns is None else max_turns
     
     def isover(self) -> bool:
         return self.progress >= self.genome_count
     
     def do_genome(self):
         if self.isover(): return
-        eval_genome(self.genomes[self.progress], self.config, self.map_used)
+        eval_genome_deduped(self.genomes[self.progress], self.config, self.map_used, self.encoder, self.trajectory_tree, self.deduplicator,
+                            self.compiler, self.max_turns, self.profiler)
         self.progress += 1
 
 
@@ -63,19 +154,39 @@ class FixedStdOutReporter(neat.StdOutReporter):
         #best_species_id = species.get_species_id(best_genome.key)
         print('Population\'s average fitness: {0:3.5f} stdev: {1:3.5f}'.format(fit_mean, fit_std))
         print(
-            'Best fitness: {0:3.5f} - size: {1!r} - species {2} - id {3}'.format(best_genome.fitness,
+            'Best fitness: {0:3.5f} - size: {1!r} - species {2} - id {3}'.format(get_objective_fitness(best_genome),
                                                                                  best_genome.size(),
                                                                                  0,
                                                                                  best_genome.key))
 
 
+def seed_generation(seed : int, generation : int|str):
+    '''neat only draws from the global random module. Reseeding it from (seed, generation) right before a generation is bred
+    makes every generation depend on the seed alone, not on whatever else used random in between (the game, other runs...).
+    String seeds are hashed with sha512, so this does not depend on PYTHONHASHSEED.'''
+    random.seed(f'{seed}:{generation}')
+
+def make_population(config : neat.Config, seed : int|None = None) -> neat.Population:
+    if seed is not None: seed_generation(seed, 'initial')
+    return neat.Population(config)
+
 class PopulationInterface:
     #this code isnt mine: this is just a way to intergrate the pop.run function into the game loop
-    def __init__(self, population : neat.Population, gens : int|None = 50):
+    def __init__(self, population : neat.Population, gens : int|None = 50, novelty_search : NoveltySearch|None = None,
+                 turn_budget : TurnBudget|None = None, profiler : GenerationProfiler|None = None, archive : GenomeArchive|None = None,
+                 checkpointer : Checkpointer|None = None, seed : int|None = None):
         self.pop = population
         self.current_generation : int = 0
         self.max_generations : int|None = gens
         self.current_best_genome : neat.DefaultGenome|None = None
+        self.network_compiler : NetworkCompiler = NetworkCompiler(population.reproduction)
+        self.novelty_search : NoveltySearch|None = novelty_search
+        self.turn_budget : TurnBudget = DEFAULT_TURN_BUDGET if turn_budget is None else turn_budget
+        self.turn_budget_history : list[int] = []
+        self.profiler : GenerationProfiler|None = profiler
+        self.archive : GenomeArchive|None = archive
+        self.checkpointer : Checkpointer|None = checkpointer
+        self.seed : int|None = seed
     
     def get_best_genome(self) -> neat.DefaultGenome:
         sorted_key_list = sorted(self.pop.population, key = lambda k: self.pop.population[k].fitness)
@@ -91,31 +202,47 @@ class PopulationInterface:
     
     def start_generation(self):
         self.pop.reporters.start_generation(self.pop.generation)
+        if self.profiler is not None: self.profiler.start_generation(self.pop.generation)
     
     def end_generation(self):
         pop = self.pop
+        profiler : GenerationProfiler|None = self.profiler
+        if profiler is not None: profiler.start_lap()
+        if self.novelty_search is not None:
+            self.novelty_search.score_generation(pop.population, pop.reporters)
+            if profiler is not None: profiler.lap('novelty')
         # Gather and report statistics.
+        #the novelty bonus is scaled per generation, so genomes are compared on their objective fitness
 
         for g in itervalues(pop.population):
-            if self.current_best_genome is None or g.fitness > self.current_best_genome.fitness:
+            if self.current_best_genome is None or get_objective_fitness(g) > get_objective_fitness(self.current_best_genome):
                 self.current_best_genome = g
         pop.reporters.post_evaluate(pop.config, pop.population, pop.species, self.current_best_genome)
+        if profiler is not None: profiler.lap('reporting')
 
         # Track the best genome ever seen.
-        if pop.best_genome is None or self.current_best_genome.fitness > pop.best_genome.fitness:
+        if pop.best_genome is None or get_objective_fitness(self.current_best_genome) > get_objective_fitness(pop.best_genome):
             pop.best_genome = self.current_best_genome
 
+        if self.archive is not None:
+            self.archive.write_generation(pop.population, pop.config, pop.generation)
+            if profiler is not None: profiler.lap('archive')
+
         if not pop.config.no_fitness_termination:
             # End if the fitness threshold is reached.
-            fv = pop.fitness_criterion(g.fitness for g in itervalues(pop.population))
+            fv = pop.fitness_criterion(get_objective_fitness(g) for g in itervalues(pop.population))
             if fv >= pop.config.fitness_threshold:
+                #the solved generation's laps are closed first, so the run log's last record has them
+                if profiler is not None: profiler.end_generation()
                 pop.reporters.found_solution(pop.config, pop.generation, self.current_best_genome)
                 self.current_generation = self.max_generations
                 return
 
         # Create the next generation from the current generation.
+        if self.seed is not None: seed_generation(self.seed, pop.generation)
         pop.population = pop.reproduction.reproduce(pop.config, pop.species,
                                                         pop.config.pop_size, pop.generation)
+        if profiler is not None: profiler.lap('reproduction')
 
         # Check for complete extinction.
         if not pop.species.species:
@@ -130,14 +257,31 @@ class PopulationInterface:
             else:
                 raise CompleteExtinctionException()
 
+        self.network_compiler.next_generation()
+
         # Divide the new population into species.
         pop.species.speciate(pop.config, pop.population, pop.generation)
+        if profiler is not None:
+            profiler.lap('speciation')
+            profiler.end_generation()
 
         pop.reporters.end_generation(pop.config, pop.population, pop.species)
 
         pop.generation += 1
         self.current_generation += 1
+        if self.checkpointer is not None: self.checkpointer.maybe_save(self)
     
+    def get_turn_budget(self, used_map : bd_core.SavedMap) -> int:
+        '''Turns every genome gets this generation. The budget is logged, and kept in turn_budget_history.'''
+        max_turns : int = self.turn_budget.get_turns(used_map, self.current_generation)
+        self.turn_budget_history.append(max_turns)
+        self.pop.reporters.info(f'Turn budget : {max_turns} turns')
+        return max_turns
+
+    def report_dedup(self, deduplicator : 'GenomeDeduplicator'):
+        self.pop.reporters.info(f'Evaluated {deduplicator.get_unique_count()}/{deduplicator.genome_count} genomes '
+                                f'(dedup ratio : {deduplicator.get_dedup_ratio():0.3f})')
+
     def isover(self):
         return self.current_generation >= self.max_generations
     
@@ -180,79 +324,349 @@ def get_fitness(game : bd_core.Game, turn_count : int = 0) -> float:
             score -= 30.0
     return score
 
-def eval_genome(genome_arg : tuple[int, neat.DefaultGenome], config : neat.Config, used_map : bd_core.SavedMap|None = None):
-    genome = genome_arg[1]
-    genome.fitness = 0
-    repeat_count : int = 0
-    if used_map is None: used_map = MAP_USED
-    player : bd_core.Game = bd_core.Game.from_saved_map(used_map, copy_map=True)
-    player_net = neat.nn.FeedForwardNetwork.create(genome, config)
-    box_carry_start_dist : float|None = None
-    box_carry_bonus : float = 0.0
-    verifications, actions = player.get_binds()
-    genome.net_used = player_net
-    state_stream : deque[bd_core.GameState] = deque([player.to_game_state()], maxlen=15)
-    action_stream : deque[int] = deque([], maxlen=14)
-    duped_actions : list[int] = []
-    for turn in range(100):
-        start_dist : float = player.get_dist()        
-        output : list[float] = player_net.activate([*flatten_map_gen(player.map), player.player_x, player.player_y, 
-                                                    player.player_direction, player.player_holding_block])
-        output_dict : dict[int, float] = {i : output[i] for i in range(len(output))}
-        sorted_output : dict[int, float] = sort_dict_by_values(output_dict, reverse=True)
-        chosen_action : int
-        duped_actions = []
-        for action, game_state in zip(action_stream, state_stream):
+def get_config_encoder(config : neat.Config, used_map : bd_core.SavedMap) -> ObservationEncoder:
+    #configs pickled before encoders existed were all trained on the full map
+    return make_encoder(getattr(config, 'encoder_name', DEFAULT_ENCODER), used_map)
+
+class GenomeRun:
+    '''Everything that is tracked while a genome plays. A turn only depends on this state and the order the network ranked the actions in.'''
+    def __init__(self, player : bd_core.Game):
+        self.player : bd_core.Game = player
+        self.verifications, self.actions = player.get_binds()
+        self.state_stream : deque[bd_core.GameState] = deque([player.to_game_state()], maxlen=15)
+        self.action_stream : deque[int] = deque([], maxlen=14)
+        self.box_carry_start_dist : float|None = None
+        self.box_carry_bonus : float = 0.0
+        self.repeat_count : int = 0
+        self.last_outcome : tuple[tuple[int, ...], int]|None = None
+        self.visited_cells : set[tuple[int, int]] = {(player.player_x, player.player_y)}
+        self.blocks_moved : int = 0
+
+    def copy(self) -> 'GenomeRun':
+        new_player : bd_core.Game = copy(self.player)
+        new_player.map = [row[:] for row in self.player.map]
+        new_run : GenomeRun = GenomeRun.__new__(GenomeRun)
+        new_run.player = new_player
+        new_run.verifications, new_run.actions = new_player.get_binds()
+        #the saved states point at the live map, so they have to point at the copy's map as well
+        new_run.state_stream = deque(({**game_state, 'map' : new_player.map} for game_state in self.state_stream), maxlen=15)
+        new_run.action_stream = self.action_stream.copy()
+        new_run.box_carry_start_dist = self.box_carry_start_dist
+        new_run.box_carry_bonus = self.box_carry_bonus
+        new_run.repeat_count = self.repeat_count
+        new_run.last_outcome = self.last_outcome
+        new_run.visited_cells = self.visited_cells.copy()
+        new_run.blocks_moved = self.blocks_moved
+        return new_run
+
+    def play_turn(self, sorted_output : dict[int, float]|list[int]|tuple[int, ...], profiler : GenerationProfiler|None = None):
+        player : bd_core.Game = self.player
+        verifications, actions = self.verifications, self.actions
+        executed : list[int] = []
+        duped_actions : list[int] = []
+        for action, game_state in zip(self.action_stream, self.state_stream):
             if player == game_state:
                 if not duped_actions:
-                    repeat_count += 1
+                    self.repeat_count += 1
                 duped_actions.append(action)
                 break
+        if profiler is not None: profiler.lap('loop_detection')
         
         chosen_action : int|None = None
         for action_type in sorted_output:
             if action_type in duped_actions: continue
             if not verifications[action_type](): continue
             actions[action_type]()
+            executed.append(action_type)
             chosen_action = action_type
             break
         if not chosen_action:
             for action_type in sorted_output:
                 if not verifications[action_type](): continue
                 actions[action_type]()
+                executed.append(action_type)
                 chosen_action = action_type
                 break
+        if profiler is not None: profiler.lap('game_moves')
+        state_stream, action_stream = self.state_stream, self.action_stream
         if len(state_stream) >= state_stream.maxlen: state_stream.popleft()
         state_stream.append(player.to_game_state())
         if len(action_stream) >= action_stream.maxlen: action_stream.popleft()
         action_stream.append(action_type)
-        end_dist : float = player.get_dist()
+        self.last_outcome = (tuple(executed), action_type)
+        self.visited_cells.add((player.player_x, player.player_y))
         if chosen_action == bd_core.ActionType.DOWN.value:
             if not player.player_holding_block:
+                self.blocks_moved += 1
                 box_carry_end_dist = player.get_facing_dist()
-                progress : float = box_carry_start_dist - box_carry_end_dist
-                box_carry_bonus += 6 * progress
-                box_carry_start_dist = None
+                progress : float = self.box_carry_start_dist - box_carry_end_dist
+                self.box_carry_bonus += 6 * progress
+                self.box_carry_start_dist = None
                 drop_location : tuple[int, int] = player.get_drop_loaction(player.player_x + player.player_direction, player.player_y - 1)
                 if (player.get_at(*drop_location) == bd_core.CellType.BLOCK.value 
                 and player.get_at(drop_location[0], drop_location[1] + 1) == bd_core.CellType.BLOCK):
                     if progress > 0:
-                        box_carry_bonus -= 4 * progress
-                        box_carry_bonus -= 22
+                        self.box_carry_bonus -= 4 * progress
+                        self.box_carry_bonus -= 22
                     else:
-                        box_carry_bonus -= 22
+                        self.box_carry_bonus -= 22
             else:
-                box_carry_start_dist = player.get_facing_dist()
-        genome.fitness = get_fitness(player, turn) + box_carry_bonus
-        if player.game_won():
-            genome.fitness = get_fitness(player, turn) + box_carry_bonus + 20
-            return
-    genome.fitness = get_fitness(player, turn) + box_carry_bonus
-
-def eval_genomes(genomes : list[int, tuple[int, neat.DefaultGenome]], config : neat.config.Config, used_map : bd_core.SavedMap|None = None):
-    if used_map is None: used_map = MAP_USED
+                self.box_carry_start_dist = player.get_facing_dist()
+        if profiler is not None: profiler.lap('bookkeeping')
+
+    def get_fitness(self, turn : int) -> float:
+        if self.player.game_won():
+            return get_fitness(self.player, turn) + self.box_carry_bonus + 20
+        return get_fitness(self.player, turn) + self.box_carry_bonus
+
+    def get_behaviour(self) -> Behaviour:
+        '''Behaviour descriptor used by novelty search : final position, blocks moved and amount of cells visited.'''
+        return (self.player.player_x, self.player.player_y, self.blocks_moved, len(self.visited_cells))
+
+class TrajectoryNode:
+    def __init__(self, run : GenomeRun, fitness : float = 0.0):
+        self.run : GenomeRun = run
+        self.fitness : float = fitness
+        self.won : bool = run.player.game_won()
+        self.outcomes : dict[tuple[int, ...], tuple[tuple[int, ...], int]] = {}
+        self.children : dict[tuple[tuple[int, ...], int], TrajectoryNode] = {}
+
+#a node keeps a whole GenomeRun (map copy, saved states, visited cells, binds) : about 10 KB each on level2, measured with tracemalloc
+TRAJECTORY_NODE_BYTES : int = 10 * 1024
+#what one generation's tree may hold on to, about 20k nodes (a generation of 100 genomes on level2 makes around 7k)
+TRAJECTORY_MEMORY_BUDGET : int = 200 * 1024 * 1024
+DEFAULT_TRAJECTORY_NODES : int = TRAJECTORY_MEMORY_BUDGET // TRAJECTORY_NODE_BYTES
+
+class TrajectoryTree:
+    '''Trie of the turns already played this generation.
+    Genomes that rank the actions the same way from the same state share the successor instead of re-simulating it.
+    Past max_nodes, new turns are still played but no longer kept in the tree, which keeps memory within TRAJECTORY_MEMORY_BUDGET.'''
+    def __init__(self, used_map : bd_core.SavedMap, max_nodes : int = DEFAULT_TRAJECTORY_NODES, profiler : GenerationProfiler|None = None):
+        self.root : TrajectoryNode = TrajectoryNode(GenomeRun(bd_core.Game.from_saved_map(used_map, copy_map=True)))
+        self.max_nodes : int = max_nodes
+        self.node_count : int = 1
+        self.hits : int = 0
+        self.misses : int = 0
+        self.profiler : GenerationProfiler|None = profiler
+
+    def get_child(self, node : TrajectoryNode, sorted_output : tuple[int, ...], turn : int) -> TrajectoryNode:
+        profiler : GenerationProfiler|None = self.profiler
+        outcome : tuple[tuple[int, ...], int]|None = node.outcomes.get(sorted_output, None)
+        if outcome is not None:
+            self.hits += 1
+            if profiler is not None: profiler.lap('trajectory_lookup')
+            return node.children[outcome]
+        self.misses += 1
+        new_run : GenomeRun = node.run.copy()
+        if profiler is not None: profiler.lap('trajectory_copy')
+        new_run.play_turn(sorted_output, profiler)
+        outcome = new_run.last_outcome
+        #different rankings can still end up taking the same actions
+        if outcome in node.children:
+            node.outcomes[sorted_output] = outcome
+            if profiler is not None: profiler.lap('trajectory_lookup')
+            return node.children[outcome]
+        child : TrajectoryNode = TrajectoryNode(new_run, new_run.get_fitness(turn))
+        if self.node_count < self.max_nodes:
+            node.outcomes[sorted_output] = outcome
+            node.children[outcome] = child
+            self.node_count += 1
+        if profiler is not None: profiler.lap('fitness')
+        return child
+
+    def get_hit_ratio(self) -> float:
+        total : int = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class GenomeDeduplicator:
+    '''Finds genomes whose expressed network computes exactly the same thing as one already evaluated this generation.
+    Hidden nodes are labelled by what they compute instead of by their key, so independent but identical mutations still match.'''
+    def __init__(self):
+        self.node_labels : dict[tuple, int] = {}
+        self.representatives : dict[tuple, neat.DefaultGenome] = {}
+        self.genome_count : int = 0
+        self.duplicate_count : int = 0
+
+    def get_fingerprint(self, net : neat.nn.FeedForwardNetwork) -> tuple[int|None, ...]:
+        #input labels are their (negative) keys, computed nodes get non-negative ids
+        labels : dict[int, int] = {key : key for key in net.input_nodes}
+        for node, act_func, agg_func, bias, response, links in net.node_evals:
+            signature : tuple = (act_func.__name__, agg_func.__name__, bias, response, tuple(sorted((labels[i], w) for i, w in links)))
+            label : int|None = self.node_labels.get(signature, None)
+            if label is None:
+                label = len(self.node_labels)
+                self.node_labels[signature] = label
+            labels[node] = label
+        #outputs that never get evaluated always read 0.0
+        return tuple(labels.get(key, None) for key in net.output_nodes)
+
+    def find_duplicate(self, genome : neat.DefaultGenome, net : neat.nn.FeedForwardNetwork) -> neat.DefaultGenome|None:
+        '''Returns the already seen genome with the same network, or registers this one as a new representative.'''
+        self.genome_count += 1
+        fingerprint : tuple[int|None, ...] = self.get_fingerprint(net)
+        representative : neat.DefaultGenome|None = self.representatives.get(fingerprint, None)
+        if representative is None:
+            self.representatives[fingerprint] = genome
+            return None
+        self.duplicate_count += 1
+        return representative
+
+    def get_unique_count(self) -> int:
+        return self.genome_count - self.duplicate_count
+
+    def get_dedup_ratio(self) -> float:
+        return self.duplicate_count / self.genome_count if self.genome_count else 0.0
+
+def eval_genome(genome_arg : tuple[int, neat.DefaultGenome], config : neat.Config, used_map : bd_core.SavedMap|None = None,
+                encoder : ObservationEncoder|None = None, trajectory_tree : TrajectoryTree|None = None,
+                net : neat.nn.FeedForwardNetwork|None = None, max_turns : int|None = None, profiler : GenerationProfiler|None = None):
+    genome = genome_arg[1]
+    genome.fitness = 0
+    if used_map is None: used_map = get_default_map()
+    if max_turns is None: max_turns = DEFAULT_TURN_BUDGET.get_turns(used_map)
+    if encoder is None: encoder = get_config_encoder(config, used_map)
+    if profiler is not None: profiler.start_lap()
+    player_net = net or neat.nn.FeedForwardNetwork.create(genome, config)
+    genome.net_used = player_net
+    if profiler is not None and net is None: profiler.lap('compile')
+    #the actions actually played, so the run can be saved as a compact replay (see replays.py)
+    actions_played : list[int] = []
+    genome.actions_played = actions_played
+    #a turn can play two actions (see GenomeRun.play_turn), so the turns are counted on their own
+    genome.turns_played = 0
+    if trajectory_tree is not None:
+        node : TrajectoryNode = trajectory_tree.root
+        for turn in range(max_turns):
+            inputs : list[float] = encoder.encode(node.run.player)
+            if profiler is not None: profiler.lap('encode')
+            output : list[float] = player_net.activate(inputs)
+            if profiler is not None: profiler.lap('activate')
+            output_dict : dict[int, float] = {i : output[i] for i in range(len(output))}
+            sorted_output : tuple[int, ...] = tuple(sort_dict_by_values(output_dict, reverse=True))
+            if profiler is not None: profiler.lap('rank_actions')
+            node = trajectory_tree.get_child(node, sorted_output, turn)
+            actions_played += node.run.last_outcome[0]
+            genome.turns_played = turn + 1
+            genome.fitness = node.fitness
+            if node.won: break
+        genome.behaviour = node.run.get_behaviour()
+        return
+    run : GenomeRun = GenomeRun(bd_core.Game.from_saved_map(used_map, copy_map=True))
+    for turn in range(max_turns):
+        inputs : list[float] = encoder.encode(run.player)
+        if profiler is not None: profiler.lap('encode')
+        output : list[float] = player_net.activate(inputs)
+        if profiler is not None: profiler.lap('activate')
+        output_dict : dict[int, float] = {i : output[i] for i in range(len(output))}
+        sorted_output : dict[int, float] = sort_dict_by_values(output_dict, reverse=True)
+        if profiler is not None: profiler.lap('rank_actions')
+        run.play_turn(sorted_output, profiler)
+        actions_played += run.last_outcome[0]
+        genome.turns_played = turn + 1
+        genome.fitness = run.get_fitness(turn)
+        if profiler is not None: profiler.lap('fitness')
+        if run.player.game_won(): break
+    genome.behaviour = run.get_behaviour()
+
+def eval_genome_deduped(genome_arg : tuple[int, neat.DefaultGenome], config : neat.Config, used_map : bd_core.SavedMap,
+                        encoder : ObservationEncoder, trajectory_tree : TrajectoryTree|None, deduplicator : GenomeDeduplicator,
+                        compiler : NetworkCompiler|None = None, max_turns : int|None = None, profiler : GenerationProfiler|None = None):
+    genome = genome_arg[1]
+    if profiler is not None: profiler.start_lap()
+    if compiler is None:
+        net : neat.nn.FeedForwardNetwork = neat.nn.FeedForwardNetwork.create(genome, config)
+    else:
+        net : neat.nn.FeedForwardNetwork = compiler.compile(genome, config)
+    if profiler is not None: profiler.lap('compile')
+    representative : neat.DefaultGenome|None = deduplicator.find_duplicate(genome, net)
+    if profiler is not None: profiler.lap('dedup')
+    if representative is None:
+        eval_genome(genome_arg, config, used_map, encoder, trajectory_tree, net, max_turns, profiler)
+        return
+    genome.net_used = net
+    genome.fitness = representative.fitness
+    genome.behaviour = representative.behaviour
+    genome.actions_played = representative.actions_played
+    genome.turns_played = representative.turns_played
+
+def eval_genomes(genomes : list[int, tuple[int, neat.DefaultGenome]], config : neat.config.Config, used_map : bd_core.SavedMap|None = None,
+                 share_prefixes : bool = True, compiler : NetworkCompiler|None = None, max_turns : int|None = None,
+                 profiler : GenerationProfiler|None = None) -> GenomeDeduplicator:
+    if used_map is None: used_map = get_default_map()
+    if max_turns is None: max_turns = DEFAULT_TURN_BUDGET.get_turns(used_map)
+    encoder : ObservationEncoder = get_config_encoder(config, used_map)
+    trajectory_tree : TrajectoryTree|None = TrajectoryTree(used_map, profiler=profiler) if share_prefixes else None
+    deduplicator : GenomeDeduplicator = GenomeDeduplicator()
     for genome in genomes:
-        eval_genome(genome, config, used_map)
+        eval_genome_deduped(genome, config, used_map, encoder, trajectory_tree, deduplicator, compiler, max_turns, profiler)
+    return deduplicator
+
+#what a worker sends back per genome : fitness, behaviour, the actions played and the number of turns they took
+EvaluationResult : TypeAlias = tuple[float, Behaviour, list[int], int]
+#map name, genomes to evaluate on it and their turn budget
+EvaluationJob : TypeAlias = tuple[str, list[tuple[int, neat.DefaultGenome]], int]
+_worker_setup : dict[str, Any] = {}
+
+def init_evaluation_worker(config : neat.Config, maps : dict[str, bd_core.SavedMap], share_prefixes : bool):
+    _worker_setup.update(config=config, maps=maps, share_prefixes=share_prefixes)
+
+def evaluate_chunk(task : tuple[str, list[EncodedGenome], int]) -> tuple[list[EvaluationResult], int, int]:
+    map_name, encoded_genomes, max_turns = task
+    config : neat.Config = _worker_setup['config']
+    genomes : list[tuple[int, neat.DefaultGenome]] = [(encoded[0], decode_genome_genes(encoded, config)) for encoded in encoded_genomes]
+    deduplicator : GenomeDeduplicator = eval_genomes(genomes, config, _worker_setup['maps'][map_name], _worker_setup['share_prefixes'],
+                                                     max_turns=max_turns)
+    results : list[EvaluationResult] = [(genome.fitness, genome.behaviour, genome.actions_played, genome.turns_played) for _, genome in genomes]
+    return results, deduplicator.genome_count, deduplicator.duplicate_count
+
+class ParallelEvaluator:
+    '''Evaluates generations on worker processes. The genome list is cut into contiguous chunks and the results are put back
+    in list order. A genome's fitness never depends on the other genomes (the trajectory tree and deduplication only share work),
+    so the results are bit-identical to eval_genomes whatever the number of workers.
+    The workers get every map up front, so one pool can evaluate on any of them (see run_jobs).'''
+    def __init__(self, workers : int, config : neat.Config, maps : dict[str, bd_core.SavedMap], share_prefixes : bool = True,
+                 chunks_per_worker : int = 2):
+        self.workers : int = workers
+        self.chunks_per_worker : int = chunks_per_worker
+        self.map_names : list[str] = list(maps)
+        self.pool = multiprocessing.Pool(workers, initializer=init_evaluation_worker, initargs=(config, maps, share_prefixes))
+
+    def run_jobs(self, jobs : list[EvaluationJob]) -> list[tuple[list[EvaluationResult], GenomeDeduplicator]]:
+        '''Runs every job in the same pool.map, so different maps are evaluated at the same time. Results come back per job,
+        in the order of its genomes, and the genomes themselves are left untouched.
+        Duplicates are only found within a chunk, so the deduplicators count fewer of them than eval_genomes would.'''
+        #about workers * chunks_per_worker chunks in total, however many jobs there are
+        chunks_per_job : int = -(-self.workers * self.chunks_per_worker // max(len(jobs), 1))
+        tasks : list[tuple[str, list[EncodedGenome], int]] = []
+        task_jobs : list[int] = []
+        for job_index, (map_name, genomes, max_turns) in enumerate(jobs):
+            chunk_count : int = max(1, min(len(genomes), chunks_per_job))
+            bounds : list[int] = [len(genomes) * index // chunk_count for index in range(chunk_count + 1)]
+            #genomes travel as their genes only, their previous evaluation (and network) stays behind
+            for start, end in zip(bounds, bounds[1:]):
+                tasks.append((map_name, [encode_genome_genes(genome) for _, genome in genomes[start:end]], max_turns))
+                task_jobs.append(job_index)
+        job_results : list[tuple[list[EvaluationResult], GenomeDeduplicator]] = [([], GenomeDeduplicator()) for _ in jobs]
+        for job_index, (results, genome_count, duplicate_count) in zip(task_jobs, self.pool.map(evaluate_chunk, tasks)):
+            job_results[job_index][0].extend(results)
+            job_results[job_index][1].genome_count += genome_count
+            job_results[job_index][1].duplicate_count += duplicate_count
+        return job_results
+
+    def evaluate(self, genomes : list[tuple[int, neat.DefaultGenome]], max_turns : int, map_name : str|None = None) -> GenomeDeduplicator:
+        '''Sets fitness, behaviour, actions_played and turns_played on the genomes, played on map_name (the first map by default).'''
+        if map_name is None: map_name = self.map_names[0]
+        results, deduplicator = self.run_jobs([(map_name, genomes, max_turns)])[0]
+        for (_, genome), (fitness, behaviour, actions_played, turns_played) in zip(genomes, results):
+            genome.fitness = fitness
+            genome.behaviour = behaviour
+            genome.actions_played = actions_played
+            genome.turns_played = turns_played
+        return deduplicator
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
 
 lookup : list[int] = [4 ** i for i in range(38)]
 def compress_map_gen(map : list[list[int]]):
@@ -262,31 +676,91 @@ def compress_map_gen(map : list[list[int]]):
 def get_map_input_size(the_map : bd_core.SavedMap):
     return len(the_map['map']) * len(the_map['map'][0])
 
-def modify_config(config_path : str, used_map : bd_core.SavedMap|None = None):
-    if used_map is None: used_map = MAP_USED
-    input_count : int = 4 + get_map_input_size(used_map)
-    with open(config_path, 'r') as file:
-        og_lines : list[str] = file.readlines()
-    
-    with open(config_path, 'w') as file:
-        for og_line in og_lines:
-            if "num_inputs" in og_line:
-                file.write(f"num_inputs              = {input_count}\n")
-            else:
-                file.write(og_line)
-
-def run(config_path : str):
-    modify_config(config_path)
-    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
-    pop : neat.Population = neat.Population(config)
+ConfigOverrides : TypeAlias = dict[str, dict[str, Any]]
+
+class CachedConfigFile(TypedDict):
+    mtime : float
+    config : NeatConfig
+    sections : dict[str, dict[str, str]]
+
+_config_file_cache : dict[str, CachedConfigFile] = {}
+
+def get_cached_config_file(config_path : str) -> CachedConfigFile:
+    '''Parses the config file once and keeps it around until the file changes on disk.'''
+    config_path = os.path.abspath(config_path)
+    mtime : float = os.path.getmtime(config_path)
+    cached : CachedConfigFile|None = _config_file_cache.get(config_path)
+    if cached is None or cached['mtime'] != mtime:
+        config = NeatConfig(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+        parser = ConfigParser()
+        parser.read(config_path)
+        sections : dict[str, dict[str, str]] = {section : dict(parser.items(section)) for section in parser.sections()}
+        cached = {'mtime' : mtime, 'config' : config, 'sections' : sections}
+        _config_file_cache[config_path] = cached
+    return cached
+
+def get_input_count(the_map : bd_core.SavedMap, encoder_name : str = DEFAULT_ENCODER) -> int:
+    return get_encoder_input_size(encoder_name, the_map)
+
+def apply_config_overrides(config : NeatConfig, sections : dict[str, dict[str, str]], overrides : ConfigOverrides):
+    '''Overrides are given per config section, e.g {'NEAT' : {'pop_size' : 200}, 'DefaultGenome' : {'num_inputs' : 76}}.'''
+    sub_configs : dict[str, tuple[str, type]] = {
+        config.genome_type.__name__ : ('genome_config', config.genome_type),
+        config.reproduction_type.__name__ : ('reproduction_config', config.reproduction_type),
+        config.species_set_type.__name__ : ('species_set_config', config.species_set_type),
+        config.stagnation_type.__name__ : ('stagnation_config', config.stagnation_type),
+    }
+    for section, section_overrides in overrides.items():
+        if not section_overrides: continue
+        if section == 'NEAT':
+            for name, value in section_overrides.items():
+                if not hasattr(config, name): raise neat.config.UnknownConfigItemError(f'Unknown NEAT config item {name}')
+                param = neat.config.ConfigParameter(name, type(getattr(config, name)))
+                setattr(config, name, param.interpret({name : str(value)}))
+        elif section in sub_configs:
+            #the sub-configs derive values from their params (input_keys, output_keys...), so rebuild them from the raw section
+            attribute_name, section_type = sub_configs[section]
+            param_dict : dict[str, str] = dict(sections[section])
+            param_dict.update({name : str(value) for name, value in section_overrides.items()})
+            setattr(config, attribute_name, section_type.parse_config(param_dict))
+        else:
+            raise neat.config.UnknownConfigItemError(f'Unknown config section {section}')
+
+def make_config(config_path : str, used_map : bd_core.SavedMap|None = None, overrides : ConfigOverrides|None = None,
+                encoder_name : str = DEFAULT_ENCODER, species_set_type : type|None = None, reproduction_type : type|None = None) -> NeatConfig:
+    '''Returns a fresh config for the map used without touching the config file, so parallel runs can each have their own.
+    species_set_type and reproduction_type can swap in classes that take the same config sections as neat's defaults
+    (see species_sets.py and reproduction.py).'''
+    if used_map is None: used_map = get_default_map()
+    cached : CachedConfigFile = get_cached_config_file(config_path)
+    all_overrides : ConfigOverrides = {cached['config'].genome_type.__name__ : {'num_inputs' : get_input_count(used_map, encoder_name)}}
+    if overrides:
+        for section, section_overrides in overrides.items():
+            all_overrides.setdefault(section, {}).update(section_overrides)
+    config : NeatConfig = deepcopy(cached['config'])
+    apply_config_overrides(config, cached['sections'], all_overrides)
+    config.encoder_name = encoder_name
+    if species_set_type is not None: config.species_set_type = species_set_type
+    if reproduction_type is not None: config.reproduction_type = reproduction_type
+    return config
+
+def run(config_path : str, seed : int|None = None, workers : int = 1):
+    config = make_config(config_path)
+    pop : neat.Population = make_population(config, seed)
     
     pop.add_reporter(FixedStdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    pop.add_reporter(stats)
+    profiler : GenerationProfiler = GenerationProfiler()
+    pop.add_reporter(ProfilingReporter(profiler))
+    archive : GenomeArchive = GenomeArchive(get_default_map())
+    ipop : PopulationInterface = PopulationInterface(pop, 199, profiler=profiler, archive=archive, seed=seed)
+    run_log : RunLogReporter = RunLogReporter(profiler=profiler, population_interface=ipop)
+    pop.add_reporter(run_log)
     #pop.add_reporter(neat.Checkpointer(5))
 
     # Run for up to 50 generations.
-    winner = run_interface(PopulationInterface(pop, 199))
+    winner = run_interface(ipop, workers=workers)
+    run_log.close()
+    archive.close()
 
     # show final stats
     print('\nBest genome:')
@@ -299,30 +773,48 @@ def run(config_path : str):
         #pickle.dump((winner, config), file)
     
 
-def get_pop_runner(config_path : str, map_used : bd_core.SavedMap, generations : int) -> PopulationInterface:
-    modify_config(config_path, map_used)
-    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
-    pop : neat.Population = neat.Population(config)
+def get_pop_runner(config_path : str, map_used : bd_core.SavedMap, generations : int, overrides : ConfigOverrides|None = None,
+                   encoder_name : str = DEFAULT_ENCODER, species_set_type : type|None = None,
+                   reproduction_type : type|None = None, novelty_search : NoveltySearch|None = None,
+                   turn_budget : TurnBudget|None = None, archive : GenomeArchive|None = None,
+                   checkpointer : Checkpointer|None = None, seed : int|None = None) -> PopulationInterface:
+    '''With a seed, the initial population and every generation are the same from one run to the next.'''
+    config = make_config(config_path, map_used, overrides, encoder_name, species_set_type, reproduction_type)
+    pop : neat.Population = make_population(config, seed)
     
-    return PopulationInterface(pop, generations)
+    return PopulationInterface(pop, generations, novelty_search, turn_budget, archive=archive, checkpointer=checkpointer, seed=seed)
 
 
-def run_interface(ipop : 'PopulationInterface') -> neat.DefaultGenome:
+def run_interface(ipop : 'PopulationInterface', used_map : bd_core.SavedMap|None = None, workers : int = 1) -> neat.DefaultGenome:
+    '''With workers > 1 generations are evaluated by a ParallelEvaluator, which gives the same generations as the serial path.'''
+    if used_map is None: used_map = get_default_map()
+    evaluator : ParallelEvaluator|None = ParallelEvaluator(workers, ipop.pop.config, {'used_map' : used_map}) if workers > 1 else None
     ipop.start_running()
-    while True:
-        ipop.start_generation()
-        eval_genomes(list(iteritems(ipop.pop.population)), ipop.pop.config)
-        ipop.end_generation()
-        if ipop.isover(): break
+    try:
+        while True:
+            ipop.start_generation()
+            if evaluator is None:
+                deduplicator : GenomeDeduplicator = eval_genomes(list(iteritems(ipop.pop.population)), ipop.pop.config, used_map,
+                                                                 compiler=ipop.network_compiler, max_turns=ipop.get_turn_budget(used_map),
+                                                                 profiler=ipop.profiler)
+            else:
+                deduplicator : GenomeDeduplicator = evaluator.evaluate(list(iteritems(ipop.pop.population)), ipop.get_turn_budget(used_map))
+            ipop.report_dedup(deduplicator)
+            ipop.end_generation()
+            if ipop.isover(): break
+    finally:
+        if evaluator is not None: evaluator.close()
     winner = ipop.end_run()
     return winner
 
 
-def show_genome_playing(genome : neat.DefaultGenome, config : neat.config.Config, playback_speed : float = 5, max_turn : int = 100, 
+def show_genome_playing(genome : neat.DefaultGenome, config : neat.config.Config, playback_speed : float = 5, max_turn : int|None = None, 
                         intro_text : str = 'The best genome is now playing!', used_map : bd_core.SavedMap|None = None):
-    if used_map is None: used_map = MAP_USED
+    if used_map is None: used_map = get_default_map()
+    if max_turn is None: max_turn = DEFAULT_TURN_BUDGET.get_turns(used_map)
     net = neat.nn.FeedForwardNetwork.create(genome, config)
     player = bd_core.Game.from_saved_map(used_map, copy_map=True)
+    encoder : ObservationEncoder = get_config_encoder(config, used_map)
     bd_core.clear_console()
     print(intro_text)
     stall()
@@ -331,8 +823,7 @@ def show_genome_playing(genome : neat.DefaultGenome, config : neat.config.Config
     won : bool = False
     for turn in range(max_turn):
         verifications, actions = player.get_binds()
-        output : list[float] = net.activate([*flatten_map_gen(player.map), player.player_x, player.player_y, 
-                                                    player.player_direction, player.player_holding_block])
+        output : list[float] = net.activate(encoder.encode(player))
         output_dict : dict[int, float] = {i : output[i] for i in range(len(output))}
         sorted_output = sort_dict_by_values(output_dict, reverse=True)
         for action_type in sorted_output:
@@ -0,0 +1,135 @@
+import sys
+sys.path.append(".")
+from collections import deque
+from heapq import heappush, heapreplace
+import numpy as np
+import neat
+from six import itervalues
+
+Behaviour = tuple[float, ...]
+
+def get_objective_fitness(genome : neat.DefaultGenome) -> float:
+    '''Fitness without the novelty bonus (the same as genome.fitness when novelty search is off).'''
+    return getattr(genome, 'objective_fitness', genome.fitness)
+
+class KDTree:
+    '''Static k-d tree over a set of points: built once per generation, then queried for every genome.
+    Leaves hold up to LEAF_SIZE points, stored next to each other so they are compared in one numpy call.'''
+    LEAF_SIZE : int = 16
+    def __init__(self, points : np.ndarray):
+        points = np.asarray(points, dtype=np.float64)
+        self.size : int = len(points)
+        #node : (start, end, axis, split, left child, right child), leaves have no children (-1)
+        self.nodes : list[tuple[int, int, int, float, int, int]] = []
+        order : np.ndarray = np.arange(self.size)
+        if self.size: self.build(points, order, 0, self.size)
+        self.points : np.ndarray = points[order]
+        self.ids : list[int] = order.tolist()
+
+    def build(self, points : np.ndarray, order : np.ndarray, start : int, end : int) -> int:
+        node_index : int = len(self.nodes)
+        if end - start <= self.LEAF_SIZE:
+            self.nodes.append((start, end, 0, 0.0, -1, -1))
+            return node_index
+        block : np.ndarray = points[order[start:end]]
+        axis : int = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+        middle : int = (end - start) // 2
+        order[start:end] = order[start:end][np.argpartition(block[:, axis], middle)]
+        split : float = float(points[order[start + middle], axis])
+        self.nodes.append((start, end, axis, split, -1, -1))
+        left : int = self.build(points, order, start, start + middle)
+        right : int = self.build(points, order, start + middle, end)
+        self.nodes[node_index] = (start, end, axis, split, left, right)
+        return node_index
+
+    def query(self, point : Behaviour, k : int) -> list[tuple[float, int]]:
+        '''Returns the (distance, id) of the k nearest points, closest first. Ids are the indexes the points were given in.'''
+        heap : list[tuple[float, int]] = []
+        if self.size and k > 0: self.search(0, point, np.asarray(point, dtype=np.float64), k, heap)
+        return sorted((-negative_distance, point_id) for negative_distance, point_id in heap)
+
+    def search(self, node_index : int, point : Behaviour, point_array : np.ndarray, k : int, heap : list[tuple[float, int]]):
+        start, end, axis, split, left, right = self.nodes[node_index]
+        if left < 0:
+            distances : list[float] = np.sqrt(((self.points[start:end] - point_array) ** 2).sum(axis=1)).tolist()
+            ids : list[int] = self.ids
+            for offset, distance in enumerate(distances):
+                if len(heap) < k:
+                    heappush(heap, (-distance, ids[start + offset]))
+                elif distance < -heap[0][0]:
+                    heapreplace(heap, (-distance, ids[start + offset]))
+            return
+        difference : float = point[axis] - split
+        near, far = (left, right) if difference < 0 else (right, left)
+        self.search(near, point, point_array, k, heap)
+        if len(heap) < k or abs(difference) < -heap[0][0]:
+            self.search(far, point, point_array, k, heap)
+
+class BehaviourArchive:
+    '''Behaviours kept from past generations. Once full, the oldest behaviours are evicted first, so memory stays flat on long runs.'''
+    def __init__(self, max_size : int = 2000):
+        self.max_size : int = max_size
+        self.behaviours : deque[Behaviour] = deque(maxlen=max_size)
+        self.added_count : int = 0
+
+    def add(self, behaviour : Behaviour):
+        self.behaviours.append(behaviour)
+        self.added_count += 1
+
+    def get_evicted_count(self) -> int:
+        return self.added_count - len(self.behaviours)
+
+    def __len__(self) -> int:
+        return len(self.behaviours)
+
+class NoveltySearch:
+    '''Rewards genomes for behaving differently from the rest of the population and from the archive.
+    Novelty is the mean distance to the k nearest behaviours, with every behaviour dimension scaled to [0, 1] by its range over
+    the population and the archive (so a position counts as much as the number of visited cells, on any map size).
+    The hand-made fitness is kept in genome.objective_fitness, and genome.fitness becomes objective + bonus, the most novel genome
+    getting novelty_weight times the generation's objective fitness spread, so the bonus weighs the same whatever the fitness scale.
+    The bonus only steers reproduction and speciation : the best genome and the fitness threshold go by get_objective_fitness.
+    Genomes need a behaviour attribute (set by ml_core.eval_genome).'''
+    def __init__(self, k : int = 15, archive_size : int = 2000, add_per_generation : int = 5, novelty_weight : float = 0.5):
+        self.k : int = k
+        self.archive : BehaviourArchive = BehaviourArchive(archive_size)
+        self.add_per_generation : int = add_per_generation
+        self.novelty_weight : float = novelty_weight
+
+    def get_novelties(self, behaviours : list[Behaviour]) -> list[float]:
+        archived : list[Behaviour] = list(self.archive.behaviours)
+        points : np.ndarray = np.array(archived + behaviours, dtype=np.float64).reshape(len(archived) + len(behaviours), -1)
+        if len(points):
+            low : np.ndarray = points.min(axis=0)
+            spread : np.ndarray = points.max(axis=0) - low
+            #a dimension every behaviour shares adds nothing either way
+            points = (points - low) / np.where(spread > 0, spread, 1.0)
+        tree : KDTree = KDTree(points)
+        scaled : list[Behaviour] = [tuple(point) for point in points[len(archived):].tolist()]
+        novelties : list[float] = []
+        for index, behaviour in enumerate(scaled):
+            own_id : int = len(archived) + index
+            #one extra neighbour since the genome finds itself
+            neighbours : list[float] = [distance for distance, point_id in tree.query(behaviour, self.k + 1) if point_id != own_id][:self.k]
+            novelties.append(sum(neighbours) / len(neighbours) if neighbours else 0.0)
+        return novelties
+
+    def score_generation(self, population : dict[int, neat.DefaultGenome], reporters : neat.reporting.ReporterSet|None = None):
+        genomes : list[neat.DefaultGenome] = list(itervalues(population))
+        behaviours : list[Behaviour] = [genome.behaviour for genome in genomes]
+        novelties : list[float] = self.get_novelties(behaviours)
+        objectives : list[float] = [genome.fitness for genome in genomes]
+        max_novelty : float = max(novelties, default=0.0)
+        objective_spread : float = max(objectives) - min(objectives) if objectives else 0.0
+        #the spread is 0 when every genome scored the same, novelty alone then tells them apart
+        bonus_scale : float = self.novelty_weight * (objective_spread if objective_spread > 0 else 1.0) / max_novelty if max_novelty > 0 else 0.0
+        for genome, novelty in zip(genomes, novelties):
+            genome.objective_fitness = genome.fitness
+            genome.novelty = novelty
+            genome.fitness = genome.fitness + bonus_scale * novelty
+        most_novel : list[int] = sorted(range(len(genomes)), key=lambda index: novelties[index], reverse=True)
+        for index in most_novel[:self.add_per_generation]:
+            self.archive.add(behaviours[index])
+        if reporters is not None and novelties:
+            reporters.info(f'Mean novelty {sum(novelties) / len(novelties):0.3f}, max {max_novelty:0.3f}, '
+                           f'archive size {len(self.archive)} ({self.archive.get_evicted_count()} evicted)')
@@ -0,0 +1,82 @@
+import sys
+sys.path.append(".")
+import os
+from collections import deque
+from time import perf_counter
+from typing import TypedDict
+import neat
+from neat.reporting import BaseReporter
+
+class GenerationProfile(TypedDict):
+    generation : int
+    wall_time : float
+    times : dict[str, float]
+    counts : dict[str, int]
+
+HISTORY_LENGTH : int = 100
+
+class GenerationProfiler:
+    '''Time and call count per phase, added up over a generation.
+    Instrumented code calls start_lap when it begins, then lap(phase) at the end of every phase:
+    the time since the previous lap goes to that phase, so phases never overlap and add up to the time spent in instrumented code.
+    Only the last history_length generations are kept, so long runs stay flat in memory (the run log has all of them).'''
+    def __init__(self, history_length : int = HISTORY_LENGTH):
+        self.times : dict[str, float] = {}
+        self.counts : dict[str, int] = {}
+        self.history : deque[GenerationProfile] = deque(maxlen=history_length)
+        self.generation : int = 0
+        self.generation_start : float = perf_counter()
+        self.last_lap : float = self.generation_start
+
+    def start_lap(self):
+        self.last_lap = perf_counter()
+
+    def lap(self, phase : str):
+        now : float = perf_counter()
+        times : dict[str, float] = self.times
+        if phase in times:
+            times[phase] += now - self.last_lap
+            self.counts[phase] += 1
+        else:
+            times[phase] = now - self.last_lap
+            self.counts[phase] = 1
+        self.last_lap = now
+
+    def start_generation(self, generation : int):
+        self.generation = generation
+        self.times = {}
+        self.counts = {}
+        self.generation_start = perf_counter()
+        self.last_lap = self.generation_start
+
+    def end_generation(self) -> GenerationProfile:
+        profile : GenerationProfile = {'generation' : self.generation, 'wall_time' : perf_counter() - self.generation_start,
+                                       'times' : self.times, 'counts' : self.counts}
+        self.history.append(profile)
+        return profile
+
+    def get_last_profile(self) -> GenerationProfile|None:
+        return self.history[-1] if self.history else None
+
+def format_profile(profile : GenerationProfile) -> str:
+    wall_time : float = profile['wall_time']
+    lines : list[str] = [f'Generation {profile["generation"]} profile ({wall_time:0.3f}s):',
+                         f'  {"phase":<20}{"time (s)":>10}{"share":>8}{"calls":>10}']
+    for phase, elapsed in sorted(profile['times'].items(), key=lambda item: item[1], reverse=True):
+        share : float = elapsed / wall_time if wall_time else 0.0
+        lines.append(f'  {phase:<20}{elapsed:>10.3f}{share:>8.1%}{profile["counts"][phase]:>10}')
+    other : float = wall_time - sum(profile['times'].values())
+    lines.append(f'  {"(not instrumented)":<20}{other:>10.3f}{(other / wall_time if wall_time else 0.0):>8.1%}{"":>10}')
+    return '\n'.join(lines)
+
+class ProfilingReporter(BaseReporter):
+    '''Prints the phase breakdown of every generation, next to FixedStdOutReporter's output.
+    Off unless enabled (GENERATION_PROFILE=1 in the environment).'''
+    def __init__(self, profiler : GenerationProfiler, enabled : bool|None = None):
+        self.profiler : GenerationProfiler = profiler
+        self.enabled : bool = os.environ.get('GENERATION_PROFILE', '') == '1' if enabled is None else enabled
+
+    def end_generation(self, config : neat.Config, population, species_set):
+        if not self.enabled: return
+        profile : GenerationProfile|None = self.profiler.get_last_profile()
+        if profile is not None: print(format_profile(profile))
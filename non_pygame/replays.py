@@ -0,0 +1,126 @@
+'''Compact replays: the map, the actions the genome played and optionally a minimal encoding of its network, stored as versioned JSON.
+They are a few hundred bytes without the genome, play back without neat or a network, and load across library versions unlike pickled GenomeReplays.
+Run from the repository root to convert pickled replays: python non_pygame/replays.py old_replay [old_replay ...]
+(each one is written next to the original, with a .json extension).'''
+import sys
+sys.path.append(".")
+import json
+import os
+from typing import Iterator, NotRequired, TypedDict
+import neat
+from neat.reporting import BaseReporter
+from six import itervalues
+import non_pygame.block_dude_core as bd_core
+import non_pygame.ml_core as ml_core
+from non_pygame.turn_budget import DEFAULT_MAX_TURNS
+from non_pygame.genome_encoding import GenomeEncoding, encode_genome, decode_network
+
+REPLAY_FORMAT : str = 'block_dude_replay'
+REPLAY_VERSION : int = 1
+
+class CompactReplay(TypedDict):
+    format : str
+    version : int
+    map : bd_core.SavedMap
+    actions : str
+    won : bool
+    fitness : float|None
+    genome_key : int|None
+    encoder : str
+    genome : NotRequired[GenomeEncoding]
+
+def make_replay(genome : neat.DefaultGenome, config : neat.Config, used_map : bd_core.SavedMap, include_genome : bool = True) -> CompactReplay:
+    '''Uses the actions recorded while the genome was evaluated (genome.actions_played, set by ml_core.eval_genome),
+    so the network is not run again. Only the moves are replayed, to know if the map was won.'''
+    actions : list[int] = genome.actions_played
+    replay : CompactReplay = {
+        'format' : REPLAY_FORMAT,
+        'version' : REPLAY_VERSION,
+        'map' : used_map,
+        'actions' : ''.join(str(action) for action in actions),
+        'won' : play_actions(used_map, actions).game_won(),
+        'fitness' : ml_core.get_objective_fitness(genome),
+        'genome_key' : genome.key,
+        'encoder' : getattr(config, 'encoder_name', ml_core.DEFAULT_ENCODER),
+    }
+    if include_genome: replay['genome'] = encode_genome(genome, config)
+    return replay
+
+def get_actions(replay : CompactReplay) -> list[int]:
+    return [int(action) for action in replay['actions']]
+
+def iter_replay_states(replay : CompactReplay) -> Iterator[bd_core.Game]:
+    '''Yields the game after every action (the same Game object, moved forward each time).'''
+    game : bd_core.Game = bd_core.Game.from_saved_map(replay['map'], copy_map=True)
+    verifications, actions = game.get_binds()
+    for action in get_actions(replay):
+        if verifications[action](): actions[action]()
+        yield game
+
+def play_actions(used_map : bd_core.SavedMap, action_list : list[int]) -> bd_core.Game:
+    game : bd_core.Game = bd_core.Game.from_saved_map(used_map, copy_map=True)
+    verifications, actions = game.get_binds()
+    for action in action_list:
+        if verifications[action](): actions[action]()
+    return game
+
+def save_compact_replay(file_path : str, replay : CompactReplay):
+    with open(file_path, 'w') as file:
+        json.dump(replay, file, separators=(',', ':'))
+
+def load_compact_replay(file_path : str) -> CompactReplay|None:
+    try:
+        with open(file_path, 'r') as file:
+            replay : CompactReplay = json.load(file)
+    except FileNotFoundError:
+        return None
+    if replay.get('format', None) != REPLAY_FORMAT: raise ValueError(f'{file_path} is not a block dude replay')
+    if replay['version'] > REPLAY_VERSION:
+        raise ValueError(f'{file_path} is a version {replay["version"]} replay, this version only reads up to {REPLAY_VERSION}')
+    return replay
+
+def convert_replay(genome_replay : ml_core.GenomeReplay) -> CompactReplay:
+    '''Replays a pickled GenomeReplay's genome once to record its actions.
+    Pickles without max_turns were trained with the fixed 100 turns, so they are replayed with those rather than the map's budget.'''
+    genome : neat.DefaultGenome = genome_replay['genome']
+    config : neat.Config = genome_replay['config']
+    used_map : bd_core.SavedMap = genome_replay['map_used']
+    max_turns : int = genome_replay.get('max_turns', None) or DEFAULT_MAX_TURNS
+    ml_core.eval_genome((genome.key, genome), config, used_map, net=genome_replay.get('net_used', None), max_turns=max_turns)
+    return make_replay(genome, config, used_map)
+
+def load_any_replay(file_path : str) -> CompactReplay|None:
+    '''Loads file_path.json if it exists, else converts the pickled replay at file_path.'''
+    replay : CompactReplay|None = load_compact_replay(f'{file_path}.json')
+    if replay is not None: return replay
+    if not os.path.exists(file_path): return None
+    genome_replay : ml_core.GenomeReplay|None = ml_core.load_replay(file_path)
+    return None if genome_replay is None else convert_replay(genome_replay)
+
+class ReplayReporter(BaseReporter):
+    '''Saves every generation's best genome as a compact replay in directory (gen_<generation>.json).'''
+    def __init__(self, directory : str, used_map : bd_core.SavedMap, include_genome : bool = False):
+        self.directory : str = directory
+        self.used_map : bd_core.SavedMap = used_map
+        self.include_genome : bool = include_genome
+        self.generation : int = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def start_generation(self, generation : int):
+        self.generation = generation
+
+    def post_evaluate(self, config : neat.Config, population : dict[int, neat.DefaultGenome], species : neat.DefaultSpeciesSet,
+                      best_genome : neat.DefaultGenome):
+        best : neat.DefaultGenome = max(itervalues(population), key=ml_core.get_objective_fitness)
+        save_compact_replay(os.path.join(self.directory, f'gen_{self.generation}.json'), make_replay(best, config, self.used_map, self.include_genome))
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        genome_replay : ml_core.GenomeReplay|None = ml_core.load_replay(path)
+        if genome_replay is None:
+            print(f'{path} : empty replay')
+            continue
+        compact : CompactReplay = convert_replay(genome_replay)
+        save_compact_replay(f'{path}.json', compact)
+        print(f'{path} : {len(compact["actions"])} actions, {"won" if compact["won"] else "not won"} -> {path}.json '
+              f'({os.path.getsize(path)} -> {os.path.getsize(f"{path}.json")} bytes)')
@@ -0,0 +1,275 @@
+import sys
+sys.path.append(".")
+import math
+import random
+from operator import attrgetter
+from typing import Any
+import numpy as np
+import neat
+from neat.attributes import BaseAttribute, FloatAttribute, BoolAttribute, StringAttribute
+from neat.math_util import mean
+from six import iteritems, itervalues
+
+class GeneColumns:
+    '''One kind of gene (nodes or connections) of a whole generation, with every attribute stored in one contiguous array.
+    Genes of the genome at positions[key] = i are at [starts[i], starts[i + 1]).'''
+    def __init__(self, genomes : list[neat.DefaultGenome], gene_dict_name : str):
+        self.positions : dict[int, int] = {genome.key : index for index, genome in enumerate(genomes)}
+        gene_dicts : list[dict] = [getattr(genome, gene_dict_name) for genome in genomes]
+        self.genes : list = [gene for gene_dict in gene_dicts for gene in itervalues(gene_dict)]
+        self.starts : np.ndarray = np.zeros(len(genomes) + 1, dtype=np.int64)
+        np.cumsum([len(gene_dict) for gene_dict in gene_dicts], out=self.starts[1:])
+        self.attributes : list[BaseAttribute] = list(type(self.genes[0])._gene_attributes) if self.genes else []
+        self.values : dict[str, np.ndarray] = {attribute.name : self.gather(attribute) for attribute in self.attributes}
+
+    def gather(self, attribute : BaseAttribute) -> np.ndarray:
+        values = map(attrgetter(attribute.name), self.genes)
+        if isinstance(attribute, FloatAttribute): return np.fromiter(values, dtype=np.float64, count=len(self.genes))
+        if isinstance(attribute, BoolAttribute): return np.fromiter(values, dtype=np.bool_, count=len(self.genes))
+        return np.array(list(values), dtype=object)
+
+    def scatter(self, name : str, changed : np.ndarray):
+        '''Writes the changed values back into the gene objects.'''
+        values : list[Any] = self.values[name].tolist()
+        genes : list = self.genes
+        for index in np.flatnonzero(changed).tolist():
+            setattr(genes[index], name, values[index])
+
+    def get_genome_values(self, genome_key : int, name : str) -> np.ndarray:
+        index : int = self.positions[genome_key]
+        return self.values[name][self.starts[index]:self.starts[index + 1]]
+
+def get_float_init_values(attribute : FloatAttribute, genome_config, rng : np.random.Generator, count : int) -> np.ndarray:
+    '''Bulk version of FloatAttribute.init_value.'''
+    init_mean : float = getattr(genome_config, attribute.init_mean_name)
+    init_stdev : float = getattr(genome_config, attribute.init_stdev_name)
+    min_value : float = getattr(genome_config, attribute.min_value_name)
+    max_value : float = getattr(genome_config, attribute.max_value_name)
+    init_type : str = getattr(genome_config, attribute.init_type_name).lower()
+    if ('gauss' in init_type) or ('normal' in init_type):
+        return np.clip(rng.normal(init_mean, init_stdev, count), min_value, max_value)
+    if 'uniform' in init_type:
+        return rng.uniform(max(min_value, init_mean - 2 * init_stdev), min(max_value, init_mean + 2 * init_stdev), count)
+    raise RuntimeError(f'Unknown init_type {init_type!r} for {attribute.init_type_name}')
+
+def mutate_float_values(values : np.ndarray, attribute : FloatAttribute, genome_config, rng : np.random.Generator) -> np.ndarray:
+    '''Bulk version of FloatAttribute.mutate_value. Mutates values in place and returns the mask of changed values.'''
+    mutate_rate : float = getattr(genome_config, attribute.mutate_rate_name)
+    replace_rate : float = getattr(genome_config, attribute.replace_rate_name)
+    roll : np.ndarray = rng.random(len(values))
+    mutated : np.ndarray = roll < mutate_rate
+    replaced : np.ndarray = ~mutated & (roll < mutate_rate + replace_rate)
+    mutate_count : int = int(mutated.sum())
+    if mutate_count:
+        mutate_power : float = getattr(genome_config, attribute.mutate_power_name)
+        values[mutated] = np.clip(values[mutated] + rng.normal(0.0, mutate_power, mutate_count),
+                                  getattr(genome_config, attribute.min_value_name), getattr(genome_config, attribute.max_value_name))
+    replace_count : int = int(replaced.sum())
+    if replace_count:
+        values[replaced] = get_float_init_values(attribute, genome_config, rng, replace_count)
+    return mutated | replaced
+
+def mutate_bool_values(values : np.ndarray, attribute : BoolAttribute, genome_config, rng : np.random.Generator) -> np.ndarray:
+    '''Bulk version of BoolAttribute.mutate_value. Mutates values in place and returns the mask of changed values.'''
+    mutate_rate : float = getattr(genome_config, attribute.mutate_rate_name)
+    rates : np.ndarray = np.where(values, mutate_rate + getattr(genome_config, attribute.rate_to_false_add_name),
+                                  mutate_rate + getattr(genome_config, attribute.rate_to_true_add_name))
+    changed : np.ndarray = (rates > 0) & (rng.random(len(values)) < rates)
+    values[changed] = rng.random(int(changed.sum())) < 0.5
+    return changed
+
+def mutate_string_values(values : np.ndarray, attribute : StringAttribute, genome_config, rng : np.random.Generator) -> np.ndarray:
+    '''Bulk version of StringAttribute.mutate_value. Mutates values in place and returns the mask of changed values.'''
+    mutate_rate : float = getattr(genome_config, attribute.mutate_rate_name)
+    if mutate_rate <= 0: return np.zeros(len(values), dtype=np.bool_)
+    changed : np.ndarray = rng.random(len(values)) < mutate_rate
+    options : list[str] = getattr(genome_config, attribute.options_name)
+    values[changed] = np.array(options, dtype=object)[rng.integers(0, len(options), int(changed.sum()))]
+    return changed
+
+def mutate_columns(columns : GeneColumns, genome_config, rng : np.random.Generator):
+    for attribute in columns.attributes:
+        values : np.ndarray = columns.values[attribute.name]
+        if isinstance(attribute, FloatAttribute):
+            changed : np.ndarray = mutate_float_values(values, attribute, genome_config, rng)
+        elif isinstance(attribute, BoolAttribute):
+            changed = mutate_bool_values(values, attribute, genome_config, rng)
+        elif isinstance(attribute, StringAttribute):
+            changed = mutate_string_values(values, attribute, genome_config, rng)
+        else:
+            raise TypeError(f'Cannot mutate attribute {attribute.name} of type {type(attribute).__name__} in bulk')
+        columns.scatter(attribute.name, changed)
+
+def mutate_structure(genome : neat.DefaultGenome, genome_config):
+    '''The structural half of DefaultGenome.mutate, using the genome's own mutate_* methods.'''
+    if genome_config.single_structural_mutation:
+        div = max(1, (genome_config.node_add_prob + genome_config.node_delete_prob +
+                      genome_config.conn_add_prob + genome_config.conn_delete_prob))
+        r = random.random()
+        if r < (genome_config.node_add_prob / div):
+            genome.mutate_add_node(genome_config)
+        elif r < ((genome_config.node_add_prob + genome_config.node_delete_prob) / div):
+            genome.mutate_delete_node(genome_config)
+        elif r < ((genome_config.node_add_prob + genome_config.node_delete_prob + genome_config.conn_add_prob) / div):
+            genome.mutate_add_connection(genome_config)
+        elif r < ((genome_config.node_add_prob + genome_config.node_delete_prob +
+                   genome_config.conn_add_prob + genome_config.conn_delete_prob) / div):
+            genome.mutate_delete_connection()
+    else:
+        if random.random() < genome_config.node_add_prob:
+            genome.mutate_add_node(genome_config)
+        if random.random() < genome_config.node_delete_prob:
+            genome.mutate_delete_node(genome_config)
+        if random.random() < genome_config.conn_add_prob:
+            genome.mutate_add_connection(genome_config)
+        if random.random() < genome_config.conn_delete_prob:
+            genome.mutate_delete_connection()
+
+class CrossoverPairs:
+    '''Homologous genes of the children being made, each with the gene of the other parent its attributes can come from.'''
+    def __init__(self):
+        self.child_genes : list = []
+        self.other_genes : list = []
+
+    def inherit(self, child_genes : dict, genes1 : dict, genes2 : dict):
+        '''Every gene of the fittest parent is cloned, homologous ones get their attributes picked later by apply.'''
+        same_parent : bool = genes1 is genes2
+        new_object = object.__new__
+        for key, gene1 in iteritems(genes1):
+            #same result as gene1.copy(), without going through the attributes one by one
+            gene = new_object(type(gene1))
+            gene.__dict__ = gene1.__dict__.copy()
+            child_genes[key] = gene
+            if same_parent: continue
+            gene2 = genes2.get(key)
+            if gene2 is not None:
+                self.child_genes.append(gene)
+                self.other_genes.append(gene2)
+
+    def apply(self, rng : np.random.Generator):
+        '''Bulk version of BaseGene.crossover : every attribute comes from either parent with the same odds.'''
+        if not self.child_genes: return
+        child_genes : list = self.child_genes
+        other_genes : list = self.other_genes
+        for attribute in type(child_genes[0])._gene_attributes:
+            name : str = attribute.name
+            for index in np.flatnonzero(rng.random(len(child_genes)) < 0.5).tolist():
+                setattr(child_genes[index], name, getattr(other_genes[index], name))
+
+class ArrayReproduction(neat.DefaultReproduction):
+    '''Drop-in replacement for neat.DefaultReproduction for large populations.
+    Crossover picks the attributes of homologous genes for the whole generation at once,
+    structural mutations are still made one child at a time through the DefaultGenome interface,
+    then the attribute mutations (weights, biases, enabled...) of the whole generation are applied at once on contiguous arrays.
+    The arrays of the last generation stay available in node_columns and connection_columns.
+    Children come out with the same odds as with DefaultReproduction, but not from the same random draws.'''
+    def __init__(self, config, reporters, stagnation):
+        super().__init__(config, reporters, stagnation)
+        self.node_columns : GeneColumns|None = None
+        self.connection_columns : GeneColumns|None = None
+
+    @staticmethod
+    def configure_crossover(child : neat.DefaultGenome, genome1 : neat.DefaultGenome, genome2 : neat.DefaultGenome, genome_config,
+                            node_pairs : CrossoverPairs, connection_pairs : CrossoverPairs):
+        '''Same as DefaultGenome.configure_crossover, except that homologous genes are left to the pairs.'''
+        if type(child).configure_crossover is not neat.DefaultGenome.configure_crossover:
+            child.configure_crossover(genome1, genome2, genome_config)
+            return
+        assert isinstance(genome1.fitness, (int, float))
+        assert isinstance(genome2.fitness, (int, float))
+        if genome1.fitness > genome2.fitness:
+            parent1, parent2 = genome1, genome2
+        else:
+            parent1, parent2 = genome2, genome1
+        connection_pairs.inherit(child.connections, parent1.connections, parent2.connections)
+        node_pairs.inherit(child.nodes, parent1.nodes, parent2.nodes)
+
+    def make_children(self, parents : list[tuple[neat.DefaultGenome, neat.DefaultGenome, neat.DefaultGenome]], genome_config):
+        #seeded from random so that random.seed still makes runs reproducible
+        rng : np.random.Generator = np.random.default_rng(random.getrandbits(64))
+        node_pairs : CrossoverPairs = CrossoverPairs()
+        connection_pairs : CrossoverPairs = CrossoverPairs()
+        for child, parent1, parent2 in parents:
+            self.configure_crossover(child, parent1, parent2, genome_config, node_pairs, connection_pairs)
+        connection_pairs.apply(rng)
+        node_pairs.apply(rng)
+
+        children : list[neat.DefaultGenome] = [child for child, _, _ in parents]
+        for child in children:
+            mutate_structure(child, genome_config)
+        self.connection_columns = GeneColumns(children, 'connections')
+        self.node_columns = GeneColumns(children, 'nodes')
+        mutate_columns(self.connection_columns, genome_config, rng)
+        mutate_columns(self.node_columns, genome_config, rng)
+
+    def reproduce(self, config, species, pop_size, generation):
+        #this follows DefaultReproduction.reproduce step by step, except that children are all made at the end
+        all_fitnesses = []
+        remaining_species = []
+        for stag_sid, stag_s, stagnant in self.stagnation.update(species, generation):
+            if stagnant:
+                self.reporters.species_stagnant(stag_sid, stag_s)
+            else:
+                all_fitnesses.extend(m.fitness for m in itervalues(stag_s.members))
+                remaining_species.append(stag_s)
+
+        if not remaining_species:
+            species.species = {}
+            return {}
+
+        min_fitness = min(all_fitnesses)
+        max_fitness = max(all_fitnesses)
+        fitness_range = max(1.0, max_fitness - min_fitness)
+        for afs in remaining_species:
+            msf = mean([m.fitness for m in itervalues(afs.members)])
+            af = (msf - min_fitness) / fitness_range
+            afs.adjusted_fitness = af
+
+        adjusted_fitnesses = [s.adjusted_fitness for s in remaining_species]
+        avg_adjusted_fitness = mean(adjusted_fitnesses)
+        self.reporters.info("Average adjusted fitness: {:.3f}".format(avg_adjusted_fitness))
+
+        previous_sizes = [len(s.members) for s in remaining_species]
+        min_species_size = max(self.reproduction_config.min_species_size, self.reproduction_config.elitism)
+        spawn_amounts = self.compute_spawn(adjusted_fitnesses, previous_sizes, pop_size, min_species_size)
+
+        new_population = {}
+        parents : list[tuple[neat.DefaultGenome, neat.DefaultGenome, neat.DefaultGenome]] = []
+        species.species = {}
+        for spawn, s in zip(spawn_amounts, remaining_species):
+            spawn = max(spawn, self.reproduction_config.elitism)
+
+            assert spawn > 0
+
+            old_members = list(iteritems(s.members))
+            s.members = {}
+            species.species[s.key] = s
+
+            old_members.sort(reverse=True, key=lambda x: x[1].fitness)
+
+            if self.reproduction_config.elitism > 0:
+                for i, m in old_members[:self.reproduction_config.elitism]:
+                    new_population[i] = m
+                    spawn -= 1
+
+            if spawn <= 0:
+                continue
+
+            repro_cutoff = int(math.ceil(self.reproduction_config.survival_threshold * len(old_members)))
+            repro_cutoff = max(repro_cutoff, 2)
+            old_members = old_members[:repro_cutoff]
+
+            while spawn > 0:
+                spawn -= 1
+
+                parent1_id, parent1 = random.choice(old_members)
+                parent2_id, parent2 = random.choice(old_members)
+
+                gid = next(self.genome_indexer)
+                child = config.genome_type(gid)
+                new_population[gid] = child
+                parents.append((child, parent1, parent2))
+                self.ancestors[gid] = (parent1_id, parent2_id)
+
+        self.make_children(parents, config.genome_config)
+        return new_population
@@ -0,0 +1,184 @@
+'''Streaming run logs: one NDJSON record per generation, appended as the run goes so memory stays flat on long runs.
+The log rotates like logging's RotatingFileHandler (run.ndjson, run.ndjson.1, ...), and can be read back lazily
+with iter_run_log or memory-mapped with RunLog for plotting.'''
+import sys
+sys.path.append(".")
+import json
+import mmap
+import os
+from time import perf_counter, strftime
+from typing import Any, Iterator, TypedDict
+import neat
+from neat.reporting import BaseReporter
+from six import itervalues
+from non_pygame.profiling import GenerationProfiler
+from non_pygame.novelty import get_objective_fitness
+
+RUN_LOG_PATH : str = 'non_pygame/logs/run.ndjson'
+
+class FitnessStats(TypedDict):
+    max : float
+    mean : float
+    stdev : float
+    min : float
+
+class RunLogRecord(TypedDict):
+    run : str
+    generation : int
+    fitness : FitnessStats
+    best_genome_key : int
+    best_fitness : float
+    species : dict[str, int]
+    generation_time : float
+    phase_times : dict[str, float]
+    turn_budget : int
+    solved : bool
+
+class RunLogReporter(BaseReporter):
+    '''Replaces neat.StatisticsReporter, which keeps every generation's best genome and species fitnesses in memory.
+    A generation's record is written at end_generation (or found_solution, since the run stops before end_generation then).
+    Phase times come from the profiler when there is one, the turn budget from the population interface (0 without one).
+    The interface is read when a record is written, since restoring a checkpoint replaces its turn_budget_history.'''
+    def __init__(self, file_path : str = RUN_LOG_PATH, max_bytes : int = 16 * 1024 * 1024, backup_count : int = 5,
+                 profiler : GenerationProfiler|None = None, population_interface : 'PopulationInterface|None' = None):
+        self.file_path : str = file_path
+        self.max_bytes : int = max_bytes
+        self.backup_count : int = backup_count
+        self.profiler : GenerationProfiler|None = profiler
+        self.population_interface : 'PopulationInterface|None' = population_interface
+        self.run_name : str = strftime('%Y-%m-%dT%H:%M:%S')
+        self.generation : int = 0
+        self.generation_start : float = perf_counter()
+        self.pending : RunLogRecord|None = None
+        directory : str = os.path.dirname(file_path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        self.file = open(file_path, 'a', encoding='utf-8')
+
+    def start_generation(self, generation : int):
+        self.generation = generation
+        self.generation_start = perf_counter()
+
+    def post_evaluate(self, config : neat.Config, population : dict[int, neat.DefaultGenome], species : neat.DefaultSpeciesSet,
+                      best_genome : neat.DefaultGenome):
+        fitnesses : list[float] = [genome.fitness for genome in itervalues(population)]
+        self.pending = {
+            'run' : self.run_name,
+            'generation' : self.generation,
+            'fitness' : {'max' : max(fitnesses), 'mean' : neat.math_util.mean(fitnesses),
+                         'stdev' : neat.math_util.stdev(fitnesses), 'min' : min(fitnesses)},
+            'best_genome_key' : best_genome.key,
+            'best_fitness' : get_objective_fitness(best_genome),
+            'species' : {str(species_id) : len(s.members) for species_id, s in species.species.items()},
+            'generation_time' : 0.0,
+            'phase_times' : {},
+            'turn_budget' : self.get_turn_budget(),
+            'solved' : False,
+        }
+
+    def get_turn_budget(self) -> int:
+        if self.population_interface is None or not self.population_interface.turn_budget_history: return 0
+        return self.population_interface.turn_budget_history[-1]
+
+    def end_generation(self, config : neat.Config, population : dict[int, neat.DefaultGenome], species_set : neat.DefaultSpeciesSet):
+        self.write_pending()
+
+    def found_solution(self, config : neat.Config, generation : int, best : neat.DefaultGenome):
+        if self.pending is not None: self.pending['solved'] = True
+        self.write_pending()
+
+    def write_pending(self):
+        record : RunLogRecord|None = self.pending
+        if record is None: return
+        self.pending = None
+        record['generation_time'] = perf_counter() - self.generation_start
+        if self.profiler is not None:
+            profile = self.profiler.get_last_profile()
+            if profile is not None and profile['generation'] == record['generation']: record['phase_times'] = profile['times']
+        self.write_line(json.dumps(record, separators=(',', ':')))
+
+    def write_line(self, line : str):
+        if self.max_bytes > 0 and self.file.tell() + len(line) + 1 > self.max_bytes and self.file.tell() > 0: self.rotate()
+        self.file.write(line + '\n')
+        self.file.flush()
+
+    def rotate(self):
+        self.file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source : str = f'{self.file_path}.{index}'
+            if os.path.exists(source): os.replace(source, f'{self.file_path}.{index + 1}')
+        if self.backup_count > 0: os.replace(self.file_path, f'{self.file_path}.1')
+        else: os.remove(self.file_path)
+        self.file = open(self.file_path, 'a', encoding='utf-8')
+
+    def close(self):
+        self.write_pending()
+        self.file.close()
+
+def get_log_files(file_path : str = RUN_LOG_PATH) -> list[str]:
+    '''The current log and its backups, oldest first.'''
+    backups : list[tuple[int, str]] = []
+    directory : str = os.path.dirname(file_path) or '.'
+    prefix : str = os.path.basename(file_path) + '.'
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name[len(prefix):].isdigit(): backups.append((int(name[len(prefix):]), os.path.join(directory, name)))
+    files : list[str] = [path for _, path in sorted(backups, reverse=True)]
+    if os.path.exists(file_path): files.append(file_path)
+    return files
+
+def iter_run_log(file_path : str = RUN_LOG_PATH, include_backups : bool = True, run : str|None = None) -> Iterator[RunLogRecord]:
+    '''Yields the records one line at a time, oldest first. A half written last line (the run was killed mid write) is skipped.'''
+    for path in (get_log_files(file_path) if include_backups else [file_path]):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if not line.endswith('\n'): break
+                record : RunLogRecord = json.loads(line)
+                if run is None or record['run'] == run: yield record
+
+def get_field(record : RunLogRecord, field : str) -> Any:
+    value : Any = record
+    for part in field.split('.'):
+        value = value[part]
+    return value
+
+class RunLog:
+    '''Memory-mapped view of one log file. Only line offsets are kept, records are parsed when they are accessed,
+    so plotting a column of a long run never holds the whole log in memory.'''
+    def __init__(self, file_path : str = RUN_LOG_PATH):
+        self.file = open(file_path, 'rb')
+        self.size : int = os.fstat(self.file.fileno()).st_size
+        self.data : mmap.mmap|None = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.offsets : list[int] = []
+        if self.data is None: return
+        start : int = 0
+        end : int = self.data.find(b'\n', start)
+        while end != -1:
+            self.offsets.append(start)
+            start = end + 1
+            end = self.data.find(b'\n', start)
+        self.offsets.append(start)
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def __getitem__(self, index : int) -> RunLogRecord:
+        if index < 0: index += len(self)
+        if not 0 <= index < len(self): raise IndexError(index)
+        return json.loads(self.data[self.offsets[index]:self.offsets[index + 1]])
+
+    def __iter__(self) -> Iterator[RunLogRecord]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def column(self, field : str, run : str|None = None) -> list[Any]:
+        '''Values of a dotted field (e.g 'fitness.max') for every record, or only the records of one run.'''
+        return [get_field(record, field) for record in self if run is None or record['run'] == run]
+
+    def close(self):
+        if self.data is not None: self.data.close()
+        self.file.close()
+
+    def __enter__(self) -> 'RunLog':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,77 @@
+'''Breadth-first solver for block dude maps. Finds the shortest list of actions that reaches the door.
+Run from the repository root: python non_pygame/solver.py [--write] map_name [map_name ...]
+--write stores the optimal solution length in the map file, so it does not have to be solved again.'''
+import sys
+sys.path.append(".")
+from collections import deque
+from copy import copy
+import non_pygame.block_dude_core as bd_core
+from non_pygame.block_dude_core import ActionType
+
+SolverKey = tuple[int, int, int, bool, tuple[tuple[int, ...], ...]]
+ACTIONS : tuple[int, ...] = tuple(action.value for action in ActionType)
+MAX_STATES : int = 500_000
+
+def get_solver_key(game : bd_core.Game) -> SolverKey:
+    return (game.player_x, game.player_y, game.player_direction, game.player_holding_block, tuple(tuple(row) for row in game.map))
+
+def copy_game(game : bd_core.Game) -> bd_core.Game:
+    new_game : bd_core.Game = copy(game)
+    new_game.map = [row[:] for row in game.map]
+    return new_game
+
+def solve(saved_map : bd_core.SavedMap, max_states : int = MAX_STATES) -> list[int]|None:
+    '''Returns the shortest solution as ActionType values, or None if there is none within max_states explored states.'''
+    start : bd_core.Game = bd_core.Game.from_saved_map(saved_map, copy_map=True)
+    if start.game_won(): return []
+    parents : dict[SolverKey, tuple[SolverKey|None, int|None]] = {get_solver_key(start) : (None, None)}
+    queue : deque[tuple[bd_core.Game, SolverKey]] = deque([(start, get_solver_key(start))])
+    while queue:
+        game, key = queue.popleft()
+        for action in ACTIONS:
+            new_game : bd_core.Game = copy_game(game)
+            verifications, actions = new_game.get_binds()
+            try:
+                if not verifications[action](): continue
+                actions[action]()
+            except (IndexError, bd_core.InvalidMapError):
+                #walking off the map is not a move the game can make either
+                continue
+            new_key : SolverKey = get_solver_key(new_game)
+            if new_key in parents: continue
+            parents[new_key] = (key, action)
+            if new_game.game_won():
+                solution : list[int] = []
+                current : SolverKey|None = new_key
+                while current is not None:
+                    current, step = parents[current]
+                    if step is not None: solution.append(step)
+                solution.reverse()
+                return solution
+            if len(parents) >= max_states: return None
+            queue.append((new_game, new_key))
+    return None
+
+_optimal_lengths : dict[tuple[int, int, int, tuple[tuple[int, ...], ...]], int|None] = {}
+def get_optimal_length(saved_map : bd_core.SavedMap) -> int|None:
+    '''Uses the length saved in the map file when there is one, otherwise solves the map (once per map layout).'''
+    if 'optimal_length' in saved_map: return saved_map['optimal_length']
+    key = (saved_map['start_x'], saved_map['start_y'], saved_map['start_direction'], tuple(tuple(row) for row in saved_map['map']))
+    if key not in _optimal_lengths:
+        solution : list[int]|None = solve(saved_map)
+        _optimal_lengths[key] = None if solution is None else len(solution)
+    return _optimal_lengths[key]
+
+if __name__ == '__main__':
+    write : bool = '--write' in sys.argv[1:]
+    for map_name in [arg for arg in sys.argv[1:] if arg != '--write']:
+        the_map : bd_core.SavedMap = bd_core.load_map(map_name)
+        the_map.pop('optimal_length', None)
+        solution : list[int]|None = solve(the_map)
+        if solution is None:
+            print(f'{map_name} : no solution found')
+            continue
+        print(f'{map_name} : {len(solution)} turns ({" ".join(ActionType(action).name for action in solution)})')
+        if write:
+            the_map['optimal_length'] = len(solution)
+            bd_core.save_map(f'non_pygame/maps/{map_name}.json', the_map)
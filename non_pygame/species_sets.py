@@ -0,0 +1,243 @@
+import sys
+sys.path.append(".")
+from time import perf_counter
+from operator import attrgetter
+import numpy as np
+import neat
+from neat.math_util import mean, stdev
+from neat.species import Species
+from six import iteritems, iterkeys, itervalues
+
+class TimedSpeciesSet(neat.DefaultSpeciesSet):
+    '''The default species set, but it keeps how long every speciation took.'''
+    def __init__(self, config, reporters):
+        super().__init__(config, reporters)
+        self.speciate_times : list[float] = []
+
+    def speciate(self, config : neat.Config, population : dict[int, neat.DefaultGenome], generation : int):
+        start : float = perf_counter()
+        self.speciate_untimed(config, population, generation)
+        elapsed : float = perf_counter() - start
+        self.speciate_times.append(elapsed)
+        self.reporters.info(f'Speciation took {elapsed:0.4f}s')
+
+    def speciate_untimed(self, config : neat.Config, population : dict[int, neat.DefaultGenome], generation : int):
+        super().speciate(config, population, generation)
+
+    def get_last_speciate_time(self) -> float|None:
+        return self.speciate_times[-1] if self.speciate_times else None
+
+def get_columns(keys : list, columns : dict) -> np.ndarray:
+    found : list[int|None] = list(map(columns.get, keys))
+    if None in found:
+        found = [columns.setdefault(key, len(columns)) if column is None else column for key, column in zip(keys, found)]
+    return np.array(found, dtype=np.int64)
+
+class GeneArrays:
+    '''A genome's genes as arrays. Gene keys are replaced by column indexes shared by the whole species set.'''
+    def __init__(self, genome : neat.DefaultGenome, node_columns : dict[int, int], connection_columns : dict[tuple[int, int], int],
+                 function_ids : dict[str, int]):
+        self.genome : neat.DefaultGenome = genome
+        nodes = list(itervalues(genome.nodes))
+        self.node_columns : np.ndarray = get_columns(list(iterkeys(genome.nodes)), node_columns)
+        self.biases : np.ndarray = np.fromiter(map(attrgetter('bias'), nodes), dtype=np.float64, count=len(nodes))
+        self.responses : np.ndarray = np.fromiter(map(attrgetter('response'), nodes), dtype=np.float64, count=len(nodes))
+        self.activations : np.ndarray = get_columns(list(map(attrgetter('activation'), nodes)), function_ids)
+        self.aggregations : np.ndarray = get_columns(list(map(attrgetter('aggregation'), nodes)), function_ids)
+
+        connections = list(itervalues(genome.connections))
+        self.connection_columns : np.ndarray = get_columns(list(iterkeys(genome.connections)), connection_columns)
+        self.weights : np.ndarray = np.fromiter(map(attrgetter('weight'), connections), dtype=np.float64, count=len(connections))
+        self.enabled : np.ndarray = np.fromiter(map(attrgetter('enabled'), connections), dtype=np.bool_, count=len(connections))
+
+class GeneBatch:
+    '''Several genomes' gene arrays glued end to end, with the index of the genome each gene came from.'''
+    def __init__(self, arrays_list : list[GeneArrays]):
+        self.size : int = len(arrays_list)
+        self.node_counts : np.ndarray = np.array([len(arrays.node_columns) for arrays in arrays_list], dtype=np.int64)
+        self.node_owners : np.ndarray = np.repeat(np.arange(self.size), self.node_counts)
+        self.node_columns : np.ndarray = np.concatenate([arrays.node_columns for arrays in arrays_list])
+        self.biases : np.ndarray = np.concatenate([arrays.biases for arrays in arrays_list])
+        self.responses : np.ndarray = np.concatenate([arrays.responses for arrays in arrays_list])
+        self.activations : np.ndarray = np.concatenate([arrays.activations for arrays in arrays_list])
+        self.aggregations : np.ndarray = np.concatenate([arrays.aggregations for arrays in arrays_list])
+
+        self.connection_counts : np.ndarray = np.array([len(arrays.connection_columns) for arrays in arrays_list], dtype=np.int64)
+        self.connection_owners : np.ndarray = np.repeat(np.arange(self.size), self.connection_counts)
+        self.connection_columns : np.ndarray = np.concatenate([arrays.connection_columns for arrays in arrays_list])
+        self.weights : np.ndarray = np.concatenate([arrays.weights for arrays in arrays_list])
+        self.enabled : np.ndarray = np.concatenate([arrays.enabled for arrays in arrays_list])
+
+class DenseGenome:
+    '''One genome spread over every known column, so a whole batch can be compared to it with a single gather.'''
+    def __init__(self, arrays : GeneArrays, node_size : int, connection_size : int):
+        self.arrays : GeneArrays = arrays
+        self.node_size : int = node_size
+        self.connection_size : int = connection_size
+        columns : np.ndarray = arrays.node_columns
+        self.node_count : int = len(columns)
+        self.node_present : np.ndarray = np.zeros(node_size, dtype=np.bool_)
+        self.node_present[columns] = True
+        self.biases : np.ndarray = np.zeros(node_size, dtype=np.float64)
+        self.biases[columns] = arrays.biases
+        self.responses : np.ndarray = np.zeros(node_size, dtype=np.float64)
+        self.responses[columns] = arrays.responses
+        self.activations : np.ndarray = np.zeros(node_size, dtype=np.int64)
+        self.activations[columns] = arrays.activations
+        self.aggregations : np.ndarray = np.zeros(node_size, dtype=np.int64)
+        self.aggregations[columns] = arrays.aggregations
+
+        columns = arrays.connection_columns
+        self.connection_count : int = len(columns)
+        self.connection_present : np.ndarray = np.zeros(connection_size, dtype=np.bool_)
+        self.connection_present[columns] = True
+        self.weights : np.ndarray = np.zeros(connection_size, dtype=np.float64)
+        self.weights[columns] = arrays.weights
+        self.enabled : np.ndarray = np.zeros(connection_size, dtype=np.bool_)
+        self.enabled[columns] = arrays.enabled
+
+    @staticmethod
+    def combine(homologous : np.ndarray, common_counts : np.ndarray, counts : np.ndarray, other_count : int, genome_config) -> np.ndarray:
+        disjoint : np.ndarray = counts + other_count - 2 * common_counts
+        max_counts : np.ndarray = np.maximum(counts, other_count)
+        return np.where(max_counts > 0, (homologous * genome_config.compatibility_weight_coefficient
+                                         + genome_config.compatibility_disjoint_coefficient * disjoint) / np.maximum(max_counts, 1), 0.0)
+
+    def distances_to(self, batch : GeneBatch, genome_config) -> np.ndarray:
+        '''Same formula as DefaultGenome.distance, to every genome of the batch.'''
+        columns : np.ndarray = batch.node_columns
+        common : np.ndarray = self.node_present[columns]
+        gene_distances : np.ndarray = (np.abs(self.biases[columns] - batch.biases) + np.abs(self.responses[columns] - batch.responses)
+                                       + (self.activations[columns] != batch.activations)
+                                       + (self.aggregations[columns] != batch.aggregations))
+        node_distances : np.ndarray = self.combine(np.bincount(batch.node_owners, gene_distances * common, minlength=batch.size),
+                                                   np.bincount(batch.node_owners, common, minlength=batch.size),
+                                                   batch.node_counts, self.node_count, genome_config)
+
+        columns = batch.connection_columns
+        common = self.connection_present[columns]
+        gene_distances = np.abs(self.weights[columns] - batch.weights) + (self.enabled[columns] != batch.enabled)
+        connection_distances : np.ndarray = self.combine(np.bincount(batch.connection_owners, gene_distances * common, minlength=batch.size),
+                                                         np.bincount(batch.connection_owners, common, minlength=batch.size),
+                                                         batch.connection_counts, self.connection_count, genome_config)
+        return node_distances + connection_distances
+
+class CachedSpeciesSet(TimedSpeciesSet):
+    '''Drop-in replacement for neat.DefaultSpeciesSet that speciates the exact same way.
+    Every representative is compared to the whole population at once on gene arrays, instead of one genome pair at a time.
+    Gene arrays are kept between generations for genomes that are still around (elites and representatives never mutate),
+    and the distances of a representative to the population are computed once per speciation, then looked up.'''
+    def __init__(self, config, reporters):
+        super().__init__(config, reporters)
+        self.function_ids : dict[str, int] = {}
+        self.node_columns : dict[int, int] = {}
+        self.connection_columns : dict[tuple[int, int], int] = {}
+        self.gene_arrays : dict[int, GeneArrays] = {}
+        self.dense_genomes : dict[int, DenseGenome] = {}
+        self.hits : int = 0
+        self.misses : int = 0
+
+    def get_gene_arrays(self, genome : neat.DefaultGenome) -> GeneArrays:
+        arrays : GeneArrays|None = self.gene_arrays.get(genome.key, None)
+        if arrays is not None and arrays.genome is genome:
+            self.hits += 1
+            return arrays
+        self.misses += 1
+        arrays = GeneArrays(genome, self.node_columns, self.connection_columns, self.function_ids)
+        self.gene_arrays[genome.key] = arrays
+        return arrays
+
+    def get_dense_genome(self, genome : neat.DefaultGenome) -> DenseGenome:
+        arrays : GeneArrays = self.get_gene_arrays(genome)
+        dense : DenseGenome|None = self.dense_genomes.get(genome.key, None)
+        if (dense is None or dense.arrays is not arrays or dense.node_size != len(self.node_columns)
+            or dense.connection_size != len(self.connection_columns)):
+            dense = DenseGenome(arrays, len(self.node_columns), len(self.connection_columns))
+            self.dense_genomes[genome.key] = dense
+        return dense
+
+    def get_hit_ratio(self) -> float:
+        total : int = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def speciate_untimed(self, config : neat.Config, population : dict[int, neat.DefaultGenome], generation : int):
+        #this follows DefaultSpeciesSet.speciate step by step, so the species come out the same
+        assert isinstance(population, dict)
+        compatibility_threshold = self.species_set_config.compatibility_threshold
+        genome_config = config.genome_config
+
+        #every column has to be known before the dense genomes get sized
+        population_keys : list[int] = list(iterkeys(population))
+        batch : GeneBatch = GeneBatch([self.get_gene_arrays(population[gid]) for gid in population_keys])
+        for s in itervalues(self.species): self.get_gene_arrays(s.representative)
+        positions : dict[int, int] = {gid : index for index, gid in enumerate(population_keys)}
+        distance_rows : dict[int, list[float]] = {}
+        def get_distance_row(representative : neat.DefaultGenome) -> list[float]:
+            row : list[float]|None = distance_rows.get(representative.key, None)
+            if row is None:
+                row = self.get_dense_genome(representative).distances_to(batch, genome_config).tolist()
+                distance_rows[representative.key] = row
+            return row
+
+        distances_used : dict[tuple[int, int], float] = {}
+        unspeciated = set(iterkeys(population))
+        new_representatives = {}
+        new_members = {}
+        for sid, s in iteritems(self.species):
+            candidates = []
+            row : list[float] = get_distance_row(s.representative)
+            for gid in unspeciated:
+                d = row[positions[gid]]
+                distances_used[s.representative.key, gid] = d
+                candidates.append((d, population[gid]))
+
+            ignored_rdist, new_rep = min(candidates, key=lambda x: x[0])
+            new_rid = new_rep.key
+            new_representatives[sid] = new_rid
+            new_members[sid] = [new_rid]
+            unspeciated.remove(new_rid)
+
+        representative_rows : list[tuple[int, int, list[float]]] = [(sid, rid, get_distance_row(population[rid]))
+                                                                     for sid, rid in iteritems(new_representatives)]
+        while unspeciated:
+            gid = unspeciated.pop()
+            position : int = positions[gid]
+
+            candidates = []
+            for sid, rid, row in representative_rows:
+                d = row[position]
+                distances_used[rid, gid] = d
+                if d < compatibility_threshold:
+                    candidates.append((d, sid))
+
+            if candidates:
+                ignored_sdist, sid = min(candidates, key=lambda x: x[0])
+                new_members[sid].append(gid)
+            else:
+                sid = next(self.indexer)
+                new_representatives[sid] = gid
+                new_members[sid] = [gid]
+                representative_rows.append((sid, gid, get_distance_row(population[gid])))
+
+        self.genome_to_species = {}
+        for sid, rid in iteritems(new_representatives):
+            s = self.species.get(sid)
+            if s is None:
+                s = Species(sid, generation)
+                self.species[sid] = s
+
+            members = new_members[sid]
+            for gid in members:
+                self.genome_to_species[gid] = sid
+
+            member_dict = dict((gid, population[gid]) for gid in members)
+            s.update(population[rid], member_dict)
+
+        #only genomes of this generation can show up again
+        self.gene_arrays = {key : arrays for key, arrays in self.gene_arrays.items() if key in population}
+        self.dense_genomes = {key : dense for key, dense in self.dense_genomes.items() if key in population}
+
+        gdmean = mean(itervalues(distances_used))
+        gdstdev = stdev(itervalues(distances_used))
+        self.reporters.info(
+            'Mean genetic distance {0:.3f}, standard deviation {1:.3f}'.format(gdmean, gdstdev))
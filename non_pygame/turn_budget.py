@@ -0,0 +1,38 @@
+import sys
+sys.path.append(".")
+from math import ceil
+import non_pygame.block_dude_core as bd_core
+from non_pygame.solver import get_optimal_length
+
+#every map got this many turns before turn budgets existed
+DEFAULT_MAX_TURNS : int = 100
+
+class TurnBudget:
+    '''How many turns a genome gets to play a map.
+    The cap is solution_multiplier times the map's optimal solution length, clamped between min_turns and max_turns
+    (fallback_turns if the map has no known solution). With start_turns set, the budget starts there on generation 0
+    and grows by turns_per_generation every generation until it reaches the cap, so early generations are cheap.'''
+    def __init__(self, solution_multiplier : float = 2.0, min_turns : int = 30, max_turns : int = 400,
+                 fallback_turns : int = DEFAULT_MAX_TURNS, start_turns : int|None = None, turns_per_generation : float = 1.0):
+        self.solution_multiplier : float = solution_multiplier
+        self.min_turns : int = min_turns
+        self.max_turns : int = max_turns
+        self.fallback_turns : int = fallback_turns
+        self.start_turns : int|None = start_turns
+        self.turns_per_generation : float = turns_per_generation
+
+    def get_max_turns(self, used_map : bd_core.SavedMap) -> int:
+        optimal_length : int|None = get_optimal_length(used_map)
+        if optimal_length is None: return self.fallback_turns
+        return max(self.min_turns, min(self.max_turns, ceil(self.solution_multiplier * optimal_length)))
+
+    def get_turns(self, used_map : bd_core.SavedMap, generation : int|None = None) -> int:
+        '''Budget for the given generation. Without a generation (e.g for replays), this is the full cap.'''
+        max_turns : int = self.get_max_turns(used_map)
+        if self.start_turns is None or generation is None: return max_turns
+        return min(max_turns, self.start_turns + int(self.turns_per_generation * generation))
+
+#the budget Sim and evaluation use when none is given. This is a gameplay change from the fixed DEFAULT_MAX_TURNS
+#(level1 38, level2 146, map3 30, map4 32 turns), FIXED_TURN_BUDGET gives every map the old 100 turns again
+DEFAULT_TURN_BUDGET : TurnBudget = TurnBudget()
+FIXED_TURN_BUDGET : TurnBudget = TurnBudget(min_turns=DEFAULT_MAX_TURNS, max_turns=DEFAULT_MAX_TURNS)
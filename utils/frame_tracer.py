@@ -0,0 +1,66 @@
+import json
+import os
+from collections import deque
+from time import perf_counter_ns, strftime
+
+TRACE_DIRECTORY : str = 'traces'
+DEFAULT_CAPACITY : int = 50000
+
+class TraceSpan:
+    __slots__ = ('tracer', 'name', 'start')
+    def __init__(self, tracer : 'FrameTracer', name : str) -> None:
+        self.tracer : FrameTracer = tracer
+        self.name : str = name
+        self.start : int = 0
+
+    def __enter__(self) -> 'TraceSpan':
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.spans.append((self.name, self.start, perf_counter_ns() - self.start))
+
+class NullSpan:
+    '''Handed out while tracing is off, so a disabled span costs one method call.'''
+    __slots__ = ()
+    def __enter__(self) -> 'NullSpan':
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NULL_SPAN : NullSpan = NullSpan()
+
+class FrameTracer:
+    '''Records timed spans (name, start, duration) of the main loop into a ring buffer holding the last capacity spans,
+    and writes them out as Chrome trace JSON (chrome://tracing or ui.perfetto.dev). Spans nest by time, so a span
+    that runs inside another one shows up below it. Off unless enabled (FRAME_TRACE=1 in the environment).'''
+    def __init__(self, capacity : int = DEFAULT_CAPACITY, enabled : bool|None = None) -> None:
+        self.enabled : bool = os.environ.get('FRAME_TRACE', '') == '1' if enabled is None else enabled
+        self.spans : deque[tuple[str, int, int]] = deque(maxlen=capacity)
+        self.start_time : int = perf_counter_ns()
+
+    def span(self, name : str) -> TraceSpan|NullSpan:
+        if not self.enabled: return NULL_SPAN
+        return TraceSpan(self, name)
+
+    def clear(self):
+        self.spans.clear()
+
+    def to_chrome_trace(self) -> dict:
+        events : list[dict] = [{'name' : 'process_name', 'ph' : 'M', 'pid' : 1, 'tid' : 1, 'args' : {'name' : 'block dude'}}]
+        for name, start, duration in self.spans:
+            events.append({'name' : name, 'cat' : name.split('.')[0], 'ph' : 'X', 'pid' : 1, 'tid' : 1,
+                           'ts' : (start - self.start_time) / 1000, 'dur' : duration / 1000})
+        return {'traceEvents' : events, 'displayTimeUnit' : 'ms'}
+
+    def dump(self, file_path : str|None = None) -> str:
+        '''Writes the buffered spans (default: a timestamped file in TRACE_DIRECTORY) and returns the path.'''
+        if file_path is None:
+            os.makedirs(TRACE_DIRECTORY, exist_ok=True)
+            file_path = os.path.join(TRACE_DIRECTORY, f'frame_trace_{strftime("%Y%m%d_%H%M%S")}.json')
+        temporary_path : str = f'{file_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_chrome_trace(), file, separators=(',', ':'))
+        os.replace(temporary_path, file_path)
+        return file_path
@@ -0,0 +1,44 @@
+import os
+import sys
+from time import perf_counter
+
+#modules that should not be imported before a mode needs them
+DEFERRED_MODULES : tuple[str, ...] = ('neat', 'numpy', 'non_pygame.ml_core', 'non_pygame.replays')
+
+class StartupReport:
+    '''Times the startup stages of main.py and the initialisation of each game mode.
+    Printed when the STARTUP_REPORT environment variable is set to 1. preloaded_modules are the modules imported before the game's
+    own code (upstream pygame imports numpy for pygame.surfarray), they are reported apart from the ones the game imported early.'''
+    def __init__(self, start_time : float|None = None, enabled : bool|None = None, preloaded_modules : set[str]|None = None) -> None:
+        self.start_time : float = perf_counter() if start_time is None else start_time
+        self.last_time : float = self.start_time
+        self.enabled : bool = os.environ.get('STARTUP_REPORT', '') == '1' if enabled is None else enabled
+        self.stages : list[tuple[str, float]] = []
+        self.finished : bool = False
+        self.preloaded_modules : set[str] = set() if preloaded_modules is None else preloaded_modules
+
+    def mark(self, label : str, since : float|None = None) -> float:
+        '''Records the time since the previous mark (or since the given perf_counter time) under label.
+        Marks made after startup finished are printed straight away.'''
+        now : float = perf_counter()
+        duration : float = now - (self.last_time if since is None else since)
+        self.last_time = now
+        self.stages.append((label, duration))
+        if self.enabled and self.finished: print(f'[startup] {label} : {duration * 1000:.1f} ms')
+        return duration
+
+    def finish(self, label : str = 'first frame'):
+        if self.finished: return
+        self.mark(label)
+        self.finished = True
+        if self.enabled: print(self.format_report())
+
+    def format_report(self) -> str:
+        lines : list[str] = ['[startup] stage times']
+        lines += [f'  {label:<28} {duration * 1000:8.1f} ms' for label, duration in self.stages]
+        lines.append(f'  {"total":<28} {(self.last_time - self.start_time) * 1000:8.1f} ms')
+        loaded : list[str] = [name for name in DEFERRED_MODULES if name in sys.modules and name not in self.preloaded_modules]
+        preloaded : list[str] = [name for name in DEFERRED_MODULES if name in self.preloaded_modules]
+        lines.append(f'  deferred modules already imported : {", ".join(loaded) if loaded else "none"}')
+        if preloaded: lines.append(f'  imported along with pygame : {", ".join(preloaded)}')
+        return '\n'.join(lines)